@@ -0,0 +1,185 @@
+"""
+Throughput of the bulk commands against a local fake Bitbucket API (benchmarks/fake_bitbucket.py).
+
+For each scale (number of repositories, 100 per project) it times:
+  create       bulk create from a manifest (project, repository, initial commit, branches, protection)
+  permissions  reading every repository's user permissions: the workspace-level listing
+               (list_project_permissions) and, for comparison, one listing per repository
+  startup      a fresh `python -m bitbucket_cli.cli repo list --project <key>` against the fake server
+  delete       bulk delete of the same manifest
+
+The fake server adds `--latency` milliseconds to every response and can inject 429s, so the numbers
+reflect request counts and concurrency rather than server speed. The listing cache is disabled.
+
+    python benchmarks/bulk.py [--scales 10 100 1000] [--latency 20] [--workers 8] [--throttle-every 0]
+    python benchmarks/bulk.py --save baseline.json
+    python benchmarks/bulk.py --compare baseline.json --tolerance 0.25   # exit code 1 on a regression
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_bitbucket import FakeBitbucket  # noqa: E402
+
+WORKSPACE = "bench"
+REPOS_PER_PROJECT = 100
+USERS_PER_REPO = 3
+
+
+def write_manifest(path, repositories):
+    """
+    Manifest with `repositories` repositories spread over projects of REPOS_PER_PROJECT.
+    :return: The project keys.
+    """
+    keys = []
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("projects:\n")
+        for index in range(repositories):
+            if index % REPOS_PER_PROJECT == 0:
+                keys.append(f"BENCH{len(keys)}")
+                file.write(f"  - key: {keys[-1]}\n    name: Bench {len(keys) - 1}\n    repositories:\n")
+            file.write(f"      - slug: bench-repo-{index}\n        branches: main;develop\n")
+    return keys
+
+
+def environment(server):
+    return {
+        "BITBUCKET_API_URL": server.base_url,
+        "BITBUCKET_WORKSPACE": WORKSPACE,
+        "BITBUCKET_USERNAME": "bench",
+        "BITBUCKET_APP_PASSWORD": "bench",
+        "BITBUCKET_CACHE_SIZE": "0",
+        "BITBUCKET_MAX_RETRIES": "10",
+    }
+
+
+class Measure:
+    """
+    Times a block and counts the requests the fake server received meanwhile.
+    """
+    def __init__(self, server, results, scale, scenario):
+        self.server, self.results, self.scale, self.scenario = server, results, scale, scenario
+
+    def __enter__(self):
+        self.requests = self.server.requests
+        self.throttled = self.server.throttled
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.started
+        requests = self.server.requests - self.requests
+        self.results.append({
+            "scale": self.scale, "scenario": self.scenario, "seconds": round(seconds, 4), "requests": requests,
+            "throttled": self.server.throttled - self.throttled,
+            "requests_per_second": round(requests / seconds, 1) if seconds else 0.0,
+        })
+
+
+def run_scale(server, scale, workers, results, workdir):
+    from bitbucket_cli.auth import BitbucketAuth
+    from bitbucket_cli.branch_permissions import BitbucketBranchPermissions
+    from bitbucket_cli.bulk import bulk_create_projects_and_repositories, bulk_delete_projects_and_repositories
+    from bitbucket_cli.projects import BitbucketProjects
+    from bitbucket_cli.repositories import BitbucketRepositories
+    from bitbucket_cli.users import BitbucketUsers
+
+    auth = BitbucketAuth(pool_size=max(10, workers))
+    projects_api, repos_api = BitbucketProjects(auth), BitbucketRepositories(auth)
+    branch_api, users_api = BitbucketBranchPermissions(auth), BitbucketUsers(auth)
+    manifest = os.path.join(workdir, f"manifest-{scale}.yaml")
+    keys = write_manifest(manifest, scale)
+    output = io.StringIO()
+
+    with Measure(server, results, scale, "create"), contextlib.redirect_stdout(output):
+        status = bulk_create_projects_and_repositories(projects_api, repos_api, branch_api, manifest, WORKSPACE,
+                                                       workers=workers)
+    if not status or any(state != "done" for state in status.values()):
+        raise RuntimeError(f"Bulk create failed at scale {scale}:\n{output.getvalue()}")
+
+    for repo in list(server.workspace(WORKSPACE)["repositories"].values()):
+        for user in range(USERS_PER_REPO):
+            repo["_users"][f"user{user}"] = "write"
+            server.add_member(WORKSPACE, f"user{user}")
+    repositories = {key: repos_api.list_repositories(WORKSPACE, key)["repositories"] for key in keys}
+
+    with Measure(server, results, scale, "permissions (workspace listing)"):
+        for key in keys:
+            users_api.list_project_permissions(WORKSPACE, key, repositories[key], workers=workers)
+    with Measure(server, results, scale, "permissions (per repository)"):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            slugs = [repo["slug"] for repos in repositories.values() for repo in repos]
+            list(pool.map(lambda slug: users_api.list_users_and_permissions(WORKSPACE, slug), slugs))
+
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    with Measure(server, results, scale, "startup (repo list)"):
+        subprocess.run([sys.executable, "-m", "bitbucket_cli.cli", "repo", "list", "--project", keys[0]],
+                       env=env, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+    with Measure(server, results, scale, "delete"), contextlib.redirect_stdout(output):
+        status = bulk_delete_projects_and_repositories(projects_api, repos_api, manifest, WORKSPACE, workers=workers)
+    if not status or any(state != "done" for state in status.values()):
+        raise RuntimeError(f"Bulk delete failed at scale {scale}:\n{output.getvalue()}")
+
+
+def compare(results, baseline, tolerance):
+    """
+    Lines describing every scenario that got slower than the baseline by more than `tolerance`.
+    """
+    previous = {(entry["scale"], entry["scenario"]): entry["seconds"] for entry in baseline}
+    regressions = []
+    for entry in results:
+        before = previous.get((entry["scale"], entry["scenario"]))
+        if before and entry["seconds"] > before * (1 + tolerance):
+            regressions.append(f"{entry['scenario']} @ {entry['scale']} repos: {before:.3f}s -> {entry['seconds']:.3f}s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100, 1000], help="Repository counts")
+    parser.add_argument("--latency", type=float, default=20, help="Milliseconds added to every response (default: 20)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--max-pagelen", type=int, default=100)
+    parser.add_argument("--throttle-every", type=int, default=0, help="Answer every n-th request with 429")
+    parser.add_argument("--save", metavar="FILE", help="Write the results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="Fail if slower than the results saved in FILE")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown for --compare (default: 0.25)")
+    args = parser.parse_args()
+
+    results = []
+    with FakeBitbucket(latency=args.latency / 1000.0, max_pagelen=args.max_pagelen,
+                       throttle_every=args.throttle_every) as server, tempfile.TemporaryDirectory() as workdir:
+        os.environ.update(environment(server))
+        print(f"{'repos':>6} {'scenario':<34} {'seconds':>9} {'requests':>9} {'req/s':>8} {'429s':>6}")
+        for scale in args.scales:
+            start = len(results)
+            run_scale(server, scale, args.workers, results, workdir)
+            for entry in results[start:]:
+                print(f"{entry['scale']:>6} {entry['scenario']:<34} {entry['seconds']:>9.3f} {entry['requests']:>9} "
+                      f"{entry['requests_per_second']:>8.1f} {entry['throttled']:>6}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
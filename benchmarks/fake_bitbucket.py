@@ -0,0 +1,595 @@
+"""
+Local stand-in for the parts of the Bitbucket Cloud REST API this package uses, for benchmarks and
+integration tests. Start it and point the CLI at it with BITBUCKET_API_URL:
+
+    with FakeBitbucket(latency=0.02, throttle_every=50) as server:
+        os.environ["BITBUCKET_API_URL"] = server.base_url
+        ...
+
+Served endpoints (under /2.0): workspace projects, members, repository and group permissions;
+repositories with permissions-config, refs/branches, branch-restrictions and src.
+Listings are paginated (pagelen capped at `max_pagelen`) and support `q` filters
+(=, !=, <, <=, >, >= joined by AND/OR with parentheses) and `sort`.
+Every `throttle_every`-th request is answered with 429 and a Retry-After of `retry_after` seconds.
+
+    python benchmarks/fake_bitbucket.py --port 8000 --latency 20   # serve until interrupted
+"""
+import argparse
+import itertools
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlencode, urlsplit
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds").replace("+00:00", "Z")
+
+
+def _user(nickname):
+    return {"nickname": nickname, "display_name": nickname.title(), "uuid": "{" + str(uuid.uuid5(uuid.NAMESPACE_DNS, nickname)) + "}"}
+
+
+def _field(item, path):
+    for part in path.split("."):
+        if not isinstance(item, dict):
+            return None
+        item = item.get(part)
+    return item
+
+
+_TOKEN = re.compile(r'\s*(?:(\()|(\))|(AND|OR)\b|([\w.]+)\s*(!=|>=|<=|=|>|<)\s*("(?:[^"\\]|\\.)*"|[\w.:+-]+))', re.I)
+_OPERATORS = {
+    "=": lambda a, b: a == b, "!=": lambda a, b: a != b,
+    ">": lambda a, b: a is not None and a > b, ">=": lambda a, b: a is not None and a >= b,
+    "<": lambda a, b: a is not None and a < b, "<=": lambda a, b: a is not None and a <= b,
+}
+
+
+def parse_query(query):
+    """
+    Compile a Bitbucket `q` filter into a predicate over JSON objects.
+    :raises ValueError: On syntax the stand-in does not understand.
+    """
+    tokens, position = [], 0
+    query = query.strip()
+    while position < len(query):
+        match = _TOKEN.match(query, position)
+        if not match:
+            raise ValueError(f"Cannot parse query at: {query[position:]!r}")
+        tokens.append(match.groups())
+        position = match.end()
+        while position < len(query) and query[position].isspace():
+            position += 1
+
+    def value(raw):
+        if raw.startswith('"'):
+            return json.loads(raw)
+        return {"true": True, "false": False, "null": None}.get(raw.lower(), raw)
+
+    def expression(index, operator="OR"):
+        predicate, index = (term(index) if operator == "OR" else atom(index))
+        while index < len(tokens) and (tokens[index][2] or "").upper() == operator:
+            right, index = (term(index + 1) if operator == "OR" else atom(index + 1))
+            predicate = (lambda l, r: (lambda item: l(item) or r(item)))(predicate, right) if operator == "OR" \
+                else (lambda l, r: (lambda item: l(item) and r(item)))(predicate, right)
+        return predicate, index
+
+    def term(index):
+        return expression(index, "AND")
+
+    def atom(index):
+        if index >= len(tokens):
+            raise ValueError("Unexpected end of query")
+        opening, _, _, field, op, raw = tokens[index]
+        if opening:
+            predicate, index = expression(index + 1)
+            if index >= len(tokens) or not tokens[index][1]:
+                raise ValueError("Missing ')' in query")
+            return predicate, index + 1
+        if not field:
+            raise ValueError(f"Unexpected token in query: {tokens[index]}")
+        expected = value(raw)
+        return (lambda item: _OPERATORS[op](_field(item, field), expected)), index + 1
+
+    predicate, index = expression(0)
+    if index != len(tokens):
+        raise ValueError("Trailing tokens in query")
+    return predicate
+
+
+class FakeBitbucket:
+    """
+    In-memory Bitbucket workspace(s) served over HTTP on a free local port.
+    :param latency: Seconds added to every response.
+    :param max_pagelen: Largest page size served, whatever `pagelen` asks for.
+    :param throttle_every: Answer every n-th request with 429 (0 disables).
+    :param retry_after: Retry-After value of the injected 429 responses.
+    """
+    def __init__(self, latency=0.0, max_pagelen=100, throttle_every=0, retry_after=0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.max_pagelen = max_pagelen
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.workspaces = {}
+        self.requests = 0
+        self.throttled = 0
+        self.lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self.server = ThreadingHTTPServer((host, port), _handler(self))
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/2.0"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # State and seeding helpers
+
+    def workspace(self, name):
+        with self.lock:
+            return self.workspaces.setdefault(name, {"projects": {}, "repositories": {}, "members": {}, "groups": {}})
+
+    def add_member(self, workspace, nickname):
+        self.workspace(workspace)["members"].setdefault(nickname, _user(nickname))
+
+    def add_project(self, workspace, key, name=None, description=""):
+        now = _now()
+        project = {"key": key, "name": name or key, "description": description, "created_on": now, "updated_on": now,
+                   "uuid": "{" + str(uuid.uuid4()) + "}"}
+        self.workspace(workspace)["projects"][key] = project
+        return project
+
+    def add_repository(self, workspace, project_key, slug, is_private=True, branches=(), users=None, groups=None):
+        now = _now()
+        repo = {
+            "slug": slug, "name": slug, "full_name": f"{workspace}/{slug}", "is_private": is_private,
+            "project": {"key": project_key}, "mainbranch": None, "description": "", "fork_policy": "allow_forks",
+            "created_on": now, "updated_on": now, "uuid": "{" + str(uuid.uuid4()) + "}",
+            "_branches": {}, "_restrictions": {}, "_users": {}, "_groups": {},
+        }
+        self.workspace(workspace)["repositories"][slug] = repo
+        if branches:
+            commit = uuid.uuid4().hex
+            for branch in branches:
+                repo["_branches"][branch] = commit
+            repo["mainbranch"] = {"name": branches[0], "type": "branch"}
+        for nickname, permission in (users or {}).items():
+            self.add_member(workspace, nickname)
+            repo["_users"][nickname] = permission
+        for group, permission in (groups or {}).items():
+            repo["_groups"][group] = permission
+        return repo
+
+    def add_group(self, workspace, slug, members=()):
+        for nickname in members:
+            self.add_member(workspace, nickname)
+        self.workspace(workspace)["groups"][slug] = set(members)
+
+    def handle(self, method, path, query, body, host):
+        """
+        Route one request. Returns (status, json_body or None, extra headers).
+        """
+        with self.lock:
+            self.requests += 1
+            throttled = self.throttle_every and self.requests % self.throttle_every == 0
+            if throttled:
+                self.throttled += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if throttled:
+            return 429, {"error": {"message": "Rate limit for this resource has been exceeded"}}, \
+                {"Retry-After": str(self.retry_after)}
+
+        parts = [unquote(part) for part in path.split("/") if part]
+        if parts[:1] != ["2.0"]:
+            return 404, {"error": {"message": "Not found"}}, {}
+        parts = parts[1:]
+        for pattern, methods in ROUTES:
+            if len(parts) < len(pattern) or (len(parts) != len(pattern) and pattern[-1] != "**"):
+                continue
+            params = {}
+            for expected, actual in zip(pattern, parts):
+                if expected == "**":
+                    params["rest"] = "/".join(parts[len(pattern) - 1:])
+                    break
+                if expected.startswith("{"):
+                    params[expected[1:-1]] = actual
+                elif expected != actual:
+                    break
+            else:
+                handler = methods.get(method)
+                if handler is None:
+                    return 405, {"error": {"message": "Method not allowed"}}, {}
+                with self.lock:
+                    return handler(self, params, query, body, host)
+        return 404, {"error": {"message": f"No such endpoint: /{'/'.join(parts)}"}}, {}
+
+    # Helpers used by the route handlers
+
+    def _page(self, items, query, host, path):
+        if "q" in query:
+            try:
+                predicate = parse_query(query["q"])
+            except ValueError as e:
+                return 400, {"error": {"message": str(e)}}, {}
+            items = [item for item in items if predicate(item)]
+        if "sort" in query:
+            field = query["sort"].lstrip("-")
+            items = sorted(items, key=lambda item: (_field(item, field) is None, _field(item, field) or ""),
+                           reverse=query["sort"].startswith("-"))
+        pagelen = max(1, min(int(query.get("pagelen", 10)), self.max_pagelen))
+        page = max(1, int(query.get("page", 1)))
+        start = (page - 1) * pagelen
+        body = {"values": items[start:start + pagelen], "pagelen": pagelen, "size": len(items), "page": page}
+        if start + pagelen < len(items):
+            body["next"] = f"http://{host}{path}?{urlencode(dict(query, page=page + 1, pagelen=pagelen))}"
+        return 200, body, {}
+
+    def _repo(self, params):
+        return self.workspaces.get(params["workspace"], {}).get("repositories", {}).get(params["repo_slug"])
+
+
+def _public(repo):
+    return {key: value for key, value in repo.items() if not key.startswith("_")}
+
+
+def _not_found(what):
+    return 404, {"error": {"message": f"{what} not found"}}, {}
+
+
+# Route handlers: (server, path params, query, JSON or raw body, host) -> (status, body, headers)
+
+def _list_projects(server, params, query, body, host):
+    projects = list(server.workspace(params["workspace"])["projects"].values())
+    return server._page(projects, query, host, f"/2.0/workspaces/{params['workspace']}/projects")
+
+
+def _create_project(server, params, query, body, host):
+    projects = server.workspace(params["workspace"])["projects"]
+    if body.get("key") in projects:
+        return 400, {"error": {"message": "Project with this Project Key already exists."}}, {}
+    return 201, server.add_project(params["workspace"], body["key"], body.get("name"), body.get("description", "")), {}
+
+
+def _get_project(server, params, query, body, host):
+    project = server.workspace(params["workspace"])["projects"].get(params["project_key"])
+    return (200, project, {}) if project else _not_found("Project")
+
+
+def _delete_project(server, params, query, body, host):
+    workspace = server.workspace(params["workspace"])
+    if params["project_key"] not in workspace["projects"]:
+        return _not_found("Project")
+    if any(repo["project"]["key"] == params["project_key"] for repo in workspace["repositories"].values()):
+        return 400, {"error": {"message": "You can't delete a project that contains repositories."}}, {}
+    del workspace["projects"][params["project_key"]]
+    return 204, None, {}
+
+
+def _list_members(server, params, query, body, host):
+    name = params["workspace"]
+    members = [{"user": user, "workspace": {"slug": name, "name": name}}
+               for user in server.workspace(name)["members"].values()]
+    return server._page(members, query, host, f"/2.0/workspaces/{name}/members")
+
+
+def _list_workspace_repository_permissions(server, params, query, body, host):
+    name = params["workspace"]
+    workspace = server.workspace(name)
+    entries = [
+        {"permission": permission, "user": workspace["members"].get(user) or _user(user),
+         "repository": {"full_name": repo["full_name"], "slug": repo["slug"], "project": repo["project"]}}
+        for repo in workspace["repositories"].values() for user, permission in repo["_users"].items()
+    ]
+    return server._page(entries, query, host, f"/2.0/workspaces/{name}/permissions/repositories")
+
+
+def _list_group_members(server, params, query, body, host):
+    workspace = server.workspace(params["workspace"])
+    if params["group"] not in workspace["groups"]:
+        return _not_found("Group")
+    members = [workspace["members"].get(user) or _user(user) for user in sorted(workspace["groups"][params["group"]])]
+    return server._page(members, query, host,
+                        f"/2.0/workspaces/{params['workspace']}/permissions/groups/{params['group']}/members")
+
+
+def _add_group_member(server, params, query, body, host):
+    workspace = server.workspace(params["workspace"])
+    if params["group"] not in workspace["groups"]:
+        return _not_found("Group")
+    workspace["groups"][params["group"]].add(body["username"])
+    server.add_member(params["workspace"], body["username"])
+    return 201, workspace["members"][body["username"]], {}
+
+
+def _remove_group_member(server, params, query, body, host):
+    members = server.workspace(params["workspace"])["groups"].get(params["group"])
+    if members is None or params["user"] not in members:
+        return _not_found("Member")
+    members.discard(params["user"])
+    return 204, None, {}
+
+
+def _list_repositories(server, params, query, body, host):
+    repos = [_public(repo) for repo in server.workspace(params["workspace"])["repositories"].values()]
+    return server._page(repos, query, host, f"/2.0/repositories/{params['workspace']}")
+
+
+def _get_repository(server, params, query, body, host):
+    repo = server._repo(params)
+    return (200, _public(repo), {}) if repo else _not_found("Repository")
+
+
+def _create_repository(server, params, query, body, host):
+    workspace = server.workspace(params["workspace"])
+    if params["repo_slug"] in workspace["repositories"]:
+        return 400, {"error": {"message": "Repository with this Slug and Owner already exists."}}, {}
+    project_key = (body.get("project") or {}).get("key")
+    if project_key not in workspace["projects"]:
+        return 400, {"error": {"message": f"Project '{project_key}' not found."}}, {}
+    repo = server.add_repository(params["workspace"], project_key, params["repo_slug"], body.get("is_private", True))
+    return 201, _public(repo), {}
+
+
+def _update_repository(server, params, query, body, host):
+    repo = server._repo(params)
+    if repo is None:
+        return _create_repository(server, params, query, body, host)
+    workspace = server.workspace(params["workspace"])
+    for key in ("is_private", "description", "fork_policy", "name"):
+        if key in body:
+            repo[key] = body[key]
+    if "project" in body:
+        if body["project"].get("key") not in workspace["projects"]:
+            return 400, {"error": {"message": "Project not found."}}, {}
+        repo["project"] = {"key": body["project"]["key"]}
+    if "mainbranch" in body:
+        name = (body["mainbranch"] or {}).get("name")
+        if name not in repo["_branches"]:
+            return 400, {"error": {"message": f"Branch '{name}' not found."}}, {}
+        repo["mainbranch"] = {"name": name, "type": "branch"}
+    repo["updated_on"] = _now()
+    return 200, _public(repo), {}
+
+
+def _delete_repository(server, params, query, body, host):
+    if server._repo(params) is None:
+        return _not_found("Repository")
+    del server.workspace(params["workspace"])["repositories"][params["repo_slug"]]
+    return 204, None, {}
+
+
+def _branch(repo, name):
+    return {"name": name, "type": "branch", "target": {"hash": repo["_branches"][name], "type": "commit"}}
+
+
+def _list_branches(server, params, query, body, host):
+    repo = server._repo(params)
+    if repo is None:
+        return _not_found("Repository")
+    branches = [_branch(repo, name) for name in repo["_branches"]]
+    return server._page(branches, query, host,
+                        f"/2.0/repositories/{params['workspace']}/{params['repo_slug']}/refs/branches")
+
+
+def _get_branch(server, params, query, body, host):
+    repo = server._repo(params)
+    if repo is None or params["rest"] not in repo["_branches"]:
+        return _not_found("Branch")
+    return 200, _branch(repo, params["rest"]), {}
+
+
+def _create_branch(server, params, query, body, host):
+    repo = server._repo(params)
+    if repo is None:
+        return _not_found("Repository")
+    name, target = body.get("name"), (body.get("target") or {}).get("hash")
+    if name in repo["_branches"]:
+        return 400, {"error": {"message": f"BRANCH_ALREADY_EXISTS: Branch \"{name}\" already exists."}}, {}
+    if target not in repo["_branches"].values():
+        return 400, {"error": {"message": f"Commit '{target}' not found."}}, {}
+    repo["_branches"][name] = target
+    return 201, _branch(repo, name), {}
+
+
+def _commit_file(server, params, query, body, host):
+    repo = server._repo(params)
+    if repo is None:
+        return _not_found("Repository")
+    match = re.search(rb'name="branch"\r\n\r\n(.*?)\r\n', body if isinstance(body, bytes) else b"")
+    branch = match.group(1).decode("utf-8") if match else (repo["mainbranch"] or {}).get("name", "main")
+    commit = uuid.uuid4().hex
+    repo["_branches"][branch] = commit
+    if repo["mainbranch"] is None:
+        repo["mainbranch"] = {"name": branch, "type": "branch"}
+    repo["updated_on"] = _now()
+    location = f"http://{host}/2.0/repositories/{params['workspace']}/{params['repo_slug']}/commit/{commit}"
+    return 201, None, {"Location": location}
+
+
+def _list_restrictions(server, params, query, body, host):
+    repo = server._repo(params)
+    if repo is None:
+        return _not_found("Repository")
+    return server._page(list(repo["_restrictions"].values()), query, host,
+                        f"/2.0/repositories/{params['workspace']}/{params['repo_slug']}/branch-restrictions")
+
+
+def _store_restriction(repo, restriction_id, body):
+    restriction = dict({"users": [], "groups": [], "value": None, "branch_match_kind": "glob"}, **body)
+    restriction["id"] = restriction_id
+    restriction["users"] = [_user(user["username"]) if user.get("username") else user for user in restriction["users"]]
+    repo["_restrictions"][restriction_id] = restriction
+    return restriction
+
+
+def _create_restriction(server, params, query, body, host):
+    repo = server._repo(params)
+    if repo is None:
+        return _not_found("Repository")
+    return 201, _store_restriction(repo, next(server._ids), body), {}
+
+
+def _update_restriction(server, params, query, body, host):
+    repo = server._repo(params)
+    restriction_id = int(params["id"]) if params["id"].isdigit() else None
+    if repo is None or restriction_id not in repo["_restrictions"]:
+        return _not_found("Branch restriction")
+    return 200, _store_restriction(repo, restriction_id, body), {}
+
+
+def _delete_restriction(server, params, query, body, host):
+    repo = server._repo(params)
+    restriction_id = int(params["id"]) if params["id"].isdigit() else None
+    if repo is None or restriction_id not in repo["_restrictions"]:
+        return _not_found("Branch restriction")
+    del repo["_restrictions"][restriction_id]
+    return 204, None, {}
+
+
+def _permission_handlers(kind):
+    # kind is "users" or "groups"; both live under /permissions-config/<kind>[/<name>]
+    store = "_" + kind
+
+    def entry(server, workspace, name, permission):
+        if kind == "users":
+            return {"permission": permission, "user": server.workspace(workspace)["members"].get(name) or _user(name)}
+        return {"permission": permission, "group": {"slug": name, "name": name}}
+
+    def listing(server, params, query, body, host):
+        repo = server._repo(params)
+        if repo is None:
+            return _not_found("Repository")
+        entries = [entry(server, params["workspace"], name, permission) for name, permission in repo[store].items()]
+        return server._page(entries, query, host,
+                            f"/2.0/repositories/{params['workspace']}/{params['repo_slug']}/permissions-config/{kind}")
+
+    def put(server, params, query, body, host):
+        repo = server._repo(params)
+        if repo is None:
+            return _not_found("Repository")
+        if body.get("permission") not in ("read", "write", "admin"):
+            return 400, {"error": {"message": "Invalid permission."}}, {}
+        if kind == "groups" and params["name"] not in server.workspace(params["workspace"])["groups"]:
+            return _not_found("Group")
+        repo[store][params["name"]] = body["permission"]
+        return 200, entry(server, params["workspace"], params["name"], body["permission"]), {}
+
+    def delete(server, params, query, body, host):
+        repo = server._repo(params)
+        if repo is None or params["name"] not in repo[store]:
+            return _not_found("Permission")
+        del repo[store][params["name"]]
+        return 204, None, {}
+
+    return listing, put, delete
+
+
+_list_user_permissions, _put_user_permission, _delete_user_permission = _permission_handlers("users")
+_list_group_permissions, _put_group_permission, _delete_group_permission = _permission_handlers("groups")
+
+_REPO = ["repositories", "{workspace}", "{repo_slug}"]
+ROUTES = [
+    (["workspaces", "{workspace}", "projects"], {"GET": _list_projects, "POST": _create_project}),
+    (["workspaces", "{workspace}", "projects", "{project_key}"], {"GET": _get_project, "DELETE": _delete_project}),
+    (["workspaces", "{workspace}", "members"], {"GET": _list_members}),
+    (["workspaces", "{workspace}", "permissions", "repositories"], {"GET": _list_workspace_repository_permissions}),
+    (["workspaces", "{workspace}", "permissions", "groups", "{group}", "members"],
+     {"GET": _list_group_members, "POST": _add_group_member}),
+    (["workspaces", "{workspace}", "permissions", "groups", "{group}", "members", "{user}"],
+     {"DELETE": _remove_group_member}),
+    (["repositories", "{workspace}"], {"GET": _list_repositories}),
+    (_REPO, {"GET": _get_repository, "POST": _create_repository, "PUT": _update_repository,
+             "DELETE": _delete_repository}),
+    (_REPO + ["refs", "branches"], {"GET": _list_branches, "POST": _create_branch}),
+    (_REPO + ["refs", "branches", "**"], {"GET": _get_branch}),
+    (_REPO + ["src"], {"POST": _commit_file}),
+    (_REPO + ["branch-restrictions"], {"GET": _list_restrictions, "POST": _create_restriction}),
+    (_REPO + ["branch-restrictions", "{id}"], {"PUT": _update_restriction, "DELETE": _delete_restriction}),
+    (_REPO + ["permissions-config", "users"], {"GET": _list_user_permissions}),
+    (_REPO + ["permissions-config", "users", "{name}"], {"PUT": _put_user_permission, "DELETE": _delete_user_permission}),
+    (_REPO + ["permissions-config", "groups"], {"GET": _list_group_permissions}),
+    (_REPO + ["permissions-config", "groups", "{name}"],
+     {"PUT": _put_group_permission, "DELETE": _delete_group_permission}),
+]
+
+
+def _handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _serve(self):
+            url = urlsplit(self.path)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            body = raw
+            if raw and "json" in (self.headers.get("Content-Type") or ""):
+                try:
+                    body = json.loads(raw)
+                except ValueError:
+                    body = {}
+            elif not raw:
+                body = {}
+            host = self.headers.get("Host") or "%s:%s" % self.server.server_address[:2]
+            status, payload, headers = server.handle(self.command, url.path, query, body, host)
+            data = json.dumps(payload).encode("utf-8") if payload is not None else b""
+            self.send_response(status)
+            if payload is not None:
+                self.send_header("Content-Type", "application/json")
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_PUT = do_DELETE = _serve
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0, help="Milliseconds added to every response")
+    parser.add_argument("--max-pagelen", type=int, default=100)
+    parser.add_argument("--throttle-every", type=int, default=0, help="Answer every n-th request with 429")
+    parser.add_argument("--retry-after", type=float, default=1)
+    args = parser.parse_args()
+    server = FakeBitbucket(latency=args.latency / 1000.0, max_pagelen=args.max_pagelen,
+                           throttle_every=args.throttle_every, retry_after=args.retry_after, port=args.port)
+    print(f"Serving a fake Bitbucket API at {server.base_url} (BITBUCKET_API_URL); Ctrl+C to stop.")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Start-up time of the bitbucket_cli entry point, per subcommand.
+
+Every sample is a fresh interpreter running `python -m bitbucket_cli.cli <command>`. Requests are
+sent to a closed local port through HTTPS_PROXY with retries disabled, so each command fails
+right after its first connection attempt: the time measured is interpreter start, imports,
+.env loading and argument parsing, with no network.
+
+    python benchmarks/startup.py [--runs 10]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MANIFEST = """projects:
+  - key: BENCH
+    name: Bench
+    repositories:
+      - slug: bench-repo
+        branches: main
+"""
+
+COMMANDS = [
+    ["--help"],
+    ["project", "create", "BENCH"],
+    ["project", "list"],
+    ["repo", "create", "bench-repo", "--project", "BENCH"],
+    ["repo", "delete", "bench-repo"],
+    ["repo", "list", "--project", "BENCH"],
+    ["perm", "set", "bench-repo", "--user", "bench", "--permission", "read"],
+    ["perm", "list", "bench-repo"],
+    ["branch", "protect", "bench-repo"],
+    ["group", "add-user", "bench", "--group", "bench"],
+    ["bulk", "create", "{manifest}"],
+    ["bulk", "reconcile", "{manifest}"],
+]
+
+
+def _environment():
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+        "BITBUCKET_WORKSPACE": "bench",
+        "BITBUCKET_USERNAME": "bench",
+        "BITBUCKET_APP_PASSWORD": "bench",
+        "BITBUCKET_MAX_RETRIES": "0",
+        # Port 9 (discard) is closed: connections are refused immediately
+        "HTTPS_PROXY": "http://127.0.0.1:9",
+        "NO_PROXY": "",
+    })
+    return env
+
+
+def _import_time(argv, env, cwd):
+    # Sum of the top-level entries of -X importtime, in milliseconds
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "bitbucket_cli.cli"] + argv,
+        env=env, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+    return total / 1000.0
+
+
+def _wall_time(argv, env, cwd):
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "bitbucket_cli.cli"] + argv,
+        env=env, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    return (time.perf_counter() - start) * 1000.0
+
+
+def _wall_time_python(env, cwd):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], env=env, cwd=cwd)
+    return (time.perf_counter() - start) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="Samples per command (default: 10)")
+    args = parser.parse_args()
+
+    env = _environment()
+    with tempfile.TemporaryDirectory() as cwd:
+        manifest = os.path.join(cwd, "manifest.yaml")
+        with open(manifest, "w") as file:
+            file.write(MANIFEST)
+
+        baseline = statistics.median(_wall_time_python(env, cwd) for _ in range(args.runs))
+        print(f"{'command':<55} {'wall ms':>9} {'over python':>12} {'imports ms':>11}")
+        print(f"{'(python -c pass)':<55} {baseline:>9.1f} {'':>12} {'':>11}")
+        for command in COMMANDS:
+            argv = [arg.format(manifest=manifest) for arg in command]
+            wall = statistics.median(_wall_time(argv, env, cwd) for _ in range(args.runs))
+            imports = statistics.median(_import_time(argv, env, cwd) for _ in range(max(1, args.runs // 2)))
+            print(f"{' '.join(command):<55} {wall:>9.1f} {wall - baseline:>12.1f} {imports:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,161 @@
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+from .ratelimit import RequestScheduler
+
+DEFAULT_BASE_URL = "https://api.bitbucket.org/2.0"
+DEFAULT_POOL_SIZE = 10
+# Largest page size accepted by most Bitbucket list endpoints
+DEFAULT_PAGELEN = 100
+
+
+def api_base_url():
+    """
+    Base URL of the REST API: BITBUCKET_API_URL when set (e.g. a local stand-in), Bitbucket Cloud otherwise.
+    """
+    return (os.getenv("BITBUCKET_API_URL") or DEFAULT_BASE_URL).rstrip("/")
+
+
+class BitbucketAPIError(Exception):
+    """
+    Raised when a Bitbucket API call returns an unexpected status code.
+    """
+    def __init__(self, response):
+        self.response = response
+        self.status_code = response.status_code
+        super().__init__(f"Bitbucket API error {response.status_code}: {response.text}")
+
+
+def response_json(response):
+    """
+    Parse a response body as JSON; non-JSON bodies (e.g. throttling or proxy error pages)
+    are wrapped as {"error": {"message": <text>}} instead of raising.
+    """
+    try:
+        return response.json()
+    except ValueError:
+        return {"error": {"message": response.text}}
+
 
 class BitbucketAPI:
-    def __init__(self, client_id, client_secret, access_token=None):
-        self.client_id = client_id
-        self.client_secret = client_secret
-        self.access_token = access_token
-        self.base_url = 'https://api.bitbucket.org/2.0'
-
-def obtain_access_token(self, authorization_code):
-    # Exchange authorization code for access token
-    token_url = 'https://bitbucket.org/site/oauth2/access_token'
-    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-    data = {
-        'grant_type': 'authorization_code',
-        'code': authorization_code,
-        'redirect_uri': 'https://localhost:3000/callback',
-        'client_id': self.client_id,
-        'client_secret': self.client_secret
-    }
-    response = requests.post(token_url, headers=headers, data=data, auth=(self.client_id, self.client_secret))
-    
-    if response.status_code == 200:
-        self.access_token = response.json()['access_token']
-        print(f"Access token obtained: {self.access_token}")
-    else:
-        print(f"Failed to obtain access token: {response.text}")
-
-    def create_repository(self, project_key, repo_name, is_private=True):
-        # Example of using the access token for API calls
-        headers = {
-            'Authorization': f'Bearer {self.access_token}',
-            'Content-Type': 'application/json'
-        }
-        data = {
-            'scm': 'git',
-            'project': {'key': project_key},
-            'name': repo_name,
-            'is_private': is_private
-        }
-        response = requests.post(f'{self.base_url}/repositories', headers=headers, json=data)
-        if response.status_code == 201:
-            print(f"Repository {repo_name} created successfully.")
-        else:
-            print(f"Failed to create repository: {response.text}")
-
-    # Implement other methods similarly
+    """
+    Shared HTTP client used by every Bitbucket resource class.
+    Holds a single keep-alive session so repeated calls reuse the same TCP/TLS connections.
+    Every request goes through a RequestScheduler (rate limiting, 429 handling and retries).
+    With a ResponseCache, listing GETs are served from cache (revalidated with ETags) and writes invalidate them.
+    """
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, base_url=DEFAULT_BASE_URL, scheduler=None, cache=None):
+        self.pool_size = pool_size
+        self.base_url = base_url
+        self.scheduler = scheduler or RequestScheduler()
+        self.cache = cache
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def add_hook(self, hook):
+        """
+        Observe every request attempt, retry and throttle wait (see metrics.RequestHook).
+        """
+        self.scheduler.hooks.append(hook)
+
+    def _send(self, method, url, **kwargs):
+        return self.scheduler.send(method, lambda: self.session.request(method, url, **kwargs), url=url)
+
+    def request(self, method, url, **kwargs):
+        if self.cache is None:
+            return self._send(method, url, **kwargs)
+        if method.upper() == "GET":
+            return self._cached_get(url, **kwargs)
+        response = self._send(method, url, **kwargs)
+        self.cache.invalidate(url)
+        return response
+
+    def _cached_get(self, url, **kwargs):
+        resource = self.cache.resource_type(url)
+        if resource is None:
+            return self._send("GET", url, **kwargs)
+        key = self.cache.key(url, kwargs.get("params"))
+        cached, fresh = self.cache.lookup(key)
+        if fresh:
+            return cached
+        if cached is not None and cached.headers.get("ETag"):
+            # Conditional request: a 304 costs no body transfer and keeps the cached copy
+            kwargs["headers"] = dict(kwargs.get("headers") or {}, **{"If-None-Match": cached.headers["ETag"]})
+        response = self._send("GET", url, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            self.cache.refresh(key, resource)
+            return cached
+        if response.status_code == 200:
+            self.cache.store(key, response, resource)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def connection_stats(self):
+        """
+        Returns per-host connection reuse statistics, e.g.
+        {"api.bitbucket.org": {"requests": 120, "connections": 4, "reused": 116}}
+        """
+        stats = {}
+        adapters = {id(adapter): adapter for adapter in self.session.adapters.values()}
+        for adapter in adapters.values():
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                host = stats.setdefault(pool.host, {"requests": 0, "connections": 0, "reused": 0})
+                host["requests"] += pool.num_requests
+                host["connections"] += pool.num_connections
+        for host in stats.values():
+            host["reused"] = max(host["requests"] - host["connections"], 0)
+        return stats
+
+    def close(self):
+        self.session.close()
+
+
+def paginate(client, url, headers=None, params=None, pagelen=DEFAULT_PAGELEN, prefetch=False):
+    """
+    Lazily yield every item of a paginated Bitbucket list endpoint, following `next` links.
+    :param client: The shared BitbucketAPI client.
+    :param params: Query parameters for the first page (e.g. {"q": ...}); `next` links already carry them.
+    :param prefetch: Fetch the next page in the background while the caller consumes the current one.
+    :raises BitbucketAPIError: If any page cannot be fetched.
+    """
+    params = dict(params or {})
+    params.setdefault("pagelen", pagelen)
+
+    def fetch(page_url, page_params):
+        response = client.get(page_url, headers=headers, params=page_params)
+        if response.status_code != 200:
+            raise BitbucketAPIError(response)
+        return response.json()
+
+    if not prefetch:
+        page = fetch(url, params)
+        while True:
+            yield from page.get("values", [])
+            if not page.get("next"):
+                return
+            page = fetch(page["next"], None)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        future = pool.submit(fetch, url, params)
+        while future is not None:
+            page = future.result()
+            future = pool.submit(fetch, page["next"], None) if page.get("next") else None
+            yield from page.get("values", [])
 
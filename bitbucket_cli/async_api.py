@@ -0,0 +1,147 @@
+import json
+
+from .api import BitbucketAPIError, DEFAULT_BASE_URL, DEFAULT_PAGELEN
+from .ratelimit import AsyncRequestScheduler
+
+# One event loop can keep far more requests in flight than a thread pool
+DEFAULT_ASYNC_POOL_SIZE = 100
+
+
+def _import_aiohttp():
+    # Optional dependency (pip install bitbucket_cli[async]), and a slow import:
+    # only loaded once an async client is actually used.
+    try:
+        import aiohttp
+    except ImportError:
+        return None
+    return aiohttp
+
+
+def __getattr__(name):
+    # `async_api.aiohttp` is the aiohttp module, or None when it is not installed
+    if name == "aiohttp":
+        return _import_aiohttp()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class AsyncResponse:
+    """
+    Fully read HTTP response exposing the part of requests.Response the resource classes use
+    (status_code, headers, text and json()), so sync and async classes share their result parsing.
+    """
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class AsyncBitbucketAPI:
+    """
+    asyncio counterpart of BitbucketAPI: one aiohttp connection pool shared by every async resource class.
+    Requests go through an AsyncRequestScheduler (rate limiting, 429 handling and retries).
+    """
+    def __init__(self, pool_size=DEFAULT_ASYNC_POOL_SIZE, base_url=DEFAULT_BASE_URL, scheduler=None):
+        import asyncio
+
+        aiohttp = self.aiohttp = _import_aiohttp()
+        if aiohttp is None:
+            raise ImportError("The async client requires aiohttp. Install it with: pip install aiohttp")
+        self.pool_size = pool_size
+        self.base_url = base_url
+        self.scheduler = scheduler or AsyncRequestScheduler(
+            retry_exceptions=(aiohttp.ClientConnectionError, asyncio.TimeoutError)
+        )
+        self.session = None
+
+    def _get_session(self):
+        # The session must be created inside the running event loop
+        if self.session is None or self.session.closed:
+            self.session = self.aiohttp.ClientSession(connector=self.aiohttp.TCPConnector(limit=self.pool_size))
+        return self.session
+
+    async def request(self, method, url, headers=None, params=None, json=None, data=None, files=None):
+        if files:
+            # Multipart upload, same shape as requests' data=/files= arguments
+            form = self.aiohttp.FormData()
+            for key, value in (data or {}).items():
+                form.add_field(key, str(value))
+            for field, (filename, content) in files.items():
+                form.add_field(field, content, filename=filename)
+            data = form
+
+        async def send():
+            session = self._get_session()
+            async with session.request(method, url, headers=headers, params=params, json=json, data=data) as response:
+                content = await response.read()
+                return AsyncResponse(response.status, response.headers, content)
+
+        return await self.scheduler.send(method, send, url=url)
+
+    def add_hook(self, hook):
+        """
+        Observe every request attempt, retry and throttle wait (see metrics.RequestHook).
+        """
+        self.scheduler.hooks.append(hook)
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url, **kwargs):
+        return await self.request("PUT", url, **kwargs)
+
+    async def delete(self, url, **kwargs):
+        return await self.request("DELETE", url, **kwargs)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+async def apaginate(client, url, headers=None, params=None, pagelen=DEFAULT_PAGELEN, prefetch=False):
+    """
+    Async generator counterpart of api.paginate.
+    :raises BitbucketAPIError: If any page cannot be fetched.
+    """
+    import asyncio
+
+    params = dict(params or {})
+    params.setdefault("pagelen", pagelen)
+
+    async def fetch(page_url, page_params):
+        response = await client.get(page_url, headers=headers, params=page_params)
+        if response.status_code != 200:
+            raise BitbucketAPIError(response)
+        return response.json()
+
+    page = await fetch(url, params)
+    next_page = None
+    try:
+        while True:
+            next_page = None
+            if prefetch and page.get("next"):
+                next_page = asyncio.ensure_future(fetch(page["next"], None))
+            for item in page.get("values", []):
+                yield item
+            if not page.get("next"):
+                return
+            page = await next_page if next_page is not None else await fetch(page["next"], None)
+    finally:
+        # Stop the background fetch if the caller stops iterating early, closed or simply dropped
+        if next_page is not None and not next_page.done():
+            next_page.cancel()
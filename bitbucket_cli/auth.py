@@ -1,22 +1,83 @@
 import base64
 import os
-from dotenv import load_dotenv
 
-# Load environment variables from the .env file
-load_dotenv()
+from .api import BitbucketAPI, DEFAULT_POOL_SIZE, api_base_url
+from .cache import ResponseCache, DEFAULT_CACHE_SIZE
+from .env import load_env
+from .ratelimit import RequestScheduler, DEFAULT_MAX_RETRIES
+
+def _basic_headers(username, app_password):
+    credentials = f"{username}:{app_password}"
+    encoded_credentials = base64.b64encode(credentials.encode("utf-8")).decode("utf-8")
+    return {
+        "Authorization": f"Basic {encoded_credentials}",
+        "Content-Type": "application/json"
+    }
 
 class BitbucketAuth:
-    def __init__(self):
+    def __init__(self, client=None, pool_size=None):
+        # Load environment variables from the .env file
+        load_env()
         self.username = os.getenv("BITBUCKET_USERNAME")
         self.app_password = os.getenv("BITBUCKET_APP_PASSWORD")
+        self.client_id = os.getenv("BITBUCKET_CLIENT_ID")
+        self.client_secret = os.getenv("BITBUCKET_CLIENT_SECRET")
+        if client is None:
+            # Pool size can be tuned with BITBUCKET_POOL_SIZE for large bulk jobs
+            pool_size = pool_size or os.getenv("BITBUCKET_POOL_SIZE")
+            client = BitbucketAPI(
+                pool_size=int(pool_size) if pool_size else DEFAULT_POOL_SIZE,
+                base_url=api_base_url(),
+                scheduler=self._scheduler_from_env(),
+                cache=self._cache_from_env()
+            )
+        # Shared HTTP client, injected into every resource class through this object
+        self.client = client
+        self._async_client = None
+        # An app password wins; OAuth is used when only the consumer key and secret are configured
+        self.oauth = None
+        if self.client_id and self.client_secret and not self.app_password:
+            from .oauth import OAuthTokenManager
+            self.oauth = OAuthTokenManager(self.client_id, self.client_secret,
+                                           session=getattr(client, "session", None))
+        # Built once: get_headers() is called for every request
+        self._headers = _basic_headers(self.username, self.app_password)
+
+    @property
+    def async_client(self):
+        """
+        Shared AsyncBitbucketAPI for the Async* resource classes, created on first use.
+        """
+        if self._async_client is None:
+            from .async_api import AsyncBitbucketAPI
+            self._async_client = AsyncBitbucketAPI(base_url=api_base_url())
+        return self._async_client
+
+    @staticmethod
+    def _scheduler_from_env():
+        # BITBUCKET_RATE_LIMIT is in requests/hour; leave it unset to only react to 429 responses
+        rate = os.getenv("BITBUCKET_RATE_LIMIT")
+        burst = os.getenv("BITBUCKET_RATE_BURST")
+        max_retries = os.getenv("BITBUCKET_MAX_RETRIES")
+        return RequestScheduler(
+            rate_per_hour=float(rate) if rate else None,
+            burst=float(burst) if burst else None,
+            max_retries=int(max_retries) if max_retries else DEFAULT_MAX_RETRIES
+        )
+
+    @staticmethod
+    def _cache_from_env():
+        # BITBUCKET_CACHE_SIZE=0 disables the listing cache
+        size = os.getenv("BITBUCKET_CACHE_SIZE")
+        size = int(size) if size else DEFAULT_CACHE_SIZE
+        return ResponseCache(maxsize=size) if size > 0 else None
 
     def get_headers(self):
         """
-        Returns the authentication headers for Bitbucket API requests.
+        Returns the authentication headers for Bitbucket API requests: a Bearer token with OAuth
+        (refreshed ahead of expiry, see oauth.OAuthTokenManager), Basic credentials otherwise.
+        The same dict is returned until the credentials change; copy it before modifying it.
         """
-        credentials = f"{self.username}:{self.app_password}"
-        encoded_credentials = base64.b64encode(credentials.encode("utf-8")).decode("utf-8")
-        return {
-            "Authorization": f"Basic {encoded_credentials}",
-            "Content-Type": "application/json"
-        }
+        if self.oauth is not None:
+            return self.oauth.headers()
+        return self._headers
@@ -1,24 +1,88 @@
-import requests
+from .api import api_base_url, paginate
+
+def _protect_branch_payload(branch_name):
+    return {
+        "kind": "push",
+        "pattern": branch_name,
+        "users": [],
+        "groups": [],
+        "value": None
+    }
+
+def _protect_branch_result(response, repo_slug, branch_name):
+    if response.status_code in (200, 201):
+        return {"success": True, "message": f"Branch '{branch_name}' protected in '{repo_slug}'."}
+    else:
+        return {"success": False, "message": response.text}
+
+def _restriction_result(response, repo_slug, restriction):
+    if response.status_code in (200, 201):
+        return {"success": True, "message": f"Restriction '{restriction['kind']}' on '{restriction['pattern']}' "
+                                            f"applied in '{repo_slug}'."}
+    else:
+        return {"success": False, "message": response.text}
 
 class BitbucketBranchPermissions:
     def __init__(self, auth):
         self.auth = auth
-        self.base_url = "https://api.bitbucket.org/2.0"
+        self.client = auth.client
+        self.base_url = api_base_url()
 
     def protect_branch(self, workspace, repo_slug, branch_name="main"):
         """
         Protect a branch so only pull requests can update it (no direct pushes).
         """
         url = f"{self.base_url}/repositories/{workspace}/{repo_slug}/branch-restrictions"
-        payload = {
-            "kind": "push",
-            "pattern": branch_name,
-            "users": [],
-            "groups": [],
-            "value": None
-        }
-        response = requests.post(url, headers=self.auth.get_headers(), json=payload)
-        if response.status_code in (200, 201):
-            return {"success": True, "message": f"Branch '{branch_name}' protected in '{repo_slug}'."}
-        else:
-            return {"success": False, "message": response.text}
+        response = self.client.post(url, headers=self.auth.get_headers(), json=_protect_branch_payload(branch_name))
+        return _protect_branch_result(response, repo_slug, branch_name)
+
+    def configure_branch_permission(self, workspace, repo_slug, branch_name, exempt_user=None):
+        """
+        Restrict direct pushes to a branch, optionally letting one user still push.
+        An existing push restriction on the same branch is updated instead of duplicated.
+        """
+        from .branch_policies import apply_branch_template
+
+        template = {"patterns": [branch_name], "push": True, "exempt_users": [exempt_user] if exempt_user else []}
+        return apply_branch_template(self, workspace, repo_slug, template)
+
+    def create_branch_restriction(self, workspace, repo_slug, restriction):
+        """
+        Add a branch restriction (a payload of the branch-restrictions endpoint).
+        """
+        url = f"{self.base_url}/repositories/{workspace}/{repo_slug}/branch-restrictions"
+        response = self.client.post(url, headers=self.auth.get_headers(), json=restriction)
+        return _restriction_result(response, repo_slug, restriction)
+
+    def update_branch_restriction(self, workspace, repo_slug, restriction_id, restriction):
+        """
+        Replace the users, groups or value of an existing branch restriction.
+        """
+        url = f"{self.base_url}/repositories/{workspace}/{repo_slug}/branch-restrictions/{restriction_id}"
+        response = self.client.put(url, headers=self.auth.get_headers(), json=restriction)
+        return _restriction_result(response, repo_slug, restriction)
+
+    def iter_branch_restrictions(self, workspace, repo_slug, prefetch=False):
+        """
+        Lazily yield every branch restriction of a repository.
+        Raises BitbucketAPIError if a page cannot be fetched.
+        """
+        url = f"{self.base_url}/repositories/{workspace}/{repo_slug}/branch-restrictions"
+        yield from paginate(self.client, url, headers=self.auth.get_headers(), prefetch=prefetch)
+
+class AsyncBitbucketBranchPermissions:
+    """
+    asyncio counterpart of BitbucketBranchPermissions; returns the same result dicts.
+    """
+    def __init__(self, auth, client=None):
+        self.auth = auth
+        self.client = client or auth.async_client
+        self.base_url = api_base_url()
+
+    async def protect_branch(self, workspace, repo_slug, branch_name="main"):
+        """
+        Protect a branch so only pull requests can update it (no direct pushes).
+        """
+        url = f"{self.base_url}/repositories/{workspace}/{repo_slug}/branch-restrictions"
+        response = await self.client.post(url, headers=self.auth.get_headers(), json=_protect_branch_payload(branch_name))
+        return _protect_branch_result(response, repo_slug, branch_name)
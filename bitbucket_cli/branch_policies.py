@@ -0,0 +1,280 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from .api import BitbucketAPIError
+from .executor import DEFAULT_WORKERS
+from .permissions import list_rule_repositories, rule_selects
+from .rules import ManifestError, as_list
+
+# Template keys that restrict who may do something on matching branches, and the restriction kind they map to.
+# Their users and groups (or the template's exempt_users/exempt_groups) are the ones still allowed.
+ACCESS_RESTRICTIONS = {"push": "push", "merge": "restrict_merges"}
+# Template flags that forbid something outright
+FLAG_RESTRICTIONS = {"prevent_force_push": "force", "prevent_delete": "delete"}
+# Template numbers that gate pull request merges
+VALUE_RESTRICTIONS = {
+    "required_approvals": "require_approvals_to_merge",
+    "required_default_reviewer_approvals": "require_default_reviewer_approvals_to_merge",
+    "required_passing_builds": "require_passing_builds_to_merge",
+}
+TEMPLATE_KEYS = {"patterns", "exempt_users", "exempt_groups", *ACCESS_RESTRICTIONS, *FLAG_RESTRICTIONS,
+                 *VALUE_RESTRICTIONS}
+
+BUILTIN_TEMPLATES = {
+    # What bulk creation applies to 'main': pull requests only
+    "pr-only": {"patterns": ["main"], "push": True},
+    "hardened": {
+        "patterns": ["main", "release/*"],
+        "push": True,
+        "prevent_force_push": True,
+        "prevent_delete": True,
+        "required_approvals": 2,
+    },
+}
+
+
+def _user_reference(name):
+    # Templates name a user by nickname, or by uuid ("{...}")
+    return {"uuid": name} if name.startswith("{") else {"username": name}
+
+
+def _user_identifiers(user):
+    # Users listed by the API carry a nickname and a uuid but no username; desired ones carry one of them
+    return [user[key] for key in ("uuid", "nickname", "username") if user.get(key)]
+
+
+def template_restrictions(template):
+    """
+    The branch-restrictions payloads a template asks for, one per restriction kind and pattern.
+    :raises ManifestError: If the template has unknown keys or no patterns.
+    """
+    if not isinstance(template, dict):
+        raise ManifestError("A branch template must be a mapping.")
+    unknown = set(template) - TEMPLATE_KEYS
+    if unknown:
+        raise ManifestError(f"Unknown branch template key(s): {', '.join(sorted(unknown))}.")
+    patterns = as_list(template.get("patterns"))
+    if not patterns:
+        raise ManifestError("A branch template needs at least one pattern.")
+
+    kinds = []
+    for key, kind in ACCESS_RESTRICTIONS.items():
+        setting = template.get(key)
+        if not setting:
+            continue
+        allowed = setting if isinstance(setting, dict) else {}
+        users = as_list(allowed.get("users", template.get("exempt_users")))
+        groups = as_list(allowed.get("groups", template.get("exempt_groups")))
+        kinds.append({"kind": kind, "users": [_user_reference(u) for u in users],
+                      "groups": [{"slug": g} for g in groups]})
+    for key, kind in FLAG_RESTRICTIONS.items():
+        if template.get(key):
+            kinds.append({"kind": kind})
+    for key, kind in VALUE_RESTRICTIONS.items():
+        if template.get(key):
+            kinds.append({"kind": kind, "value": int(template[key])})
+
+    return [
+        dict({"users": [], "groups": [], "value": None}, **kind, branch_match_kind="glob", pattern=pattern)
+        for pattern in patterns for kind in kinds
+    ]
+
+
+def _restriction_key(restriction):
+    return restriction["kind"], restriction.get("branch_match_kind", "glob"), restriction.get("pattern")
+
+
+def _restriction_state(restriction, names):
+    """
+    What a restriction enforces. Each user is reduced to one identifier: the one among `names` (the identifiers
+    the template uses) if it has it, its uuid otherwise, so a listed user matches the nickname or uuid asked for.
+    """
+    users = []
+    for user in restriction.get("users") or []:
+        identifiers = _user_identifiers(user)
+        users.append(next((i for i in identifiers if i in names), identifiers[0] if identifiers else None))
+    return (
+        restriction.get("value"),
+        sorted(users, key=str),
+        sorted(group.get("slug") for group in restriction.get("groups") or []),
+    )
+
+
+def plan_restriction_changes(desired, existing):
+    """
+    Compare the restrictions a template asks for with the ones a repository has.
+    Restrictions that are not part of the template are left alone.
+    :return: (changes, unchanged) where each change is {"action": "create"|"update", "restriction", "id"}.
+    """
+    by_key = {_restriction_key(restriction): restriction for restriction in existing}
+    changes = []
+    unchanged = 0
+    for restriction in desired:
+        current = by_key.get(_restriction_key(restriction))
+        names = {i for user in restriction.get("users") or [] for i in _user_identifiers(user)}
+        if current is None:
+            changes.append({"action": "create", "restriction": restriction, "id": None})
+        elif _restriction_state(current, names) != _restriction_state(restriction, names):
+            changes.append({"action": "update", "restriction": restriction, "id": current["id"]})
+        else:
+            unchanged += 1
+    return changes, unchanged
+
+
+def _apply_change(branch_api, workspace, repo_slug, change):
+    restriction = change["restriction"]
+    try:
+        if change["action"] == "create":
+            result = branch_api.create_branch_restriction(workspace, repo_slug, restriction)
+        else:
+            result = branch_api.update_branch_restriction(workspace, repo_slug, change["id"], restriction)
+    except Exception as e:
+        result = {"success": False, "message": str(e)}
+    return {"repo": repo_slug, "action": change["action"], "kind": restriction["kind"],
+            "pattern": restriction["pattern"], "success": result["success"], "message": result["message"]}
+
+
+def apply_branch_template(branch_api, workspace, repo_slug, template):
+    """
+    Apply one template to one repository: one listing of its restrictions, then only the missing changes.
+    :return: {"success", "message", "changes"}.
+    """
+    try:
+        changes, unchanged = plan_restriction_changes(
+            template_restrictions(template), list(branch_api.iter_branch_restrictions(workspace, repo_slug))
+        )
+    except BitbucketAPIError as e:
+        return {"success": False, "message": e.response.text, "changes": []}
+    results = [_apply_change(branch_api, workspace, repo_slug, change) for change in changes]
+    failed = [result["message"] for result in results if not result["success"]]
+    if failed:
+        return {"success": False, "message": "; ".join(failed), "changes": results}
+    message = f"{len(results)} restriction(s) applied in '{repo_slug}', {unchanged} already in place."
+    return {"success": True, "message": message, "changes": results}
+
+
+def normalize_policies(policies, templates):
+    """
+    Resolve the template of every policy ({"template", "repositories", "projects"}) against the
+    manifest's templates and the built-in ones.
+    :return: A list of {"template": name, "restrictions": [...], "repositories", "projects"}.
+    :raises ManifestError: If a policy names an unknown template or selects no repositories.
+    """
+    templates = dict(BUILTIN_TEMPLATES, **(templates or {}))
+    normalized = []
+    for number, policy in enumerate(policies or [], 1):
+        if not isinstance(policy, dict) or policy.get("template") not in templates:
+            raise ManifestError(
+                f"Branch policy {number} must name one of the templates: {', '.join(sorted(templates))}."
+            )
+        entry = {
+            "template": policy["template"],
+            "restrictions": template_restrictions(templates[policy["template"]]),
+            "repositories": as_list(policy.get("repositories")),
+            "projects": as_list(policy.get("projects")),
+        }
+        if not entry["repositories"] and not entry["projects"]:
+            raise ManifestError(f"Branch policy {number} needs 'repositories' or 'projects'.")
+        normalized.append(entry)
+    return normalized
+
+
+def apply_branch_policies(branch_api, repos_api, workspace, policies, templates=None, workers=DEFAULT_WORKERS,
+                          dry_run=False, inventory=None):
+    """
+    Apply branch templates across many repositories with the fewest calls: one repository listing,
+    one restriction listing per selected repository (concurrently), then only the missing creates and
+    updates, concurrently. When several policies select a repository, later ones win for the same
+    restriction kind and pattern. With an `inventory` (see inventory.Inventory) the repositories and
+    their restrictions are read from it instead of the API.
+    :return: (results, unchanged); with dry_run the planned changes are returned without "success".
+    :raises BitbucketAPIError: If the repositories or their restrictions cannot be listed.
+    """
+    policies = normalize_policies(policies, templates)
+    desired = {}
+    for repo in list_rule_repositories(inventory or repos_api, workspace, policies):
+        for policy in policies:
+            if rule_selects(policy, repo):
+                for restriction in policy["restrictions"]:
+                    desired.setdefault(repo["slug"], {})[_restriction_key(restriction)] = restriction
+
+    repo_slugs = sorted(desired)
+    reader = inventory or branch_api
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        listings = pool.map(lambda slug: list(reader.iter_branch_restrictions(workspace, slug, prefetch=True)),
+                            repo_slugs)
+        existing = dict(zip(repo_slugs, listings))
+
+    changes, unchanged = [], 0
+    for repo_slug in repo_slugs:
+        repo_changes, repo_unchanged = plan_restriction_changes(desired[repo_slug].values(), existing[repo_slug])
+        changes.extend((repo_slug, change) for change in repo_changes)
+        unchanged += repo_unchanged
+    if dry_run:
+        return [{"repo": slug, "action": change["action"], "kind": change["restriction"]["kind"],
+                 "pattern": change["restriction"]["pattern"]} for slug, change in changes], unchanged
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(lambda item: _apply_change(branch_api, workspace, *item), changes))
+    return results, unchanged
+
+
+def format_branch_policy_summary(results, unchanged):
+    from colorama import Fore
+
+    lines = []
+    for result in results:
+        target = f"{result['kind']} on '{result['pattern']}' in '{result['repo']}'"
+        if "success" not in result:
+            lines.append(f"{Fore.CYAN}~ {result['action']} {target}")
+        elif not result["success"]:
+            lines.append(f"{Fore.RED}Failed to {result['action']} {target}: {result['message']}")
+    if results and "success" not in results[0]:
+        lines.append(f"{Fore.CYAN}Plan: {len(results)} change(s), {unchanged} restriction(s) already in place.")
+        return lines
+    created = sum(1 for r in results if r["success"] and r["action"] == "create")
+    updated = sum(1 for r in results if r["success"] and r["action"] == "update")
+    failed = sum(1 for r in results if not r["success"])
+    lines.append(f"{Fore.GREEN if not failed else Fore.YELLOW}Branch restrictions: {created} created, "
+                 f"{updated} updated, {unchanged} unchanged, {failed} failed.")
+    return lines
+
+
+def bulk_apply_branch_policies(branch_api, repos_api, yaml_file_path, workspace, workers=DEFAULT_WORKERS,
+                               dry_run=False, inventory=None):
+    """
+    Apply the `branch_policies:` of a YAML manifest, using its `branch_templates:` and the built-in templates
+    (pr-only, hardened):
+
+        branch_templates:
+          release:
+            patterns: [main, "release/*"]
+            push: {groups: [release-managers]}   # only they may push; `true` lets nobody push
+            merge: true                          # restrict_merges, with exempt_users/exempt_groups allowed
+            prevent_force_push: true
+            prevent_delete: true
+            required_approvals: 2
+            exempt_users: [release-bot]
+        branch_policies:
+          - template: release
+            projects: [PROJ1]
+            repositories: ["web-*"]
+
+    :return: The result of apply_branch_policies, or None if the manifest or the listings could not be read.
+    """
+    from colorama import Fore
+
+    from .manifest import load_section, run_manifest_command
+
+    def command():
+        policies = load_section(yaml_file_path, "branch_policies")
+        if not policies:
+            print(f"{Fore.YELLOW}No 'branch_policies' section in '{yaml_file_path}'.")
+            return [], 0
+        templates = load_section(yaml_file_path, "branch_templates", {})
+        results, unchanged = apply_branch_policies(branch_api, repos_api, workspace, policies, templates,
+                                                   workers=workers, dry_run=dry_run, inventory=inventory)
+        for line in format_branch_policy_summary(results, unchanged):
+            print(line)
+        return results, unchanged
+
+    return run_manifest_command(yaml_file_path, command, "Failed to read branch restrictions")
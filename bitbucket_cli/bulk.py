@@ -1,138 +1,281 @@
 import yaml
 from colorama import Fore
-import requests
 
-def bulk_create_projects_and_repositories(projects_api, repos_api, branch_api, yaml_file_path, workspace, debug=False):
-    try:
-        with open(yaml_file_path, "r") as file:
-            data = yaml.safe_load(file)
+from .executor import BulkExecutor, BufferedReport, DEFAULT_WORKERS
+from .journal import BulkJournal, default_journal_path
+from .manifest import ManifestError, iter_manifest
+from .metrics import slowest_steps
+from .rules import as_list
+
+def create_project_task(projects_api, workspace, project_key, name, description, report):
+    def task():
+        report.add(f"{Fore.CYAN}Creating project: {name} (Key: {project_key})")
+        project_result = projects_api.create_project(workspace, project_key, name, description)
+        if project_result["success"]:
+            report.add(f"{Fore.GREEN}{project_result['message']}")
+        elif "already exists" in project_result["message"]:
+            report.add(f"{Fore.YELLOW}{project_result['message']}")
+        else:
+            report.add(f"{Fore.RED}{project_result['message']}")
+            return False
+        return True
+    return task
 
-        for project_data in data.get("projects", []):
-            project_key = project_data["key"]
-            name = project_data["name"]
-            description = project_data.get("description", "")
+def create_repository_task(repos_api, workspace, project_key, repo_slug, is_private, report):
+    def task():
+        report.add(f"{Fore.CYAN}Creating repository: {repo_slug} in project {project_key}")
+        repo_result = repos_api.create_repository(workspace, project_key, repo_slug, is_private)
+        if repo_result["success"]:
+            report.add(f"{Fore.GREEN}{repo_result['message']}")
+            return True
+        elif "already exists" in repo_result["message"]:
+            report.add(f"{Fore.YELLOW}{repo_result['message']}")
+        else:
+            report.add(f"{Fore.RED}{repo_result['message']}")
+        return False
+    return task
 
-            print(f"{Fore.CYAN}Creating project: {name} (Key: {project_key})")
-            project_result = projects_api.create_project(workspace, project_key, name, description)
+def initial_commit_task(repos_api, workspace, repo_slug, state, report):
+    def task():
+        # Initial commit to allow branch creation
+        commit_result = repos_api.create_initial_commit(workspace, repo_slug, branch="main")
+        if commit_result.get("success"):
+            # Branches are created from this commit without looking up 'main' again
+            state["commit"] = commit_result.get("commit")
+            report.add(f"{Fore.GREEN}  Initial file committed to '{repo_slug}'.")
+            # Kept in the journal, so a resumed run can still branch from this commit
+            return {"commit": state["commit"]}
+        report.add(f"{Fore.RED}  Failed to commit initial file to '{repo_slug}': {commit_result.get('message')}")
+        return False
+    return task
 
-            if project_result["success"]:
-                print(f"{Fore.GREEN}{project_result['message']}")
-            elif "already exists" in project_result["message"]:
-                print(f"{Fore.YELLOW}{project_result['message']}")
+def create_branches_task(repos_api, workspace, repo_slug, branch_list, state, report, journal=None,
+                         workers=DEFAULT_WORKERS):
+    def task():
+        result = repos_api.create_branches(workspace, repo_slug, branch_list, target_hash=state.get("commit"),
+                                           workers=workers)
+        for branch, branch_result in result["branches"].items():
+            # Hide the error if the branch already exists
+            error_message = branch_result.get('message', '')
+            if branch_result.get("already_exists"):
+                created = True
+            elif branch_result.get("success"):
+                created = True
+                report.add(f"{Fore.GREEN}  Branch '{branch}' created.")
+            elif "BRANCH_ALREADY_EXISTS" in error_message or f"Branch \"{branch}\" already exists" in error_message:
+                # Silently skip or optionally print a yellow info message
+                created = True
             else:
-                print(f"{Fore.RED}{project_result['message']}")
-                continue
-
-            for repo_data in project_data.get("repositories", []):
-                repo_slug = repo_data["slug"]
-                is_private = repo_data.get("is_private", True)
-                branches = repo_data.get("branches", "")
-                print(f"{Fore.CYAN}Creating repository: {repo_slug} in project {project_key}")
-                repo_result = repos_api.create_repository(workspace, project_key, repo_slug, is_private)
-                if repo_result["success"]:
-                    print(f"{Fore.GREEN}{repo_result['message']}")
-                    # Initial commit to allow branch creation
-                    commit_result = repos_api.push_initial_commit(workspace, repo_slug, branch="main")
-                    if commit_result.get("success"):
-                        print(f"{Fore.GREEN}  Initial file committed to '{repo_slug}'.")
-                    else:
-                        print(f"{Fore.RED}  Failed to commit initial file to '{repo_slug}': {commit_result.get('message')}")
-                    # Branch creation logic
-                    if branches:
-                        branch_list = []
-                        if isinstance(branches, str):
-                            branch_list = [b.strip() for b in branches.split(";") if b.strip()]
-                        elif isinstance(branches, list):
-                            branch_list = branches
-                        for branch in branch_list:
-                            branch_result = repos_api.create_branch(workspace, repo_slug, branch)
-                            # Hide the error if the branch already exists
-                            error_message = branch_result.get('message', '')
-                            if branch_result.get("success"):
-                                print(f"{Fore.GREEN}  Branch '{branch}' created.")
-                            elif "BRANCH_ALREADY_EXISTS" in error_message or "Branch \"main\" already exists" in error_message:
-                                # Silently skip or optionally print a yellow info message
-                                pass
-                            else:
-                                print(f"{Fore.RED}  Failed to create branch '{branch}': {error_message}")
-                    # Protect the main branch if it was created
-                    if branch_list and "main" in branch_list:
-                        # Optionally, add this check before protecting the branch
-                        branch_check_url = f"https://api.bitbucket.org/2.0/repositories/{workspace}/{repo_slug}/refs/branches/main"
-                        branch_check_resp = requests.get(branch_check_url, headers=branch_api.auth.get_headers())
-                        if branch_check_resp.status_code == 200:
-                            protect_result = branch_api.protect_branch(workspace, repo_slug, branch_name="main")
-                            if protect_result.get("success"):
-                                print(f"{Fore.GREEN}  Branch 'main' protected (PRs required).")
-                            else:
-                                print(f"{Fore.RED}  Failed to protect 'main': {protect_result.get('message')}")
-                        else:
-                            print(f"{Fore.RED}  Main branch does not exist yet in '{repo_slug}'. Cannot apply protection.")
-                elif "already exists" in repo_result["message"]:
-                    print(f"{Fore.YELLOW}{repo_result['message']}")
-                else:
-                    print(f"{Fore.RED}{repo_result['message']}")
+                created = False
+                report.add(f"{Fore.RED}  Failed to create branch '{branch}': {error_message}")
+            if created and journal is not None:
+                journal.record(("branch", repo_slug, branch))
+        return result["success"]
+    return task
+
+def protect_main_task(branch_api, workspace, repo_slug, report):
+    def task():
+        # 'main' is guaranteed to exist once the initial commit succeeded
+        protect_result = branch_api.protect_branch(workspace, repo_slug, branch_name="main")
+        if protect_result.get("success"):
+            report.add(f"{Fore.GREEN}  Branch 'main' protected (PRs required).")
+            return True
+        report.add(f"{Fore.RED}  Failed to protect 'main': {protect_result.get('message')}")
+        return False
+    return task
+
+def _print_journal_summary(executor, journal):
+    if executor.resumed:
+        print(f"{Fore.CYAN}Skipped {len(executor.resumed)} step(s) already completed in '{journal.path}'.")
+    if any(state != "done" for state in executor.status.values()):
+        print(f"{Fore.YELLOW}Some steps did not complete. Run again with --resume to continue from '{journal.path}'.")
+
+def _print_profile(executor):
+    print(f"{Fore.CYAN}Slowest steps per repository:")
+    for line in slowest_steps(executor):
+        print(line)
+
+def bulk_create_projects_and_repositories(projects_api, repos_api, branch_api, yaml_file_path, workspace, debug=False,
+                                          workers=DEFAULT_WORKERS, journal_path=None, resume=False, profile=False):
+    """
+    Create projects, repositories, branches and protections from a manifest (YAML, JSON Lines or CSV).
+    The manifest is streamed (see manifest.iter_manifest): API calls start while it is still being read.
+    Each step is a node in a dependency graph (project -> repo -> initial commit -> branches/protection)
+    and independent nodes run concurrently on `workers` threads. Output is buffered per repository.
+    Completed steps are appended to a journal (default: <yaml_file_path>.create.journal);
+    with `resume=True` the steps it lists are skipped without any API call.
+    With `profile=True` the slowest steps per repository are printed at the end.
+    :return: A dict mapping step name to 'done', 'failed' or 'skipped', or None if the manifest could not be read.
+    """
+    try:
+        records = iter_manifest(yaml_file_path)
+        journal = BulkJournal(journal_path or default_journal_path(yaml_file_path, "create"), workspace, resume=resume)
+        executor = BulkExecutor(workers=workers, journal=journal)
+        reports = {}
+
+        def feed():
+            # Tasks are added record by record while the executor already works on earlier ones
+            for kind, record in records:
+                if kind == "project":
+                    project_key = record["key"]
+                    report = reports[project_key] = BufferedReport()
+                    executor.add(
+                        ("project", project_key),
+                        create_project_task(projects_api, workspace, project_key, record["name"],
+                                             record["description"], report),
+                        group=project_key
+                    )
+                    executor.close_group(project_key)
+                    yield
+                    continue
+
+                project_key, repo_slug = record["project"], record["slug"]
+                branch_list = as_list(record["branches"])
+                group = (project_key, repo_slug)
+                report = reports[group] = BufferedReport()
+
+                repo_task = executor.add(
+                    ("repo", repo_slug),
+                    create_repository_task(repos_api, workspace, project_key, repo_slug, record["is_private"], report),
+                    deps=[("project", project_key)], group=group
+                )
+                # A resumed run branches from the commit recorded by the earlier run
+                state = dict(journal.get(("commit", repo_slug)) or {})
+                commit_task = executor.add(
+                    ("commit", repo_slug),
+                    initial_commit_task(repos_api, workspace, repo_slug, state, report),
+                    deps=[repo_task], group=group
+                )
+                # Each created branch is journaled on its own, so branches added to the manifest since
+                # the last run are still created on --resume
+                pending_branches = [b for b in branch_list if not journal.done(("branch", repo_slug, b))]
+                if pending_branches:
+                    executor.add(
+                        ("branches", repo_slug),
+                        create_branches_task(repos_api, workspace, repo_slug, pending_branches, state, report, journal,
+                                             workers=workers),
+                        deps=[commit_task], group=group, journaled=False
+                    )
+                # Protect the main branch if it was created
+                if "main" in branch_list:
+                    executor.add(
+                        ("protect", repo_slug, "main"),
+                        protect_main_task(branch_api, workspace, repo_slug, report),
+                        deps=[commit_task], group=group
+                    )
+                executor.close_group(group)
+                yield
+
+        def on_error(name, group, error):
+            reports[group].add(f"{Fore.RED}  Unexpected error in step {name[0]} for '{name[1]}': {error}")
+
+        with journal:
+            executor.run(on_group_done=lambda group: reports[group].flush(), on_error=on_error, feed=feed())
+        _print_journal_summary(executor, journal)
+        if profile:
+            _print_profile(executor)
         print(f"{Fore.GREEN}Bulk creation process completed successfully.")
+        return executor.status
     except FileNotFoundError:
         print(f"{Fore.RED}Error: File '{yaml_file_path}' not found.")
     except yaml.YAMLError as e:
         print(f"{Fore.RED}Error parsing YAML file: {e}")
+    except ManifestError as e:
+        print(f"{Fore.RED}Error reading manifest '{yaml_file_path}': {e}")
     except Exception as e:
         print(f"{Fore.RED}An unexpected error occurred during bulk creation: {e}")
 
-def bulk_delete_projects_and_repositories(projects_api, repos_api, yaml_file_path, workspace):
+def _delete_repository_task(repos_api, workspace, repo_slug, report):
+    def task():
+        # A repository that is already gone counts as deleted; any other failure keeps the step (and the
+        # project depending on it) out of the journal, so --resume tries again
+        deleted = repos_api.delete_repository(workspace, repo_slug, missing_ok=True)
+        if deleted:
+            report.add(f"{Fore.GREEN}    Repository '{repo_slug}' deleted (or already gone).")
+        else:
+            report.add(f"{Fore.RED}    Repository '{repo_slug}' could not be deleted.")
+        return deleted
+    return task
+
+def _delete_project_task(projects_api, workspace, project_key, report):
+    def task():
+        report.add(f"{Fore.CYAN}Deleting project: {project_key}")
+        project_deleted = projects_api.delete_project(workspace, project_key)
+        if project_deleted:
+            report.add(f"{Fore.GREEN}  Project '{project_key}' deleted successfully.")
+        else:
+            report.add(f"{Fore.YELLOW}  Project '{project_key}' could not be deleted or does not exist.")
+        return project_deleted
+    return task
+
+def bulk_delete_projects_and_repositories(projects_api, repos_api, yaml_file_path, workspace, workers=DEFAULT_WORKERS,
+                                          journal_path=None, resume=False, profile=False):
+    """
+    Delete the repositories and projects listed in a manifest (YAML, JSON Lines or CSV), streamed like
+    bulk_create_projects_and_repositories.
+    All repository deletions fan out over `workers` threads; each project is deleted
+    as soon as the last of its repositories is done.
+    Completed steps are journaled like in bulk_create_projects_and_repositories
+    (default: <yaml_file_path>.delete.journal).
+    :return: Same as bulk_create_projects_and_repositories.
+    """
     try:
-        with open(yaml_file_path, "r") as file:
-            data = yaml.safe_load(file)
-
-        for project_data in data.get("projects", []):
-            project_key = project_data["key"]
-            print(f"{Fore.CYAN}Deleting repositories in project: {project_key}")
-            for repo_data in project_data.get("repositories", []):
-                repo_slug = repo_data["slug"]
-                print(f"{Fore.CYAN}  Deleting repository: {repo_slug}")
-                result = repos_api.delete_repository(workspace, repo_slug)
-                if result:
-                    print(f"{Fore.GREEN}    Repository '{repo_slug}' deleted successfully.")
+        records = iter_manifest(yaml_file_path)
+        journal = BulkJournal(journal_path or default_journal_path(yaml_file_path, "delete"), workspace, resume=resume)
+        executor = BulkExecutor(workers=workers, journal=journal)
+        reports = {}
+        repo_tasks = {}
+
+        def close_project(project_key):
+            # The project goes once all of its repositories are done
+            executor.add(
+                ("project", project_key),
+                _delete_project_task(projects_api, workspace, project_key, reports[project_key]),
+                deps=repo_tasks.pop(project_key), group=project_key
+            )
+            executor.close_group(project_key)
+
+        def feed():
+            # Repository deletions start while the rest of the manifest is still being read
+            for kind, record in records:
+                if kind == "project":
+                    for project_key in list(repo_tasks):
+                        close_project(project_key)
+                    project_key = record["key"]
+                    report = reports[project_key] = BufferedReport()
+                    report.add(f"{Fore.CYAN}Deleting repositories in project: {project_key}")
+                    repo_tasks[project_key] = []
+                elif record["project"] in repo_tasks:
+                    repo_slug = record["slug"]
+                    repo_tasks[record["project"]].append(executor.add(
+                        ("repo", repo_slug),
+                        _delete_repository_task(repos_api, workspace, repo_slug, reports[record["project"]]),
+                        group=record["project"]
+                    ))
                 else:
-                    print(f"{Fore.YELLOW}    Repository '{repo_slug}' could not be deleted or does not exist.")
+                    raise ManifestError(
+                        f"Repository '{record['slug']}' must be listed right after its project '{record['project']}'."
+                    )
+                yield
+            for project_key in list(repo_tasks):
+                close_project(project_key)
+            yield
 
-            # Optionally, delete the project itself after deleting repos
-            print(f"{Fore.CYAN}Deleting project: {project_key}")
-            project_deleted = projects_api.delete_project(workspace, project_key)
-            if project_deleted:
-                print(f"{Fore.GREEN}  Project '{project_key}' deleted successfully.")
-            else:
-                print(f"{Fore.YELLOW}  Project '{project_key}' could not be deleted or does not exist.")
+        def on_error(name, group, error):
+            reports[group].add(f"{Fore.RED}  Unexpected error deleting {name[0]} '{name[1]}': {error}")
 
+        with journal:
+            executor.run(on_group_done=lambda group: reports[group].flush(), on_error=on_error, feed=feed())
+        _print_journal_summary(executor, journal)
+        if profile:
+            _print_profile(executor)
         print(f"{Fore.GREEN}Bulk deletion process completed successfully.")
+        return executor.status
     except FileNotFoundError:
         print(f"{Fore.RED}Error: File '{yaml_file_path}' not found.")
     except yaml.YAMLError as e:
         print(f"{Fore.RED}Error parsing YAML file: {e}")
+    except ManifestError as e:
+        print(f"{Fore.RED}Error reading manifest '{yaml_file_path}': {e}")
     except Exception as e:
         print(f"{Fore.RED}An unexpected error occurred during bulk deletion: {e}")
-
-class BitbucketBranchPermissions:
-    def __init__(self, auth):
-        self.auth = auth
-        self.base_url = "https://api.bitbucket.org/2.0"
-
-    def protect_branch(self, workspace, repo_slug, branch_name="main"):
-        """
-        Protect a branch so only pull requests can update it (no direct pushes).
-        """
-        url = f"{self.base_url}/repositories/{workspace}/{repo_slug}/branch-restrictions"
-        payload = {
-            "kind": "push",
-            "pattern": branch_name,
-            "users": [],
-            "groups": [],
-            "value": None
-        }
-        response = requests.post(url, headers=self.auth.get_headers(), json=payload)
-        if response.status_code in (200, 201):
-            return {"success": True, "message": f"Branch '{branch_name}' protected in '{repo_slug}'."}
-        else:
-            print(f"DEBUG: {response.status_code} {response.text}")  # Add this line
-            return {"success": False, "message": response.text}
\ No newline at end of file
@@ -0,0 +1,124 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+DEFAULT_CACHE_SIZE = 512
+# Seconds a listing is served without asking the API again, per resource type
+DEFAULT_TTLS = {
+    "repositories": 60,
+    "permissions": 30,
+    "members": 300,
+}
+
+# Listing endpoints that are safe to cache, by resource type
+CACHEABLE = [
+    (re.compile(r"/repositories/[^/]+/?$"), "repositories"),
+    (re.compile(r"/repositories/[^/]+/[^/]+/permissions-config/(users|groups)/?$"), "permissions"),
+    (re.compile(r"/workspaces/[^/]+/permissions/repositories/?$"), "permissions"),
+    (re.compile(r"/workspaces/[^/]+/members/?$"), "members"),
+]
+
+# Writes that change listings living under a different path: (write path, path template of stale listing)
+CROSS_INVALIDATIONS = [
+    (re.compile(r"/repositories/(?P<ws>[^/]+)/"), "/workspaces/{ws}/permissions/repositories"),
+    (re.compile(r"/workspaces/(?P<ws>[^/]+)/projects"), "/repositories/{ws}"),
+    (re.compile(r"/workspaces/(?P<ws>[^/]+)/projects"), "/workspaces/{ws}/permissions/repositories"),
+    (re.compile(r"/workspaces/(?P<ws>[^/]+)/permissions/groups"), "/workspaces/{ws}/members"),
+]
+
+
+def _related(path, other):
+    # True if one path is the other or one of its ancestors
+    path, other = path.rstrip("/"), other.rstrip("/")
+    return path == other or path.startswith(other + "/") or other.startswith(path + "/")
+
+
+def _base_path(path):
+    # Strip the API version prefix (/2.0) so the patterns work for any base URL
+    return re.sub(r"^/[0-9.]+(?=/)", "", path)
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache of GET responses for listing endpoints, with a TTL per resource type.
+    Expired entries are kept for ETag revalidation until evicted.
+    Any write (POST/PUT/DELETE) drops the cached listings it affects.
+    """
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, ttls=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+    @staticmethod
+    def resource_type(url):
+        path = _base_path(urlsplit(url).path)
+        for pattern, resource in CACHEABLE:
+            if pattern.search(path):
+                return resource
+        return None
+
+    @staticmethod
+    def key(url, params=None):
+        return (url, tuple(sorted((params or {}).items())))
+
+    def lookup(self, key):
+        """
+        Returns (response, fresh) for a cached key, or (None, False).
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            self.entries.move_to_end(key)
+            fresh = entry["expires"] > self.clock()
+            if fresh:
+                self.hits += 1
+            return entry["response"], fresh
+
+    def store(self, key, response, resource):
+        with self.lock:
+            self.entries[key] = {
+                "response": response,
+                "path": _base_path(urlsplit(key[0]).path),
+                "expires": self.clock() + self.ttls.get(resource, 0),
+            }
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def refresh(self, key, resource):
+        # A 304 Not Modified confirmed the cached copy
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry["expires"] = self.clock() + self.ttls.get(resource, 0)
+                self.revalidated += 1
+
+    def invalidate(self, url):
+        """
+        Drop every cached listing affected by a write to `url`.
+        """
+        path = _base_path(urlsplit(url).path)
+        stale = [path]
+        for pattern, template in CROSS_INVALIDATIONS:
+            match = pattern.search(path)
+            if match:
+                stale.append(template.format(**match.groupdict()))
+        with self.lock:
+            for key in [key for key, entry in self.entries.items() if any(_related(entry["path"], p) for p in stale)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses, "revalidated": self.revalidated}
@@ -1,114 +1,288 @@
+import argparse
+import importlib
 import os
-from dotenv import load_dotenv
+import sys
 from colorama import Fore, init
 
-from .auth import BitbucketAuth
-from .projects import BitbucketProjects
-from .repositories import BitbucketRepositories
-from .users import BitbucketUsers
-from .branch_permissions import BitbucketBranchPermissions
-from .bulk import bulk_create_projects_and_repositories, bulk_delete_projects_and_repositories
+from .commands import OUTPUT_FORMATS, add_subcommands, run_command
+from .env import load_env
+from .executor import DEFAULT_WORKERS
 
 init(autoreset=True)
 
-def main():
-    load_dotenv()
-    workspace = os.getenv("BITBUCKET_WORKSPACE")
+# Everything below is imported only by the operation that needs it (requests, yaml, tabulate, ...),
+# which keeps the start-up of scripted commands short. The names stay importable from this module.
+_LAZY_IMPORTS = {
+    "BitbucketAuth": ".auth",
+    "BitbucketProjects": ".projects",
+    "BitbucketRepositories": ".repositories",
+    "BitbucketUsers": ".users",
+    "BitbucketBranchPermissions": ".branch_permissions",
+    "bulk_create_projects_and_repositories": ".bulk",
+    "bulk_delete_projects_and_repositories": ".bulk",
+    "reconcile_projects_and_repositories": ".reconcile",
+    "bulk_update_permissions": ".permissions",
+    "bulk_apply_branch_policies": ".branch_policies",
+    "bulk_update_repository_settings": ".repository_settings",
+}
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        return getattr(importlib.import_module(_LAZY_IMPORTS[name], __package__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="bitbucket_cli",
+        description="Bitbucket CLI. Without a command, an interactive menu is shown.",
+    )
+    parser.add_argument("--workspace", help="Bitbucket workspace (default: BITBUCKET_WORKSPACE)")
+    parser.add_argument("--output", choices=OUTPUT_FORMATS, default="ndjson",
+                        help="Result format of commands: one JSON object per line, or one JSON array (default: ndjson)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Number of concurrent workers for bulk operations (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--resume", action="store_true",
+                        help="Resume an interrupted bulk run, skipping the steps recorded in its journal")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print the slowest steps per repository of bulk runs and the slowest endpoints")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="Write request metrics at exit: Prometheus text for .prom/.txt files, JSON otherwise")
+    parser.add_argument("--inventory", metavar="FILE",
+                        help="Local inventory file "
+                             "(default: BITBUCKET_INVENTORY or ~/.bitbucket_cli/inventory-<workspace>.sqlite)")
+    parser.add_argument("--from-inventory", action="store_true",
+                        help="Planners and listings read the current state from the inventory (see 'inventory sync')")
+    add_subcommands(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    load_env()
+    workspace = args.workspace = args.workspace or os.getenv("BITBUCKET_WORKSPACE")
     if not workspace:
-        print(f"{Fore.RED}Error: BITBUCKET_WORKSPACE is not set in the .env file.")
-        return
+        print(f"{Fore.RED}Error: BITBUCKET_WORKSPACE is not set in the .env file.", file=sys.stderr if args.command else sys.stdout)
+        return 2 if args.command else None
+
+    from .api import DEFAULT_POOL_SIZE
+    from .auth import BitbucketAuth
+
+    # One connection per worker thread, or requests beyond the pool open and drop connections of their own
+    pool_size = max(int(os.getenv("BITBUCKET_POOL_SIZE") or DEFAULT_POOL_SIZE), args.workers)
+    auth = BitbucketAuth(pool_size=pool_size)
+    metrics = None
+    if args.profile or args.metrics:
+        from .metrics import RequestMetrics
+
+        metrics = RequestMetrics()
+        auth.client.add_hook(metrics)
+    try:
+        if args.command:
+            return run_command(args, auth)
+        return menu(args, workspace, auth)
+    finally:
+        if metrics is not None:
+            report_metrics(args, metrics)
+
+def report_metrics(args, metrics):
+    # Commands keep stdout for their JSON results
+    stream = sys.stderr if args.command else sys.stdout
+    if args.profile:
+        print(f"{Fore.CYAN}Slowest endpoints (total time, requests, p95):", file=stream)
+        for line in metrics.slowest_endpoints():
+            print(line, file=stream)
+    if args.metrics:
+        metrics.dump(args.metrics)
+        print(f"Request metrics written to '{args.metrics}'.", file=stream)
+
+def menu(args, workspace, auth):
+    from .branch_permissions import BitbucketBranchPermissions
+    from .branch_policies import bulk_apply_branch_policies
+    from .bulk import bulk_create_projects_and_repositories, bulk_delete_projects_and_repositories
+    from .groups import BitbucketGroups
+    from .inventory import Inventory, InventoryError, default_inventory_path, open_inventory
+    from .permissions import bulk_update_permissions
+    from .projects import BitbucketProjects
+    from .reconcile import reconcile_projects_and_repositories
+    from .repositories import BitbucketRepositories
+    from .repository_settings import bulk_update_repository_settings
+    from .users import BitbucketUsers
 
-    auth = BitbucketAuth()
     projects_api = BitbucketProjects(auth)
     repos_api = BitbucketRepositories(auth)
     users_api = BitbucketUsers(auth)
     branch_api = BitbucketBranchPermissions(auth)
+    inventory = None
+    if args.from_inventory:
+        try:
+            inventory = open_inventory(workspace, args.inventory)
+        except InventoryError as e:
+            print(f"{Fore.RED}{e}")
+            return
+        print(f"{Fore.CYAN}Reading listings from the inventory synced at {inventory.meta('synced_at')}.")
 
-    print("\nBitbucket CLI Menu:")
-    print("1. Create a project")
-    print("2. Create a repo")
-    print("3. Delete repo")
-    print("4. Set user permission to repo")
-    print("5. Revoke user permission from repo")
-    print("6. List repos, users and their permissions")
-    print("7. Configure branch permissions")
-    print("8. Bulk create projects and repositories from YAML file")
-    print("9. Bulk delete projects and repositories from YAML file")
-    print("0. Exit")
-    choice = input("Choose an option: ")
-
-    if choice == "1":
-        project_key = input("Project Key: ")
-        name = input("Project Name: ")
-        description = input("Description: ")
-        result = projects_api.create_project(workspace, project_key, name, description)
-        if result["success"]:
-            print(f"{Fore.GREEN}{result['message']}")
-        else:
-            print(f"{Fore.RED}{result['message']}")
-    elif choice == "2":
-        project_key = input("Project Key: ")
-        repo_slug = input("Repository Slug: ")
-        is_private = input("Is private? (Yes/no) - Default Yes: ").lower() != "no"
-        result = repos_api.create_repository(workspace, project_key, repo_slug, is_private)
-        if result.get("success"):
-            print(f"{Fore.GREEN}{result['message']}")
-        elif result.get("already_exists"):
-            print(f"{Fore.YELLOW}{result['message']}")
-        else:
-            print(f"{Fore.RED}{result['message']}")
-    elif choice == "3":
-        repos_api.delete_repositories_interactive(workspace)
-    elif choice == "4":
-        repo_slug = input("Repository Slug: ")
-        username = input("Username: ")
-        permission = input("Permission (read/write/admin): ")
-        print(users_api.add_user_to_repo(workspace, repo_slug, username, permission))
-    elif choice == "5":
-        repo_slug = input("Repository Slug: ")
-        username = input("Username: ")
-        print(users_api.remove_user_from_repo(workspace, repo_slug, username))
-    elif choice == "6":
-        from tabulate import tabulate
-
-        project_key = input("Project Key: ")
-        repos_response = repos_api.list_repositories(workspace, project_key)
-        if not repos_response.get("success"):
-            print(f"{Fore.RED}{repos_response.get('message', 'Failed to fetch repositories.')}")
-        else:
-            table = []
-            for repo in repos_response["repositories"]:
-                repo_slug = repo["slug"]
-                users_response = users_api.list_users_and_permissions(workspace, repo_slug)
-                if users_response.get("success"):
-                    for user_perm in users_response["users"]:
-                        table.append([
-                            repo["name"],
-                            user_perm["username"],
-                            user_perm["permission"]
-                        ])
+    while True:
+        print("\nBitbucket CLI Menu:")
+        print("1. Create a project")
+        print("2. Create a repo")
+        print("3. Delete repo")
+        print("4. Set user permission to repo")
+        print("5. Revoke user permission from repo")
+        print("6. List repos, users and their permissions")
+        print("7. Configure branch permissions")
+        print("8. Bulk create projects and repositories from YAML file")
+        print("9. Bulk delete projects and repositories from YAML file")
+        print("10. Reconcile projects and repositories with YAML file (plan/apply)")
+        print("11. Bulk grant/revoke permissions from YAML file")
+        print("12. Sync group memberships from YAML file")
+        print("13. Apply branch policies from YAML file")
+        print("14. Sync the local inventory")
+        print("15. Bulk update repository settings from YAML file")
+        print("0. Exit")
+        try:
+            choice = input("Choose an option: ")
+        except (EOFError, KeyboardInterrupt):
+            print("\nExiting CLI.")
+            break
+        if choice == "0":
+            print("Exiting CLI.")
+            break
+
+        # The session (connections, cached listings, inventory) outlives a failed operation
+        try:
+            if choice == "1":
+                project_key = input("Project Key: ")
+                name = input("Project Name: ")
+                description = input("Description: ")
+                result = projects_api.create_project(workspace, project_key, name, description)
+                if result["success"]:
+                    print(f"{Fore.GREEN}{result['message']}")
+                else:
+                    print(f"{Fore.RED}{result['message']}")
+            elif choice == "2":
+                project_key = input("Project Key: ")
+                repo_slug = input("Repository Slug: ")
+                is_private = input("Is private? (Yes/no) - Default Yes: ").lower() != "no"
+                result = repos_api.create_repository(workspace, project_key, repo_slug, is_private)
+                if result.get("success"):
+                    print(f"{Fore.GREEN}{result['message']}")
+                elif result.get("already_exists"):
+                    print(f"{Fore.YELLOW}{result['message']}")
+                else:
+                    print(f"{Fore.RED}{result['message']}")
+            elif choice == "3":
+                repos_api.delete_repositories_interactive(workspace, workers=args.workers)
+            elif choice == "4":
+                repo_slug = input("Repository Slug: ")
+                username = input("Username: ")
+                permission = input("Permission (read/write/admin): ")
+                print(users_api.add_user_to_repo(workspace, repo_slug, username, permission))
+            elif choice == "5":
+                repo_slug = input("Repository Slug: ")
+                username = input("Username: ")
+                print(users_api.remove_user_from_repo(workspace, repo_slug, username))
+            elif choice == "6":
+                from tabulate import tabulate
+
+                project_key = input("Project Key: ")
+                repos_response = (inventory or repos_api).list_repositories(workspace, project_key)
+                if not repos_response.get("success"):
+                    print(f"{Fore.RED}{repos_response.get('message', 'Failed to fetch repositories.')}")
+                else:
+                    # One batch of workspace-level permission pages instead of one request per repository
+                    permissions = (inventory or users_api).list_project_permissions(
+                        workspace, project_key, repos_response["repositories"], workers=args.workers
+                    )
+                    table = []
+                    for repo in repos_response["repositories"]:
+                        users_response = permissions[repo["slug"]]
+                        if users_response.get("success"):
+                            for user_perm in users_response["users"]:
+                                table.append([
+                                    repo["name"],
+                                    user_perm["username"],
+                                    user_perm["permission"]
+                                ])
+                        else:
+                            table.append([repo["name"], "-", "Failed to fetch users"])
+                    print(tabulate(
+                        table,
+                        headers=["Repository", "User", "Permission"],
+                        tablefmt="fancy_grid"
+                    ))
+            elif choice == "7":
+                repo_slug = input("Repository Slug: ")
+                branch_name = input("Branch Name: ")
+                exempt_user = input("Exempt User (optional): ")
+                result = branch_api.configure_branch_permission(workspace, repo_slug, branch_name, exempt_user or None)
+                print(f"{Fore.GREEN if result['success'] else Fore.RED}{result['message']}")
+            elif choice == "8":
+                yaml_file = input("Enter the path to the YAML file: ")
+                if input("Dry run only? (yes/No) - Default No: ").lower() == "yes":
+                    print_bulk_estimate(args, yaml_file, workspace, "create")
                 else:
-                    table.append([repo["name"], "-", "Failed to fetch users"])
-            print(tabulate(
-                table,
-                headers=["Repository", "User", "Permission"],
-                tablefmt="fancy_grid"
-            ))
-    elif choice == "7":
-        repo_slug = input("Repository Slug: ")
-        branch_name = input("Branch Name: ")
-        exempt_user = input("Exempt User (optional): ")
-        print(branch_api.configure_branch_permission(workspace, repo_slug, branch_name, exempt_user))
-    elif choice == "8":
-        yaml_file = input("Enter the path to the YAML file: ")
-        bulk_create_projects_and_repositories(projects_api, repos_api, branch_api, yaml_file, workspace, debug=True)
-    elif choice == "9":
-        yaml_file = input("Enter the path to the YAML file: ")
-        bulk_delete_projects_and_repositories(projects_api, repos_api, yaml_file, workspace)
-    elif choice == "0":
-        print("Exiting CLI.")
-    else:
-        print(f"{Fore.RED}Invalid choice. Try again.")
+                    bulk_create_projects_and_repositories(
+                        projects_api, repos_api, branch_api, yaml_file, workspace, debug=True,
+                        workers=args.workers, resume=args.resume, profile=args.profile
+                    )
+            elif choice == "9":
+                yaml_file = input("Enter the path to the YAML file: ")
+                if input("Dry run only? (yes/No) - Default No: ").lower() == "yes":
+                    print_bulk_estimate(args, yaml_file, workspace, "delete")
+                else:
+                    bulk_delete_projects_and_repositories(
+                        projects_api, repos_api, yaml_file, workspace,
+                        workers=args.workers, resume=args.resume, profile=args.profile
+                    )
+            elif choice == "10":
+                yaml_file = input("Enter the path to the YAML file: ")
+                reconcile_projects_and_repositories(projects_api, repos_api, branch_api, yaml_file, workspace,
+                                                    workers=args.workers, inventory=inventory)
+            elif choice == "11":
+                yaml_file = input("Enter the path to the YAML file: ")
+                bulk_update_permissions(users_api, repos_api, yaml_file, workspace, workers=args.workers,
+                                        inventory=inventory)
+            elif choice == "12":
+                yaml_file = input("Enter the path to the YAML file: ")
+                remove = input("Remove members not listed? (Yes/no) - Default Yes: ").lower() != "no"
+                BitbucketGroups(auth).sync_groups_from_manifest(yaml_file, workspace, remove=remove,
+                                                                workers=args.workers)
+            elif choice == "13":
+                yaml_file = input("Enter the path to the YAML file: ")
+                bulk_apply_branch_policies(branch_api, repos_api, yaml_file, workspace, workers=args.workers,
+                                           inventory=inventory)
+            elif choice == "14":
+                full = input("Refetch every repository? (yes/No) - Default No: ").lower() == "yes"
+                with Inventory(args.inventory or default_inventory_path(workspace), workspace) as target:
+                    print(f"{Fore.CYAN}Syncing the inventory at '{target.path}'...")
+                    stats = target.sync(projects_api, repos_api, users_api, branch_api, workers=args.workers,
+                                        full=full)
+                print(f"{Fore.GREEN if not stats['failed'] else Fore.YELLOW}Inventory: "
+                      f"{stats['repositories']} repositories, {stats['refreshed']} refreshed, "
+                      f"{stats['removed']} removed, {len(stats['failed'])} failed.")
+            elif choice == "15":
+                yaml_file = input("Enter the path to the YAML file: ")
+                bulk_update_repository_settings(repos_api, yaml_file, workspace, workers=args.workers,
+                                                inventory=inventory)
+            else:
+                print(f"{Fore.RED}Invalid choice. Try again.")
+        except KeyboardInterrupt:
+            print(f"\n{Fore.YELLOW}Interrupted.")
+        except Exception as e:
+            print(f"{Fore.RED}Error: {e}")
+
+def print_bulk_estimate(args, yaml_file, workspace, operation):
+    from .estimate import estimate, format_estimate, plan_bulk_run, rate_budget
+
+    try:
+        steps = plan_bulk_run(yaml_file, workspace, operation, resume=args.resume)
+    except Exception as e:
+        print(f"{Fore.RED}Error: {e}")
+        return
+    rate_per_hour, burst = rate_budget()
+    result = estimate(steps, workers=args.workers, rate_per_hour=rate_per_hour, burst=burst)
+    print(f"{Fore.CYAN}Dry run of bulk {operation} for '{yaml_file}' (nothing is sent):")
+    for line in format_estimate(result):
+        print(line)
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,663 @@
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+# Handlers import the modules they use when they run, so a command only pays for its own imports
+# (requests, yaml, ...) and `--help` pays for none of them.
+
+PERMISSIONS = ["read", "write", "admin"]
+OUTPUT_FORMATS = ["ndjson", "json"]
+
+
+def read_targets(values, stdin=None):
+    """
+    Targets given on the command line, or one per line on stdin when none (or '-') are given.
+    Blank lines and lines starting with '#' are ignored.
+    """
+    if values and values != ["-"]:
+        return list(values)
+    stdin = stdin or sys.stdin
+    return [line.strip() for line in stdin if line.strip() and not line.lstrip().startswith("#")]
+
+
+class ResultWriter:
+    """
+    Writes one result object per target: NDJSON lines flushed as results come in,
+    or a single JSON array once the command is done.
+    A result with "success": false makes the command exit with status 1.
+    """
+    def __init__(self, output="ndjson", stream=None):
+        self.output = output
+        self.stream = stream or sys.stdout
+        self.results = []
+        self.failed = 0
+
+    def write(self, result):
+        if not result.get("success", True):
+            self.failed += 1
+        if self.output == "json":
+            self.results.append(result)
+        else:
+            self.stream.write(json.dumps(result) + "\n")
+            self.stream.flush()
+
+    def close(self):
+        if self.output == "json":
+            self.stream.write(json.dumps(self.results, indent=2) + "\n")
+        return 1 if self.failed else 0
+
+
+def _for_each(args, writer, key, targets, func):
+    # Run `func` for every target on the worker pool; results are written in input order
+    def run(target):
+        try:
+            return dict(func(target), **{key: target})
+        except Exception as e:
+            return {key: target, "success": False, "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        for result in pool.map(run, targets):
+            writer.write(result)
+
+
+def _succeeded(result):
+    # Permission and group calls return {"message"} on success and the API error body otherwise
+    return dict(result, success="error" not in result)
+
+
+def _write_listing(writer, items):
+    from .api import BitbucketAPIError
+
+    try:
+        for item in items:
+            writer.write(item)
+    except BitbucketAPIError as e:
+        writer.write({"success": False, "status_code": e.status_code, "error": e.response.text})
+
+
+def _write_changes(writer, changes, unchanged):
+    # Results of a planner (sync_permissions, apply_branch_policies, ...): a dry run returns the planned
+    # changes without "success"; the summary record comes last
+    for change in changes:
+        writer.write(change if "success" in change else dict(change, planned=True))
+    writer.write({"summary": True, "changes": len(changes), "unchanged": unchanged,
+                  "failed": sum(1 for c in changes if c.get("success") is False)})
+
+
+def _inventory(args):
+    # With --from-inventory, planners read the current state from the local index instead of the API
+    if not args.from_inventory:
+        return None
+    from .inventory import open_inventory
+
+    return open_inventory(args.workspace, args.inventory)
+
+
+def _write_status(writer, status):
+    if status is None:
+        writer.write({"success": False, "error": "The manifest could not be processed (details on stderr)."})
+        return
+    for name, state in status.items():
+        writer.write({"step": list(name), "status": state, "success": state == "done"})
+
+
+def project_create(args, auth, writer):
+    from .projects import BitbucketProjects
+
+    projects_api = BitbucketProjects(auth)
+    _for_each(args, writer, "project", read_targets(args.keys), lambda key: projects_api.create_project(
+        args.workspace, key, args.name or key, args.description
+    ))
+
+
+def project_delete(args, auth, writer):
+    from .projects import BitbucketProjects
+
+    projects_api = BitbucketProjects(auth)
+    _for_each(args, writer, "project", read_targets(args.keys),
+              lambda key: {"success": projects_api.delete_project(args.workspace, key)})
+
+
+def project_list(args, auth, writer):
+    from .projects import BitbucketProjects
+
+    projects = BitbucketProjects(auth).iter_projects(args.workspace, prefetch=True)
+    _write_listing(writer, ({"key": p["key"], "name": p.get("name")} for p in projects))
+
+
+def repo_create(args, auth, writer):
+    from .repositories import BitbucketRepositories
+
+    repos_api = BitbucketRepositories(auth)
+    _for_each(args, writer, "repo", read_targets(args.slugs), lambda slug: repos_api.create_repository(
+        args.workspace, args.project, slug, not args.public
+    ))
+
+
+def repo_delete(args, auth, writer):
+    from .repositories import BitbucketRepositories
+
+    repos_api = BitbucketRepositories(auth)
+    _for_each(args, writer, "repo", read_targets(args.slugs),
+              lambda slug: {"success": repos_api.delete_repository(args.workspace, slug)})
+
+
+def repo_list(args, auth, writer):
+    from .repositories import BitbucketRepositories
+
+    _write_listing(writer, BitbucketRepositories(auth).iter_repositories(args.workspace, args.project, prefetch=True))
+
+
+def repo_update(args, auth, writer):
+    from .api import BitbucketAPIError
+    from .manifest import load_section
+    from .repositories import BitbucketRepositories
+    from .repository_settings import update_repositories
+
+    rule = {"repositories": args.repos, "projects": args.projects, "private": args.private,
+            "description": args.description, "main_branch": args.main_branch, "fork_policy": args.fork_policy,
+            "move_to": args.move_to}
+    try:
+        rules = (load_section(args.file, "repository_settings") or []) if args.file else [rule]
+        results, unchanged = update_repositories(BitbucketRepositories(auth), args.workspace, rules,
+                                                 workers=args.workers, dry_run=args.dry_run,
+                                                 inventory=_inventory(args))
+    except BitbucketAPIError as e:
+        writer.write({"success": False, "status_code": e.status_code, "error": e.response.text})
+        return
+    except Exception as e:
+        # Missing file, YAML syntax, invalid rules or no inventory
+        writer.write({"success": False, "error": str(e)})
+        return
+    _write_changes(writer, results, unchanged)
+
+
+def perm_set(args, auth, writer):
+    from .users import BitbucketUsers
+
+    users_api = BitbucketUsers(auth)
+    _for_each(args, writer, "repo", read_targets(args.slugs), lambda slug: _succeeded(users_api.add_user_to_repo(
+        args.workspace, slug, args.user, args.permission
+    )))
+
+
+def perm_revoke(args, auth, writer):
+    from .users import BitbucketUsers
+
+    users_api = BitbucketUsers(auth)
+    _for_each(args, writer, "repo", read_targets(args.slugs),
+              lambda slug: _succeeded(users_api.remove_user_from_repo(args.workspace, slug, args.user)))
+
+
+def perm_list(args, auth, writer):
+    from .users import BitbucketUsers
+
+    users_api = BitbucketUsers(auth)
+    _for_each(args, writer, "repo", read_targets(args.slugs),
+              lambda slug: users_api.list_users_and_permissions(args.workspace, slug))
+
+
+def perm_bulk(args, auth, writer):
+    from .api import BitbucketAPIError
+    from .manifest import load_section
+    from .permissions import sync_permissions
+    from .repositories import BitbucketRepositories
+    from .users import BitbucketUsers
+
+    try:
+        rules = load_section(args.file, "permissions") or []
+        results, unchanged = sync_permissions(BitbucketUsers(auth), BitbucketRepositories(auth), args.workspace, rules,
+                                              workers=args.workers, dry_run=args.dry_run, inventory=_inventory(args))
+    except BitbucketAPIError as e:
+        writer.write({"success": False, "status_code": e.status_code, "error": e.response.text})
+        return
+    except Exception as e:
+        # Missing file, YAML syntax, invalid rules or no inventory
+        writer.write({"success": False, "error": str(e)})
+        return
+    _write_changes(writer, results, unchanged)
+
+
+def perm_apply(args, auth, writer):
+    from .api import BitbucketAPIError
+    from .inventory import InventoryError
+    from .rules import ManifestError
+    from .permissions import sync_permissions
+    from .repositories import BitbucketRepositories
+    from .users import BitbucketUsers
+
+    rule = {"users": args.users, "groups": args.groups, "repositories": args.repos,
+            "projects": args.projects, "permission": args.permission}
+    try:
+        results, unchanged = sync_permissions(BitbucketUsers(auth), BitbucketRepositories(auth), args.workspace, [rule],
+                                              workers=args.workers, dry_run=args.dry_run, inventory=_inventory(args))
+    except (ManifestError, InventoryError) as e:
+        writer.write({"success": False, "error": str(e)})
+        return
+    except BitbucketAPIError as e:
+        writer.write({"success": False, "status_code": e.status_code, "error": e.response.text})
+        return
+    _write_changes(writer, results, unchanged)
+
+
+def branch_protect(args, auth, writer):
+    from .branch_permissions import BitbucketBranchPermissions
+
+    branch_api = BitbucketBranchPermissions(auth)
+    _for_each(args, writer, "repo", read_targets(args.slugs),
+              lambda slug: branch_api.protect_branch(args.workspace, slug, branch_name=args.branch))
+
+
+def _write_branch_policy_results(writer, policies, templates, args, auth):
+    from .api import BitbucketAPIError
+    from .branch_permissions import BitbucketBranchPermissions
+    from .branch_policies import apply_branch_policies
+    from .repositories import BitbucketRepositories
+
+    try:
+        results, unchanged = apply_branch_policies(
+            BitbucketBranchPermissions(auth), BitbucketRepositories(auth), args.workspace, policies, templates,
+            workers=args.workers, dry_run=args.dry_run, inventory=_inventory(args)
+        )
+    except BitbucketAPIError as e:
+        writer.write({"success": False, "status_code": e.status_code, "error": e.response.text})
+        return
+    except ValueError as e:
+        # ManifestError (unknown template or invalid template keys) or InventoryError
+        writer.write({"success": False, "error": str(e)})
+        return
+    _write_changes(writer, results, unchanged)
+
+
+def branch_apply(args, auth, writer):
+    from .manifest import load_section
+
+    try:
+        templates = load_section(args.file, "branch_templates", {}) if args.file else {}
+    except Exception as e:
+        writer.write({"success": False, "error": str(e)})
+        return
+    policy = {"template": args.template, "repositories": args.repos, "projects": args.projects}
+    _write_branch_policy_results(writer, [policy], templates, args, auth)
+
+
+def branch_policies(args, auth, writer):
+    from .manifest import load_section
+
+    try:
+        policies = load_section(args.file, "branch_policies") or []
+        templates = load_section(args.file, "branch_templates", {})
+    except Exception as e:
+        # Missing file or YAML syntax
+        writer.write({"success": False, "error": str(e)})
+        return
+    _write_branch_policy_results(writer, policies, templates, args, auth)
+
+
+def group_add_user(args, auth, writer):
+    from .groups import BitbucketGroups
+
+    groups_api = BitbucketGroups(auth)
+    _for_each(args, writer, "user", read_targets(args.users),
+              lambda user: _succeeded(groups_api.move_user_to_group(args.workspace, user, args.group)))
+
+
+def group_sync(args, auth, writer):
+    from .api import BitbucketAPIError
+    from .groups import BitbucketGroups, read_group_members
+    from .manifest import load_section
+
+    try:
+        if args.file:
+            desired = read_group_members(load_section(args.file, "groups", {}))
+        else:
+            desired = {args.group: read_targets(args.users)}
+        changes, unchanged = BitbucketGroups(auth).sync_group_members(
+            args.workspace, desired, remove=not args.keep_others, workers=args.workers, dry_run=args.dry_run
+        )
+    except BitbucketAPIError as e:
+        writer.write({"success": False, "status_code": e.status_code, "error": e.response.text})
+        return
+    except Exception as e:
+        # Missing file, YAML syntax or an invalid groups section
+        writer.write({"success": False, "error": str(e)})
+        return
+    _write_changes(writer, changes, unchanged)
+
+
+def _bulk_dry_run(args, writer, operation):
+    from .estimate import estimate, load_latencies, plan_bulk_run, rate_budget
+
+    rate_per_hour, burst = rate_budget()
+    try:
+        steps = plan_bulk_run(args.file, args.workspace, operation, resume=args.resume)
+        latencies = load_latencies(args.latency_from) if args.latency_from else None
+    except Exception as e:
+        # Missing file, YAML syntax, an invalid manifest or metrics file
+        writer.write({"success": False, "error": str(e)})
+        return
+    for step in steps:
+        for request in step["operations"]:
+            writer.write(dict(request, planned=True))
+    result = estimate(steps, workers=args.workers, latency=args.latency, latencies=latencies,
+                      rate_per_hour=args.rate_limit or rate_per_hour, burst=args.burst or burst)
+    writer.write(dict(result, summary=True))
+
+
+def bulk_create(args, auth, writer):
+    if args.dry_run:
+        return _bulk_dry_run(args, writer, "create")
+    from .branch_permissions import BitbucketBranchPermissions
+    from .bulk import bulk_create_projects_and_repositories
+    from .projects import BitbucketProjects
+    from .repositories import BitbucketRepositories
+
+    # Progress lines go to stderr so stdout only carries results
+    with redirect_stdout(sys.stderr):
+        status = bulk_create_projects_and_repositories(
+            BitbucketProjects(auth), BitbucketRepositories(auth), BitbucketBranchPermissions(auth),
+            args.file, args.workspace, workers=args.workers, resume=args.resume, profile=args.profile
+        )
+    _write_status(writer, status)
+
+
+def bulk_delete(args, auth, writer):
+    if args.dry_run:
+        return _bulk_dry_run(args, writer, "delete")
+    from .bulk import bulk_delete_projects_and_repositories
+    from .projects import BitbucketProjects
+    from .repositories import BitbucketRepositories
+
+    with redirect_stdout(sys.stderr):
+        status = bulk_delete_projects_and_repositories(
+            BitbucketProjects(auth), BitbucketRepositories(auth), args.file, args.workspace,
+            workers=args.workers, resume=args.resume, profile=args.profile
+        )
+    _write_status(writer, status)
+
+
+def bulk_reconcile(args, auth, writer):
+    from .branch_permissions import BitbucketBranchPermissions
+    from .projects import BitbucketProjects
+    from .reconcile import reconcile_projects_and_repositories
+    from .repositories import BitbucketRepositories
+
+    try:
+        inventory = _inventory(args)
+    except ValueError as e:
+        writer.write({"success": False, "error": str(e)})
+        return
+    with redirect_stdout(sys.stderr):
+        status = reconcile_projects_and_repositories(
+            BitbucketProjects(auth), BitbucketRepositories(auth), BitbucketBranchPermissions(auth),
+            args.file, args.workspace, workers=args.workers,
+            confirm=lambda prompt: "yes" if args.yes else "no", inventory=inventory
+        )
+    _write_status(writer, status)
+
+
+def inventory_sync(args, auth, writer):
+    from .api import BitbucketAPIError
+    from .branch_permissions import BitbucketBranchPermissions
+    from .inventory import Inventory, default_inventory_path
+    from .projects import BitbucketProjects
+    from .repositories import BitbucketRepositories
+    from .users import BitbucketUsers
+
+    with Inventory(args.inventory or default_inventory_path(args.workspace), args.workspace) as inventory:
+        try:
+            stats = inventory.sync(BitbucketProjects(auth), BitbucketRepositories(auth), BitbucketUsers(auth),
+                                   BitbucketBranchPermissions(auth), workers=args.workers, full=args.full)
+        except BitbucketAPIError as e:
+            writer.write({"success": False, "status_code": e.status_code, "error": e.response.text})
+            return
+        writer.write(dict(stats, path=inventory.path, success=not stats["failed"]))
+
+
+def _inventory_query(args, writer, query):
+    from .inventory import InventoryError, open_inventory
+
+    try:
+        inventory = open_inventory(args.workspace, args.inventory)
+    except InventoryError as e:
+        writer.write({"success": False, "error": str(e)})
+        return
+    with inventory:
+        for item in query(inventory):
+            writer.write(item)
+
+
+def inventory_repos(args, auth, writer):
+    _inventory_query(args, writer, lambda inventory: inventory.repositories(args.project))
+
+
+def inventory_perms(args, auth, writer):
+    _inventory_query(args, writer, lambda inventory: inventory.permissions(args.user, args.permission, args.project))
+
+
+def inventory_unprotected(args, auth, writer):
+    _inventory_query(args, writer, lambda inventory: inventory.unprotected_repositories(args.branch, args.project))
+
+
+def _oauth_missing(auth, writer):
+    if auth.oauth is None:
+        writer.write({"success": False, "error": "OAuth is not configured: set BITBUCKET_CLIENT_ID and "
+                                                 "BITBUCKET_CLIENT_SECRET, and leave BITBUCKET_APP_PASSWORD empty."})
+        return True
+    return False
+
+
+def auth_login(args, auth, writer):
+    from .oauth import OAuthError, authorize_url
+
+    if _oauth_missing(auth, writer):
+        return
+    if not args.code:
+        writer.write({"success": True, "authorize_url": authorize_url(auth.client_id),
+                      "message": "Open the URL, approve access and run 'auth login --code CODE' with the code."})
+        return
+    try:
+        status = auth.oauth.exchange_code(args.code, args.redirect_uri)
+    except OAuthError as e:
+        writer.write({"success": False, "status_code": e.status_code, "error": e.response.text})
+        return
+    writer.write(dict(status, success=True))
+
+
+def auth_status(args, auth, writer):
+    if auth.oauth is None:
+        writer.write({"method": "basic", "username": auth.username, "success": bool(auth.username and auth.app_password)})
+        return
+    writer.write(dict(auth.oauth.status(), method="oauth"))
+
+
+def open_shell(args, auth, writer):
+    from .inventory import InventoryError
+    from .shell import run_shell
+
+    try:
+        run_shell(args, auth)
+    except InventoryError as e:
+        writer.write({"success": False, "error": str(e)})
+
+
+def add_subcommands(parser):
+    """
+    Register the non-interactive subcommands on the top-level parser.
+    Each leaf parser sets `handler` to a function (args, auth, writer).
+    """
+    targets_help = "one or more {}; read from stdin (one per line) when omitted or '-'"
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    project = commands.add_parser("project", help="Create, delete and list projects").add_subparsers(
+        dest="action", metavar="ACTION", required=True
+    )
+    create = project.add_parser("create", help="Create projects")
+    create.add_argument("keys", nargs="*", help=targets_help.format("project keys"))
+    create.add_argument("--name", help="Project name (default: the key)")
+    create.add_argument("--description", default="")
+    create.set_defaults(handler=project_create)
+    delete = project.add_parser("delete", help="Delete projects")
+    delete.add_argument("keys", nargs="*", help=targets_help.format("project keys"))
+    delete.set_defaults(handler=project_delete)
+    project.add_parser("list", help="List the projects of the workspace").set_defaults(handler=project_list)
+
+    repo = commands.add_parser("repo", help="Create, delete and list repositories").add_subparsers(
+        dest="action", metavar="ACTION", required=True
+    )
+    create = repo.add_parser("create", help="Create repositories in a project")
+    create.add_argument("slugs", nargs="*", help=targets_help.format("repository slugs"))
+    create.add_argument("--project", required=True, help="Project key")
+    create.add_argument("--public", action="store_true", help="Create public repositories (default: private)")
+    create.set_defaults(handler=repo_create)
+    delete = repo.add_parser("delete", help="Delete repositories")
+    delete.add_argument("slugs", nargs="*", help=targets_help.format("repository slugs"))
+    delete.set_defaults(handler=repo_delete)
+    listing = repo.add_parser("list", help="List the repositories of a project")
+    listing.add_argument("--project", required=True, help="Project key")
+    listing.set_defaults(handler=repo_list)
+    update = repo.add_parser("update", help="Change the settings of many repositories (only those that differ)")
+    update.add_argument("--repos", nargs="*", default=[], metavar="GLOB", help="Repository slugs or globs, e.g. 'web-*'")
+    update.add_argument("--projects", nargs="*", default=[], metavar="KEY", help="Every repository of these projects")
+    update.add_argument("--file", help="YAML manifest with a 'repository_settings:' section (instead of the options)")
+    privacy = update.add_mutually_exclusive_group()
+    privacy.add_argument("--private", action="store_true", default=None)
+    privacy.add_argument("--public", action="store_false", dest="private")
+    update.add_argument("--description")
+    update.add_argument("--main-branch", help="Name of an existing branch")
+    update.add_argument("--fork-policy", choices=["allow_forks", "no_public_forks", "no_forks"])
+    update.add_argument("--move-to", metavar="KEY", help="Move the repositories to this project")
+    update.add_argument("--dry-run", action="store_true", help="Only report the changes that would be made")
+    update.set_defaults(handler=repo_update)
+
+    perm = commands.add_parser("perm", help="Set, revoke and list repository user permissions").add_subparsers(
+        dest="action", metavar="ACTION", required=True
+    )
+    grant = perm.add_parser("set", help="Give a user a permission on repositories")
+    grant.add_argument("slugs", nargs="*", help=targets_help.format("repository slugs"))
+    grant.add_argument("--user", required=True)
+    grant.add_argument("--permission", required=True, choices=PERMISSIONS)
+    grant.set_defaults(handler=perm_set)
+    revoke = perm.add_parser("revoke", help="Remove a user's access to repositories")
+    revoke.add_argument("slugs", nargs="*", help=targets_help.format("repository slugs"))
+    revoke.add_argument("--user", required=True)
+    revoke.set_defaults(handler=perm_revoke)
+    listing = perm.add_parser("list", help="List the users and permissions of repositories")
+    listing.add_argument("slugs", nargs="*", help=targets_help.format("repository slugs"))
+    listing.set_defaults(handler=perm_list)
+    bulk_perm = perm.add_parser("bulk", help="Grant or revoke the permissions of a manifest's 'permissions:' section")
+    bulk_perm.add_argument("file", help="YAML manifest")
+    bulk_perm.add_argument("--dry-run", action="store_true", help="Only report the changes that would be made")
+    bulk_perm.set_defaults(handler=perm_bulk)
+    apply = perm.add_parser("apply", help="Grant or revoke one permission for users/groups across many repositories")
+    apply.add_argument("--users", nargs="*", default=[], metavar="USER")
+    apply.add_argument("--groups", nargs="*", default=[], metavar="GROUP", help="Group slugs")
+    apply.add_argument("--repos", nargs="*", default=[], metavar="GLOB", help="Repository slugs or globs, e.g. 'web-*'")
+    apply.add_argument("--projects", nargs="*", default=[], metavar="KEY", help="Every repository of these projects")
+    apply.add_argument("--permission", required=True, choices=PERMISSIONS + ["none"], help="'none' revokes access")
+    apply.add_argument("--dry-run", action="store_true", help="Only report the changes that would be made")
+    apply.set_defaults(handler=perm_apply)
+
+    branch = commands.add_parser("branch", help="Branch permissions").add_subparsers(
+        dest="action", metavar="ACTION", required=True
+    )
+    protect = branch.add_parser("protect", help="Require pull requests to update a branch")
+    protect.add_argument("slugs", nargs="*", help=targets_help.format("repository slugs"))
+    protect.add_argument("--branch", default="main")
+    protect.set_defaults(handler=branch_protect)
+    apply = branch.add_parser("apply", help="Apply a branch template to repositories (only missing restrictions)")
+    apply.add_argument("template", help="Template name: pr-only, hardened, or one from --file")
+    apply.add_argument("--repos", nargs="*", default=[], metavar="GLOB", help="Repository slugs or globs, e.g. 'web-*'")
+    apply.add_argument("--projects", nargs="*", default=[], metavar="KEY", help="Every repository of these projects")
+    apply.add_argument("--file", help="YAML manifest with a 'branch_templates:' section")
+    apply.add_argument("--dry-run", action="store_true", help="Only report the changes that would be made")
+    apply.set_defaults(handler=branch_apply)
+    policies = branch.add_parser("policies", help="Apply the 'branch_policies:' section of a manifest")
+    policies.add_argument("file", help="YAML manifest")
+    policies.add_argument("--dry-run", action="store_true", help="Only report the changes that would be made")
+    policies.set_defaults(handler=branch_policies)
+
+    group = commands.add_parser("group", help="Workspace groups").add_subparsers(
+        dest="action", metavar="ACTION", required=True
+    )
+    add_user = group.add_parser("add-user", help="Add users to a group")
+    add_user.add_argument("users", nargs="*", help=targets_help.format("usernames"))
+    add_user.add_argument("--group", required=True, help="Group slug")
+    add_user.set_defaults(handler=group_add_user)
+    sync = group.add_parser("sync", help="Make group membership match a list: add missing members, remove the others")
+    source = sync.add_mutually_exclusive_group(required=True)
+    source.add_argument("--file", help="YAML manifest with a 'groups:' section mapping group slugs to usernames")
+    source.add_argument("--group", help="Group slug whose members are the given usernames")
+    sync.add_argument("users", nargs="*", help=targets_help.format("usernames") + " (with --group)")
+    sync.add_argument("--keep-others", action="store_true", help="Only add members, never remove any")
+    sync.add_argument("--dry-run", action="store_true", help="Only report the changes that would be made")
+    sync.set_defaults(handler=group_sync)
+
+    auth = commands.add_parser("auth", help="OAuth login and credentials status").add_subparsers(
+        dest="action", metavar="ACTION", required=True
+    )
+    login = auth.add_parser("login", help="Print the authorization URL, or exchange an authorization code for tokens")
+    login.add_argument("--code", help="Authorization code from the redirect after approving access")
+    login.add_argument("--redirect-uri", help="Callback URL, if the OAuth consumer has one")
+    login.set_defaults(handler=auth_login)
+    auth.add_parser("status", help="Show which credentials are used and when the token expires").set_defaults(
+        handler=auth_status
+    )
+
+    inventory = commands.add_parser("inventory", help="Local SQLite index of the workspace").add_subparsers(
+        dest="action", metavar="ACTION", required=True
+    )
+    sync = inventory.add_parser("sync", help="Refresh the index (only repositories updated since the last sync)")
+    sync.add_argument("--full", action="store_true", help="Refetch every repository")
+    sync.set_defaults(handler=inventory_sync)
+    repos = inventory.add_parser("repos", help="List indexed repositories")
+    repos.add_argument("--project", help="Project key")
+    repos.set_defaults(handler=inventory_repos)
+    perms = inventory.add_parser("perms", help="List indexed user permissions, e.g. who has admin where")
+    perms.add_argument("--user")
+    perms.add_argument("--permission", choices=PERMISSIONS)
+    perms.add_argument("--project", help="Project key")
+    perms.set_defaults(handler=inventory_perms)
+    unprotected = inventory.add_parser("unprotected", help="List repositories whose branch has no push restriction")
+    unprotected.add_argument("--branch", default="main")
+    unprotected.add_argument("--project", help="Project key")
+    unprotected.set_defaults(handler=inventory_unprotected)
+
+    bulk = commands.add_parser("bulk", help="Bulk operations from a manifest (YAML, JSON Lines or CSV)").add_subparsers(
+        dest="action", metavar="ACTION", required=True
+    )
+    for name, handler, help_text in [
+        ("create", bulk_create, "Create the projects, repositories and branches of a manifest"),
+        ("delete", bulk_delete, "Delete the repositories and projects of a manifest"),
+        ("reconcile", bulk_reconcile, "Plan the changes a manifest needs, and apply them with --yes"),
+    ]:
+        action = bulk.add_parser(name, help=help_text)
+        action.add_argument("file", help="Manifest file")
+        if name == "reconcile":
+            action.add_argument("--yes", action="store_true", help="Apply the plan without asking")
+        else:
+            action.add_argument("--dry-run", action="store_true",
+                                help="Only list the requests the run would make and estimate its duration")
+            action.add_argument("--latency", type=float, default=0.4, metavar="SECONDS",
+                                help="Assumed latency per request for --dry-run (default: 0.4)")
+            action.add_argument("--latency-from", metavar="FILE",
+                                help="Per-endpoint latencies for --dry-run, from an earlier run's --metrics JSON")
+            action.add_argument("--rate-limit", type=float, metavar="PER_HOUR",
+                                help="Request budget per hour for --dry-run (default: BITBUCKET_RATE_LIMIT or 1000)")
+            action.add_argument("--burst", type=int, help="Burst of the request budget for --dry-run")
+        action.set_defaults(handler=handler)
+
+    commands.add_parser(
+        "shell", help="Interactive shell running these commands in one session, with history and completion"
+    ).set_defaults(handler=open_shell)
+
+
+def run_command(args, auth, stream=None):
+    """
+    Run the subcommand selected by `args` and return the process exit code.
+    :param stream: Where the results are written, stdout by default.
+    """
+    writer = ResultWriter(args.output, stream)
+    args.handler(args, auth, writer)
+    return writer.close()
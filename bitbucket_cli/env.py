@@ -0,0 +1,17 @@
+import threading
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_env():
+    """
+    Load the .env file into os.environ, once per process.
+    Every entry point (CLI, BitbucketAuth, the git fallback) calls this instead of load_dotenv().
+    """
+    global _loaded
+    with _lock:
+        if not _loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _loaded = True
@@ -0,0 +1,212 @@
+import heapq
+import json
+import math
+import os
+
+from .executor import DEFAULT_WORKERS
+from .journal import default_journal_path, read_journal
+from .manifest import iter_manifest
+from .rules import as_list
+
+# Typical round trip of one api.bitbucket.org call, in seconds
+DEFAULT_LATENCY = 0.4
+# Bitbucket Cloud's hourly allowance for authenticated repository API calls
+DEFAULT_RATE_PER_HOUR = 1000
+
+PROJECTS = "/workspaces/{workspace}/projects"
+PROJECT = "/workspaces/{workspace}/projects/{project_key}"
+REPOSITORY = "/repositories/{workspace}/{repo_slug}"
+
+
+def _operation(step, method, endpoint, **values):
+    return {"step": list(step), "method": method, "endpoint": endpoint, "path": endpoint.format(**values)}
+
+
+def plan_bulk_create(records, workspace, completed=None):
+    """
+    The steps bulk_create_projects_and_repositories runs for a manifest, with the exact requests of each:
+    [{"name", "deps", "operations": [...], "parallel": bool}]. Steps in `completed` (a journal's
+    contents, for --resume) are left out like the executor skips them; branches are skipped one by one.
+    """
+    completed = completed or {}
+    steps = []
+
+    def add(name, deps, operations, parallel=False, journaled=True):
+        if not journaled or name not in completed:
+            steps.append({"name": name, "deps": [d for d in deps if d not in completed], "operations": operations,
+                          "parallel": parallel})
+        return name
+
+    for kind, record in records:
+        if kind == "project":
+            name = ("project", record["key"])
+            add(name, [], [_operation(name, "POST", PROJECTS, workspace=workspace)])
+            continue
+        slug = record["slug"]
+        values = {"workspace": workspace, "repo_slug": slug}
+        branch_list = as_list(record["branches"])
+        repo = add(("repo", slug), [("project", record["project"])],
+                   [_operation(("repo", slug), "POST", REPOSITORY, **values)])
+        commit = add(("commit", slug), [repo], [_operation(("commit", slug), "POST", REPOSITORY + "/src", **values)])
+        # As in create_branches: the base branch is never posted, the others are posted concurrently
+        pending = [b for b in dict.fromkeys(branch_list) if b != "main" and ("branch", slug, b) not in completed]
+        if pending:
+            # Journaled per branch only, as in bulk_create_projects_and_repositories
+            name = ("branches", slug)
+            add(name, [commit], [_operation(name, "POST", REPOSITORY + "/refs/branches", **values) for _ in pending],
+                parallel=True, journaled=False)
+        if "main" in branch_list:
+            name = ("protect", slug, "main")
+            add(name, [commit], [_operation(name, "POST", REPOSITORY + "/branch-restrictions", **values)])
+    return steps
+
+
+def plan_bulk_delete(records, workspace, completed=None):
+    """
+    The steps bulk_delete_projects_and_repositories runs for a manifest; see plan_bulk_create.
+    """
+    completed = completed or {}
+    steps, repos = [], {}
+    for kind, record in records:
+        if kind == "project":
+            repos[record["key"]] = []
+            continue
+        name = ("repo", record["slug"])
+        repos.setdefault(record["project"], []).append(name)
+        if name not in completed:
+            steps.append({"name": name, "deps": [], "parallel": False, "operations": [
+                _operation(name, "DELETE", REPOSITORY, workspace=workspace, repo_slug=record["slug"])
+            ]})
+    for project_key, repo_names in repos.items():
+        name = ("project", project_key)
+        if name not in completed:
+            steps.append({"name": name, "deps": [r for r in repo_names if r not in completed], "parallel": False,
+                          "operations": [_operation(name, "DELETE", PROJECT, workspace=workspace,
+                                                    project_key=project_key)]})
+    return steps
+
+
+def load_latencies(metrics_path):
+    """
+    Mean latency per (method, endpoint template) from a --metrics JSON file of an earlier run.
+    """
+    with open(metrics_path, "r", encoding="utf-8") as file:
+        data = json.load(file)
+    return {(e["method"], e["endpoint"]): e["latency"]["mean"] for e in data.get("endpoints", []) if e["requests"]}
+
+
+def simulate(steps, workers=DEFAULT_WORKERS, latency=DEFAULT_LATENCY, latencies=None):
+    """
+    Wall time of running the steps on `workers` threads (BulkExecutor's dependency rules, steps started in
+    manifest order), with each request taking its latency: `latencies` per (method, endpoint), else `latency`.
+    """
+    latencies = latencies or {}
+
+    def duration(step):
+        seconds = [latencies.get((op["method"], op["endpoint"]), latency) for op in step["operations"]]
+        if not step["parallel"]:
+            return sum(seconds)
+        # create_branches posts on up to `workers` threads of its own
+        return math.ceil(len(seconds) / max(1, workers)) * max(seconds, default=0)
+
+    order = {step["name"]: index for index, step in enumerate(steps)}
+    remaining = {step["name"]: len(step["deps"]) for step in steps}
+    dependents = {step["name"]: [] for step in steps}
+    for step in steps:
+        for dep in step["deps"]:
+            dependents[dep].append(step["name"])
+    by_name = {step["name"]: step for step in steps}
+
+    ready = [order[name] for name, count in remaining.items() if count == 0]
+    heapq.heapify(ready)
+    running, now, idle = [], 0.0, max(1, int(workers))
+    while ready or running:
+        while ready and idle:
+            step = steps[heapq.heappop(ready)]
+            heapq.heappush(running, (now + duration(step), order[step["name"]]))
+            idle -= 1
+        now, index = heapq.heappop(running)
+        idle += 1
+        for child in dependents[steps[index]["name"]]:
+            remaining[child] -= 1
+            if not remaining[child]:
+                heapq.heappush(ready, order[by_name[child]["name"]])
+    return now
+
+
+def estimate(steps, workers=DEFAULT_WORKERS, latency=DEFAULT_LATENCY, latencies=None,
+             rate_per_hour=DEFAULT_RATE_PER_HOUR, burst=None):
+    """
+    Request totals per endpoint and the estimated wall time: the longer of the concurrency-bound time
+    (see simulate) and the time the token bucket needs to let all requests through
+    (the burst goes at once, the rest at `rate_per_hour`; burst defaults as in ratelimit.TokenBucket).
+    Initial commits are planned as /src requests; `max_git_pushes` counts the pushes needed if every one of
+    them falls back to git (see BitbucketRepositories.create_initial_commit), which the estimate does not time.
+    `max_requests` adds the GET of the main branch that create_branches makes when no commit hash is known
+    (a git push, or a /src response without one).
+    """
+    endpoints = {}
+    for step in steps:
+        for op in step["operations"]:
+            key = f"{op['method']} {op['endpoint']}"
+            endpoints[key] = endpoints.get(key, 0) + 1
+    requests = sum(endpoints.values())
+    concurrency_seconds = simulate(steps, workers, latency, latencies)
+    rate_seconds = 0.0
+    if rate_per_hour:
+        burst = burst or max(1, int(rate_per_hour / 60))
+        rate_seconds = max(0, requests - burst) * 3600.0 / rate_per_hour
+    return {
+        "steps": len(steps),
+        "requests": requests,
+        "max_requests": requests + sum(1 for step in steps if step["name"][0] == "branches"),
+        "max_git_pushes": sum(1 for step in steps if step["name"][0] == "commit"),
+        "endpoints": dict(sorted(endpoints.items())),
+        "workers": workers,
+        "latency": latency,
+        "rate_per_hour": rate_per_hour,
+        "concurrency_seconds": round(concurrency_seconds, 1),
+        "rate_limit_seconds": round(rate_seconds, 1),
+        "estimated_seconds": round(max(concurrency_seconds, rate_seconds), 1),
+        "fits_in_hour": not rate_per_hour or requests <= rate_per_hour,
+    }
+
+
+def plan_bulk_run(yaml_file_path, workspace, operation="create", resume=False, journal_path=None):
+    """
+    Expand a manifest into the steps a bulk create or delete would run, without any network access.
+    With `resume=True` the steps recorded in the run's journal are left out.
+    """
+    completed = {}
+    if resume:
+        completed = read_journal(journal_path or default_journal_path(yaml_file_path, operation), workspace)
+    planner = plan_bulk_create if operation == "create" else plan_bulk_delete
+    return planner(iter_manifest(yaml_file_path), workspace, completed)
+
+
+def rate_budget():
+    """
+    (rate_per_hour, burst) the client is configured with (BITBUCKET_RATE_LIMIT, BITBUCKET_RATE_BURST),
+    falling back to Bitbucket's own hourly allowance.
+    """
+    rate = os.getenv("BITBUCKET_RATE_LIMIT")
+    burst = os.getenv("BITBUCKET_RATE_BURST")
+    return (float(rate) if rate else DEFAULT_RATE_PER_HOUR), (int(burst) if burst else None)
+
+
+def format_estimate(result):
+    minutes, seconds = divmod(int(round(result["estimated_seconds"])), 60)
+    lines = [f"{count:8d}  {endpoint}" for endpoint, count in result["endpoints"].items()]
+    lines.append(f"{result['requests']:8d}  requests in {result['steps']} steps")
+    if result["max_requests"] > result["requests"]:
+        lines.append(f"{result['max_requests']:8d}  requests at most, if branches must look up the main commit")
+    if result["max_git_pushes"]:
+        lines.append(f"{result['max_git_pushes']:8d}  git pushes at most, if initial commits fall back from /src")
+    lines.append(
+        f"Estimated wall time: {minutes}m {seconds:02d}s with {result['workers']} workers "
+        f"(concurrency {result['concurrency_seconds']}s, rate limit {result['rate_limit_seconds']}s)"
+    )
+    if not result["fits_in_hour"]:
+        lines.append(f"The run needs more than the {result['rate_per_hour']:g} requests/hour budget: "
+                     f"about {result['requests'] / result['rate_per_hour']:.1f} hours of allowance.")
+    return lines
@@ -0,0 +1,201 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+DEFAULT_WORKERS = 4
+
+
+class BufferedReport:
+    """
+    Collects output lines for one unit of work (e.g. a repository) so they can be
+    printed together instead of interleaving with other workers.
+    """
+    def __init__(self):
+        self.lines = []
+
+    def add(self, line):
+        self.lines.append(line)
+
+    def flush(self):
+        for line in self.lines:
+            print(line)
+        self.lines = []
+
+
+class BulkExecutor:
+    """
+    Runs a dependency graph of tasks on a bounded worker pool.
+    A task runs once all of its dependencies succeeded; if any dependency fails,
+    the task (and everything depending on it) is skipped.
+    A task succeeds when its function returns a truthy value.
+    With a journal (see journal.BulkJournal), successful tasks are recorded and tasks already
+    recorded are treated as done without running them.
+    The run time of every task that ran is kept in `timings` (see metrics.slowest_steps).
+    """
+    def __init__(self, workers=DEFAULT_WORKERS, journal=None):
+        self.workers = max(1, int(workers))
+        self.journal = journal
+        self.tasks = {}
+        self.status = {}
+        self.results = {}
+        self.errors = {}
+        self.resumed = set()
+        self.timings = {}
+        self._new = []
+        self._closed = set()
+        self._just_closed = []
+
+    def add(self, name, func, deps=(), group=None, journaled=True):
+        """
+        Register a task. Tasks may also be added while run() consumes its `feed`.
+        :param name: Unique, hashable task name.
+        :param func: Callable with no arguments.
+        :param deps: Names of tasks that must succeed first.
+        :param group: Optional key used to report when all tasks of a group are finished.
+        :param journaled: Record the task in the journal and skip it when already recorded. False for a task
+            that journals its own parts (e.g. one entry per branch), so it runs again for the parts left.
+        :return: The task name, so it can be used as a dependency.
+        """
+        if name in self.tasks:
+            raise ValueError(f"Duplicate task '{name}'.")
+        for dep in deps:
+            if dep not in self.tasks:
+                raise ValueError(f"Task '{name}' depends on unknown task '{dep}'.")
+        self.tasks[name] = {"func": func, "deps": list(deps), "group": group, "journaled": journaled}
+        self._new.append(name)
+        return name
+
+    def _timed(self, name):
+        started = time.perf_counter()
+        try:
+            return self.tasks[name]["func"]()
+        finally:
+            self.timings[name] = time.perf_counter() - started
+
+    def close_group(self, group):
+        """
+        Declare that no more tasks will be added to a group. Only needed with a `feed`:
+        on_group_done is then held back until the group is closed (or the feed is exhausted).
+        """
+        self._closed.add(group)
+        self._just_closed.append(group)
+
+    def run(self, on_group_done=None, on_error=None, feed=None):
+        """
+        Execute all tasks. Callbacks are invoked from the calling thread.
+        :param on_group_done: Called with the group key once every task of that group finished or was skipped.
+        :param on_error: Called with (name, group, exception) when a task raises.
+        :param feed: Optional iterator whose steps add() more tasks (e.g. one manifest record per step).
+            It is consumed while tasks run, keeping about two tasks per worker in flight,
+            so work starts before the whole input has been read.
+        :return: A dict mapping task name to 'done', 'failed' or 'skipped'.
+        :raises: Whatever the feed raises, once the tasks already started have finished.
+        """
+        remaining = {}
+        dependents = {}
+        group_left = {}
+        reported = set()
+        feeding = feed is not None
+
+        def report_group(group):
+            if group_left.get(group, 0) or group in reported or (feeding and group not in self._closed):
+                return
+            reported.add(group)
+            if on_group_done:
+                on_group_done(group)
+
+        def finish(name, state):
+            self.status[name] = state
+            group = self.tasks[name]["group"]
+            if group is not None:
+                group_left[group] -= 1
+                report_group(group)
+
+        def skip(name):
+            if name in self.status:
+                return
+            finish(name, "skipped")
+            for child in dependents[name]:
+                skip(child)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            running = {}
+            started = set()
+
+            def complete(name, result):
+                self.results[name] = result
+                ok = bool(result)
+                finish(name, "done" if ok else "failed")
+                for child in dependents[name]:
+                    if not ok:
+                        skip(child)
+                    elif child not in self.status:
+                        remaining[child].discard(name)
+                        if not remaining[child]:
+                            submit(child)
+
+            def submit(name):
+                started.add(name)
+                if self.journal is not None and self.tasks[name]["journaled"] and self.journal.done(name):
+                    # Completed by an earlier run: no API calls
+                    self.resumed.add(name)
+                    complete(name, self.journal.get(name) or True)
+                else:
+                    running[pool.submit(self._timed, name)] = name
+
+            def register_new():
+                new, self._new = self._new, []
+                # Count every new task first, so a group cannot look finished halfway through a batch
+                for name in new:
+                    task = self.tasks[name]
+                    dependents[name] = []
+                    remaining[name] = {dep for dep in task["deps"] if self.status.get(dep) != "done"}
+                    for dep in task["deps"]:
+                        dependents[dep].append(name)
+                    if task["group"] is not None:
+                        group_left[task["group"]] = group_left.get(task["group"], 0) + 1
+                for name in new:
+                    if name in self.status or name in started:
+                        continue
+                    if any(self.status.get(dep) in ("failed", "skipped") for dep in self.tasks[name]["deps"]):
+                        skip(name)
+                    elif not remaining[name]:
+                        submit(name)
+                closed, self._just_closed = self._just_closed, []
+                for group in closed:
+                    report_group(group)
+
+            feed_error = None
+            register_new()
+            while True:
+                while feeding and len(running) < 2 * self.workers:
+                    try:
+                        next(feed)
+                    except Exception as e:
+                        # Finish (and journal) the work already started before reporting a bad input
+                        if not isinstance(e, StopIteration):
+                            feed_error = e
+                        feeding = False
+                        for group in list(group_left):
+                            report_group(group)
+                    register_new()
+
+                if not running:
+                    if feeding:
+                        continue
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = None
+                        self.errors[name] = e
+                        if on_error:
+                            on_error(name, self.tasks[name]["group"], e)
+                    if result and self.journal is not None and self.tasks[name]["journaled"]:
+                        self.journal.record(name, result if isinstance(result, dict) else None)
+                    complete(name, result)
+        if feed_error is not None:
+            raise feed_error
+        return self.status
@@ -1,4 +1,91 @@
-import requests
+from concurrent.futures import ThreadPoolExecutor
+
+from .api import BitbucketAPIError, api_base_url, paginate, response_json
+from .async_api import apaginate
+from .executor import DEFAULT_WORKERS
+from .rules import ManifestError, as_list
+
+
+def _member_name(member):
+    # Member pages list either the user object itself or {"user": {...}}
+    user = member.get("user", member)
+    return user["nickname"] if "nickname" in user else user["username"]
+
+
+def _move_user_result(response, username, group_slug):
+    if response.status_code in [200, 201]:
+        return {"message": f"User '{username}' moved to group '{group_slug}' successfully."}
+    else:
+        return {
+            "error": f"Failed to move user to group. Status code: {response.status_code}",
+            "details": response_json(response),
+        }
+
+
+def _remove_user_result(response, username, group_slug):
+    if response.status_code in [200, 204]:
+        return {"message": f"User '{username}' removed from group '{group_slug}'."}
+    else:
+        return {
+            "error": f"Failed to remove user from group. Status code: {response.status_code}",
+            "details": response_json(response),
+        }
+
+
+def plan_group_changes(desired, current, remove=True):
+    """
+    Diff desired group membership against the current one.
+    :param desired: {group_slug: [usernames]}.
+    :param current: {group_slug: set of usernames}.
+    :param remove: Also remove members that are not listed (otherwise only add).
+    :return: (changes, unchanged) where changes is a list of {"group", "user", "action": "add"|"remove"}.
+    """
+    changes = []
+    unchanged = 0
+    for group_slug, members in desired.items():
+        wanted = set(members)
+        have = current.get(group_slug, set())
+        unchanged += len(wanted & have)
+        changes.extend({"group": group_slug, "user": user, "action": "add"} for user in sorted(wanted - have))
+        if remove:
+            changes.extend({"group": group_slug, "user": user, "action": "remove"} for user in sorted(have - wanted))
+    return changes, unchanged
+
+
+def read_group_members(section):
+    """
+    Normalise the `groups:` section of a manifest ({group_slug: [usernames]} or "a;b" strings).
+    :raises ManifestError: If the section is not a mapping of groups to members.
+    """
+    if not isinstance(section, dict):
+        raise ManifestError("The 'groups' section must map group slugs to lists of usernames.")
+    desired = {}
+    for group_slug, members in section.items():
+        if members is not None and not isinstance(members, (str, list)):
+            raise ManifestError(f"The members of group '{group_slug}' must be a list of usernames.")
+        desired[str(group_slug)] = as_list(members)
+    return desired
+
+
+def format_group_summary(changes, unchanged):
+    from colorama import Fore
+
+    lines = []
+    for change in changes:
+        target = f"'{change['user']}' {'to' if change['action'] == 'add' else 'from'} group '{change['group']}'"
+        if "success" not in change:
+            lines.append(f"{Fore.CYAN}~ {change['action']} {target}")
+        elif not change["success"]:
+            lines.append(f"{Fore.RED}Failed to {change['action']} {target}: {change['result'].get('error')}")
+    if changes and "success" not in changes[0]:
+        lines.append(f"{Fore.CYAN}Plan: {len(changes)} change(s), {unchanged} member(s) already in place.")
+        return lines
+    added = sum(1 for c in changes if c["success"] and c["action"] == "add")
+    removed = sum(1 for c in changes if c["success"] and c["action"] == "remove")
+    failed = sum(1 for c in changes if not c["success"])
+    lines.append(f"{Fore.GREEN if not failed else Fore.YELLOW}Groups: {added} added, {removed} removed, "
+                 f"{unchanged} unchanged, {failed} failed.")
+    return lines
 
 
 class BitbucketGroups:
@@ -8,6 +95,8 @@ class BitbucketGroups:
         :param auth: An object responsible for providing authentication headers.
         """
         self.auth = auth
+        self.client = auth.client
+        self.base_url = api_base_url()
 
     # Removed `list_groups` method
 
@@ -20,16 +109,122 @@ class BitbucketGroups:
         :param group_slug: The slug of the group to move the user to.
         :return: A success message or an error message.
         """
-        url = f"https://api.bitbucket.org/2.0/workspaces/{workspace}/permissions/groups/{group_slug}/members"
+        url = f"{self.base_url}/workspaces/{workspace}/permissions/groups/{group_slug}/members"
         payload = {"username": username}
         try:
-            response = requests.post(url, json=payload, headers=self.auth.get_headers())
-            if response.status_code in [200, 201]:
-                return {"message": f"User '{username}' moved to group '{group_slug}' successfully."}
+            response = self.client.post(url, json=payload, headers=self.auth.get_headers())
+            return _move_user_result(response, username, group_slug)
+        except Exception as e:
+            return {"error": f"An exception occurred: {str(e)}"}
+
+    def remove_user_from_group(self, workspace, username, group_slug):
+        """
+        Remove a user from a group in a workspace.
+        :return: A success message or an error message.
+        """
+        url = f"{self.base_url}/workspaces/{workspace}/permissions/groups/{group_slug}/members/{username}"
+        try:
+            response = self.client.delete(url, headers=self.auth.get_headers())
+            return _remove_user_result(response, username, group_slug)
+        except Exception as e:
+            return {"error": f"An exception occurred: {str(e)}"}
+
+    def iter_group_members(self, workspace, group_slug, prefetch=False):
+        """
+        Lazily yield the usernames of every member of a group, page by page.
+        Raises BitbucketAPIError if a page cannot be fetched.
+        """
+        url = f"{self.base_url}/workspaces/{workspace}/permissions/groups/{group_slug}/members"
+        for member in paginate(self.client, url, headers=self.auth.get_headers(), prefetch=prefetch):
+            yield _member_name(member)
+
+    def sync_group_members(self, workspace, desired, remove=True, workers=DEFAULT_WORKERS, dry_run=False):
+        """
+        Make group membership match `desired` with the fewest calls: the members of every group are
+        listed once (groups concurrently), then only the missing adds and removes are applied concurrently.
+        :param desired: {group_slug: [usernames]}.
+        :param remove: Remove members that are not listed; with False users are only added.
+        :param dry_run: Return the planned changes without applying them.
+        :return: (changes, unchanged); applied changes carry "success" and the API "result".
+        :raises BitbucketAPIError: If the membership of a group cannot be read.
+        """
+        group_slugs = list(desired)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            listings = pool.map(lambda group_slug: set(self.iter_group_members(workspace, group_slug)), group_slugs)
+            current = dict(zip(group_slugs, listings))
+        changes, unchanged = plan_group_changes(desired, current, remove=remove)
+        if dry_run:
+            return changes, unchanged
+
+        def apply(change):
+            if change["action"] == "add":
+                result = self.move_user_to_group(workspace, change["user"], change["group"])
             else:
-                return {
-                    "error": f"Failed to move user to group. Status code: {response.status_code}",
-                    "details": response.json(),
-                }
+                result = self.remove_user_from_group(workspace, change["user"], change["group"])
+            return dict(change, success="error" not in result, result=result)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            return list(pool.map(apply, changes)), unchanged
+
+    def sync_groups_from_manifest(self, yaml_file_path, workspace, remove=True, workers=DEFAULT_WORKERS, dry_run=False):
+        """
+        Sync the groups listed in the `groups:` section of a YAML manifest and print a summary:
+
+            groups:
+              developers: [alice, bob]
+              admins: [carol]
+
+        :return: The result of sync_group_members, or None if the manifest or a group could not be read.
+        """
+        from .manifest import load_section, run_manifest_command
+
+        def command():
+            desired = read_group_members(load_section(yaml_file_path, "groups", {}))
+            changes, unchanged = self.sync_group_members(workspace, desired, remove=remove, workers=workers,
+                                                         dry_run=dry_run)
+            for line in format_group_summary(changes, unchanged):
+                print(line)
+            return changes, unchanged
+
+        return run_manifest_command(yaml_file_path, command, "Failed to read group members")
+
+
+class AsyncBitbucketGroups:
+    def __init__(self, auth, client=None):
+        """
+        asyncio counterpart of BitbucketGroups; returns the same result dicts.
+        :param auth: An object responsible for providing authentication headers.
+        :param client: Optional AsyncBitbucketAPI; defaults to the one shared through auth.
+        """
+        self.auth = auth
+        self.client = client or auth.async_client
+        self.base_url = api_base_url()
+
+    async def move_user_to_group(self, workspace, username, group_slug):
+        """
+        Move a user to a different group in a workspace.
+        :param workspace: The workspace ID.
+        :param username: The username of the user to move.
+        :param group_slug: The slug of the group to move the user to.
+        :return: A success message or an error message.
+        """
+        url = f"{self.base_url}/workspaces/{workspace}/permissions/groups/{group_slug}/members"
+        payload = {"username": username}
+        try:
+            response = await self.client.post(url, json=payload, headers=self.auth.get_headers())
+            return _move_user_result(response, username, group_slug)
         except Exception as e:
             return {"error": f"An exception occurred: {str(e)}"}
+
+    async def remove_user_from_group(self, workspace, username, group_slug):
+        url = f"{self.base_url}/workspaces/{workspace}/permissions/groups/{group_slug}/members/{username}"
+        try:
+            response = await self.client.delete(url, headers=self.auth.get_headers())
+            return _remove_user_result(response, username, group_slug)
+        except Exception as e:
+            return {"error": f"An exception occurred: {str(e)}"}
+
+    async def iter_group_members(self, workspace, group_slug, prefetch=False):
+        url = f"{self.base_url}/workspaces/{workspace}/permissions/groups/{group_slug}/members"
+        async for member in apaginate(self.client, url, headers=self.auth.get_headers(), prefetch=prefetch):
+            yield _member_name(member)
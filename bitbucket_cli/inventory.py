@@ -0,0 +1,364 @@
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from .api import BitbucketAPIError
+from .executor import DEFAULT_WORKERS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS projects (key TEXT PRIMARY KEY, name TEXT, description TEXT);
+CREATE TABLE IF NOT EXISTS repositories (
+    slug TEXT PRIMARY KEY, name TEXT, project_key TEXT, is_private INTEGER, mainbranch TEXT,
+    description TEXT, fork_policy TEXT, updated_on TEXT
+);
+CREATE INDEX IF NOT EXISTS repositories_project ON repositories (project_key);
+CREATE TABLE IF NOT EXISTS branches (repo_slug TEXT, name TEXT, PRIMARY KEY (repo_slug, name));
+CREATE TABLE IF NOT EXISTS branch_restrictions (
+    repo_slug TEXT, id INTEGER, kind TEXT, pattern TEXT, data TEXT, PRIMARY KEY (repo_slug, id)
+);
+CREATE INDEX IF NOT EXISTS branch_restrictions_kind ON branch_restrictions (kind, pattern);
+CREATE TABLE IF NOT EXISTS members (nickname TEXT PRIMARY KEY, display_name TEXT, data TEXT);
+CREATE TABLE IF NOT EXISTS user_permissions (
+    repo_slug TEXT, username TEXT, permission TEXT, PRIMARY KEY (repo_slug, username)
+);
+CREATE INDEX IF NOT EXISTS user_permissions_user ON user_permissions (username, permission);
+CREATE TABLE IF NOT EXISTS group_permissions (
+    repo_slug TEXT, group_slug TEXT, permission TEXT, PRIMARY KEY (repo_slug, group_slug)
+);
+"""
+
+# Tables holding per-repository details, dropped with the repository
+REPOSITORY_TABLES = ("branches", "branch_restrictions", "user_permissions", "group_permissions")
+
+
+class InventoryError(ValueError):
+    """The inventory file is missing or belongs to another workspace."""
+
+
+def default_inventory_path(workspace):
+    # BITBUCKET_INVENTORY overrides the per-workspace file in the user's home directory
+    return os.getenv("BITBUCKET_INVENTORY") or os.path.join(
+        os.path.expanduser("~"), ".bitbucket_cli", f"inventory-{workspace}.sqlite"
+    )
+
+
+def open_inventory(workspace, path=None):
+    """
+    Open an inventory that was synced before (see Inventory.sync).
+    :raises InventoryError: If there is none yet, or it mirrors another workspace.
+    """
+    path = path or default_inventory_path(workspace)
+    if not os.path.exists(path):
+        raise InventoryError(f"No inventory at '{path}'. Run 'bitbucket_cli inventory sync' first.")
+    inventory = Inventory(path, workspace)
+    mirrored = inventory.meta("workspace")
+    if mirrored not in (None, workspace):
+        inventory.close()
+        raise InventoryError(f"The inventory at '{path}' mirrors workspace '{mirrored}', not '{workspace}'.")
+    return inventory
+
+
+def _visible(listing):
+    # Restrictions and group permissions need admin rights on the repository: without them, store none
+    try:
+        return list(listing)
+    except BitbucketAPIError as e:
+        if e.status_code == 403:
+            return []
+        raise
+
+
+class Inventory:
+    """
+    Local SQLite mirror of one workspace: projects, repositories, branches, branch restrictions,
+    members and repository permissions, indexed for lookups by project, user and restriction.
+
+    Besides its own queries it offers the read methods of the API classes the planners use
+    (iter_workspace_repositories, iter_branch_restrictions, iter_workspace_repository_permissions, ...)
+    with the same results, so it can stand in for repos_api/users_api/branch_api when reading state.
+    The `workspace` argument of those methods is accepted for compatibility and ignored.
+    """
+    def __init__(self, path, workspace):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.workspace = workspace
+        self.lock = threading.Lock()
+        # Planners read from worker threads; every access goes through the lock
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _query(self, sql, params=()):
+        with self.lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def meta(self, key):
+        with self.lock:
+            return self._meta(key)
+
+    def _meta(self, key):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    # Refresh
+
+    def sync(self, projects_api, repos_api, users_api, branch_api, workers=DEFAULT_WORKERS, full=False):
+        """
+        Refresh the mirror. Projects, members, the repository slugs and the workspace-level user
+        permissions are re-listed every time (a few pages each); repository settings, branches,
+        branch restrictions and group permissions are refetched only for repositories whose
+        `updated_on` is newer than the last sync (all of them the first time or with `full=True`).
+        Repositories that disappeared are dropped.
+        Changes that do not touch `updated_on` (e.g. a new branch restriction) need `full=True`.
+        :return: {"projects", "repositories", "refreshed", "removed", "failed": [slugs], "full"}
+        :raises BitbucketAPIError: If a workspace-level listing fails.
+        """
+        workspace = self.workspace
+        since = None if full else self.meta("repositories_updated_on")
+        projects = list(projects_api.iter_projects(workspace, prefetch=True))
+        members = list(users_api.iter_members(workspace, prefetch=True))
+        known = {row["slug"] for row in self._query("SELECT slug FROM repositories")}
+
+        if since:
+            changed = list(repos_api.iter_workspace_repositories(workspace, prefetch=True, updated_since=since))
+            slugs = set(repos_api.iter_repository_slugs(workspace, prefetch=True))
+            if slugs - known - {repo["slug"] for repo in changed}:
+                # Repositories we never stored (e.g. an earlier sync failed midway): list everything
+                since = None
+        if not since:
+            changed = list(repos_api.iter_workspace_repositories(workspace, prefetch=True))
+            slugs = {repo["slug"] for repo in changed}
+
+        def fetch(repo):
+            slug = repo["slug"]
+            try:
+                return (
+                    list(repos_api.iter_branches(workspace, slug)),
+                    _visible(branch_api.iter_branch_restrictions(workspace, slug, prefetch=True)),
+                    _visible(users_api.iter_groups_and_permissions(workspace, slug)),
+                )
+            except BitbucketAPIError:
+                return None
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            details = dict(zip([repo["slug"] for repo in changed], pool.map(fetch, changed)))
+
+        try:
+            user_permissions = [
+                (entry["repo_slug"], entry["username"], entry["permission"])
+                for entry in users_api.iter_workspace_repository_permissions(workspace, prefetch=True)
+            ]
+            listed_users = None
+        except BitbucketAPIError:
+            # Without admin rights: per-repository listings, for the refreshed repositories only
+            listed_users = [repo["slug"] for repo in changed if details[repo["slug"]] is not None]
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                listings = pool.map(lambda slug: _visible(users_api.iter_users_and_permissions(workspace, slug)),
+                                    listed_users)
+                user_permissions = [(slug, user["username"], user["permission"])
+                                    for slug, users in zip(listed_users, listings) for user in users]
+
+        failed = sorted(slug for slug, fetched in details.items() if fetched is None)
+        removed = known - slugs
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM projects")
+            self.db.executemany(
+                "INSERT INTO projects VALUES (?, ?, ?)",
+                [(p["key"], p.get("name"), p.get("description", "")) for p in projects]
+            )
+            self.db.execute("DELETE FROM members")
+            self.db.executemany(
+                "INSERT OR REPLACE INTO members VALUES (?, ?, ?)",
+                [(m["user"]["nickname"], m["user"].get("display_name"), json.dumps(m)) for m in members]
+            )
+            for slug in removed | {slug for slug, fetched in details.items() if fetched is not None}:
+                for table in REPOSITORY_TABLES:
+                    if table != "user_permissions" or listed_users is not None:
+                        self.db.execute(f"DELETE FROM {table} WHERE repo_slug = ?", (slug,))
+            self.db.executemany("DELETE FROM repositories WHERE slug = ?", [(slug,) for slug in removed])
+            for repo in changed:
+                fetched = details[repo["slug"]]
+                if fetched is None:
+                    continue
+                branches, restrictions, groups = fetched
+                self.db.execute(
+                    "INSERT OR REPLACE INTO repositories VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (repo["slug"], repo["name"], repo["project"], int(bool(repo["is_private"])), repo["mainbranch"],
+                     repo.get("description"), repo.get("fork_policy"), repo.get("updated_on"))
+                )
+                self.db.executemany("INSERT INTO branches VALUES (?, ?)", [(repo["slug"], b) for b in branches])
+                self.db.executemany(
+                    "INSERT INTO branch_restrictions VALUES (?, ?, ?, ?, ?)",
+                    [(repo["slug"], r.get("id"), r.get("kind"), r.get("pattern"), json.dumps(r)) for r in restrictions]
+                )
+                self.db.executemany(
+                    "INSERT INTO group_permissions VALUES (?, ?, ?)",
+                    [(repo["slug"], g["group"], g["permission"]) for g in groups]
+                )
+            if listed_users is None:
+                self.db.execute("DELETE FROM user_permissions")
+            self.db.executemany("INSERT OR REPLACE INTO user_permissions VALUES (?, ?, ?)",
+                                [entry for entry in user_permissions if entry[0] in slugs])
+
+            watermark = max((repo["updated_on"] for repo in changed if repo.get("updated_on")), default=None)
+            meta = {"workspace": workspace, "synced_at": datetime.now(timezone.utc).isoformat()}
+            # A failed repository keeps the old watermark, so the next sync fetches it again
+            if watermark and not failed:
+                previous = self._meta("repositories_updated_on")
+                meta["repositories_updated_on"] = max(watermark, previous or watermark)
+            self.db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", meta.items())
+
+        return {
+            "projects": len(projects),
+            "repositories": len(slugs),
+            "refreshed": len(changed) - len(failed),
+            "removed": len(removed),
+            "failed": failed,
+            "full": not since,
+        }
+
+    # Queries
+
+    def repositories(self, project_key=None):
+        sql = "SELECT * FROM repositories"
+        params = ()
+        if project_key:
+            sql, params = sql + " WHERE project_key = ?", (project_key,)
+        return [_repository(row) for row in self._query(sql + " ORDER BY slug", params)]
+
+    def permissions(self, username=None, permission=None, project_key=None):
+        """
+        Explicit user permissions as {"repo_slug", "project", "username", "permission"}, optionally filtered,
+        e.g. permissions(permission="admin") for who has admin where.
+        """
+        sql = ("SELECT p.repo_slug, r.project_key, p.username, p.permission FROM user_permissions p "
+               "JOIN repositories r ON r.slug = p.repo_slug WHERE 1 = 1")
+        params = []
+        for column, value in (("p.username", username), ("p.permission", permission), ("r.project_key", project_key)):
+            if value:
+                sql += f" AND {column} = ?"
+                params.append(value)
+        return [
+            {"repo_slug": row[0], "project": row[1], "username": row[2], "permission": row[3]}
+            for row in self._query(sql + " ORDER BY p.repo_slug, p.username", params)
+        ]
+
+    def unprotected_repositories(self, branch="main", project_key=None):
+        """
+        Repositories that have `branch` but no push restriction on it.
+        """
+        sql = ("SELECT r.* FROM repositories r JOIN branches b ON b.repo_slug = r.slug AND b.name = ? "
+               "WHERE NOT EXISTS (SELECT 1 FROM branch_restrictions x "
+               "WHERE x.repo_slug = r.slug AND x.kind = 'push' AND x.pattern = ?)")
+        params = [branch, branch]
+        if project_key:
+            sql += " AND r.project_key = ?"
+            params.append(project_key)
+        return [_repository(row) for row in self._query(sql + " ORDER BY r.slug", params)]
+
+    # Read methods of the API classes
+
+    def iter_projects(self, workspace=None, prefetch=False):
+        for row in self._query("SELECT * FROM projects ORDER BY key"):
+            yield {"key": row["key"], "name": row["name"], "description": row["description"]}
+
+    def iter_members(self, workspace=None, prefetch=False):
+        for row in self._query("SELECT data FROM members ORDER BY nickname"):
+            yield json.loads(row["data"])
+
+    def iter_workspace_repositories(self, workspace=None, project_keys=None, prefetch=False, updated_since=None):
+        sql, params = "SELECT * FROM repositories WHERE 1 = 1", []
+        if project_keys:
+            sql += f" AND project_key IN ({', '.join('?' * len(project_keys))})"
+            params.extend(project_keys)
+        if updated_since:
+            sql += " AND updated_on > ?"
+            params.append(updated_since)
+        for row in self._query(sql + " ORDER BY slug", params):
+            yield _repository(row)
+
+    def iter_repository_slugs(self, workspace=None, prefetch=False):
+        for row in self._query("SELECT slug FROM repositories ORDER BY slug"):
+            yield row["slug"]
+
+    def iter_repositories(self, workspace, project_key, prefetch=False):
+        for repo in self.repositories(project_key):
+            yield {"slug": repo["slug"], "name": repo["name"]}
+
+    def list_repositories(self, workspace, project_key):
+        return {"success": True, "repositories": list(self.iter_repositories(workspace, project_key))}
+
+    def iter_branches(self, workspace, repo_slug):
+        for row in self._query("SELECT name FROM branches WHERE repo_slug = ? ORDER BY name", (repo_slug,)):
+            yield row["name"]
+
+    def iter_branch_restrictions(self, workspace, repo_slug, prefetch=False):
+        for row in self._query("SELECT data FROM branch_restrictions WHERE repo_slug = ? ORDER BY id", (repo_slug,)):
+            yield json.loads(row["data"])
+
+    def _member_ids(self):
+        # uuid and account_id of each member by nickname, as the API adds them to permission entries
+        ids = {}
+        for member in self.iter_members():
+            user = member.get("user", {})
+            ids[user.get("nickname")] = {key: user[key] for key in ("uuid", "account_id") if user.get(key)}
+        return ids
+
+    def iter_users_and_permissions(self, workspace, repo_slug, prefetch=False):
+        rows = self._query("SELECT username, permission FROM user_permissions WHERE repo_slug = ? ORDER BY username",
+                           (repo_slug,))
+        ids = self._member_ids()
+        for row in rows:
+            yield {"username": row["username"], "permission": row["permission"], **ids.get(row["username"], {})}
+
+    def list_users_and_permissions(self, workspace, repo_slug):
+        return {"success": True, "users": list(self.iter_users_and_permissions(workspace, repo_slug))}
+
+    def iter_groups_and_permissions(self, workspace, repo_slug, prefetch=False):
+        rows = self._query("SELECT group_slug, permission FROM group_permissions WHERE repo_slug = ? "
+                           "ORDER BY group_slug", (repo_slug,))
+        for row in rows:
+            yield {"group": row["group_slug"], "permission": row["permission"]}
+
+    def iter_workspace_repository_permissions(self, workspace=None, project_key=None, prefetch=False):
+        ids = self._member_ids()
+        for entry in self.permissions(project_key=project_key):
+            yield {"repo_slug": entry["repo_slug"], "username": entry["username"], "permission": entry["permission"],
+                   **ids.get(entry["username"], {})}
+
+    def list_project_permissions(self, workspace, project_key, repositories, workers=DEFAULT_WORKERS):
+        permissions = {repo["slug"]: {"success": True, "users": []} for repo in repositories}
+        for entry in self.permissions(project_key=project_key):
+            if entry["repo_slug"] in permissions:
+                permissions[entry["repo_slug"]]["users"].append(
+                    {"username": entry["username"], "permission": entry["permission"]}
+                )
+        return permissions
+
+
+def _repository(row):
+    return {
+        "slug": row["slug"],
+        "name": row["name"],
+        "project": row["project_key"],
+        "is_private": bool(row["is_private"]),
+        "mainbranch": row["mainbranch"],
+        "description": row["description"],
+        "fork_policy": row["fork_policy"],
+        "updated_on": row["updated_on"],
+    }
@@ -0,0 +1,77 @@
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+
+def default_journal_path(yaml_file_path, operation):
+    # One journal per manifest and operation, so a delete run never resumes from a create journal
+    return f"{yaml_file_path}.{operation}.journal"
+
+
+def read_journal(path, workspace):
+    """
+    The steps a journal records as completed for `workspace`, as {step tuple: data}, without opening it
+    for writing. A missing journal has none.
+    """
+    completed = {}
+    if not os.path.exists(path):
+        return completed
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash: that step is simply run again
+                continue
+            if entry.get("workspace") == workspace:
+                completed[tuple(entry["step"])] = entry.get("data")
+    return completed
+
+
+class BulkJournal:
+    """
+    Append-only JSON Lines record of the bulk steps that completed, one line per step:
+    {"workspace": ..., "step": [...], "data": ..., "at": ...}
+    Lines are flushed as soon as a step finishes, so the journal survives the process dying midway.
+    With `resume=True` the existing journal is loaded and extended; otherwise it is started afresh.
+    Entries written for another workspace are ignored.
+    """
+    def __init__(self, path, workspace, resume=False):
+        self.path = path
+        self.workspace = workspace
+        self.completed = {}
+        self.lock = threading.Lock()
+        if resume and os.path.exists(path):
+            self._load()
+        self.file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def _load(self):
+        self.completed.update(read_journal(self.path, self.workspace))
+
+    def done(self, step):
+        return tuple(step) in self.completed
+
+    def get(self, step):
+        return self.completed.get(tuple(step))
+
+    def record(self, step, data=None):
+        entry = {
+            "workspace": self.workspace,
+            "step": list(step),
+            "data": data,
+            "at": datetime.now(timezone.utc).isoformat(),
+        }
+        with self.lock:
+            self.file.write(json.dumps(entry) + "\n")
+            self.file.flush()
+            self.completed[tuple(step)] = data
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
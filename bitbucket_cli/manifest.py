@@ -0,0 +1,302 @@
+import csv
+import json
+import os
+
+import yaml
+
+from .rules import ManifestError
+
+# libyaml's C parser is several times faster than the pure-Python one; fall back when PyYAML was built without it
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+MERGE_TAG = "tag:yaml.org,2002:merge"
+
+CSV_COLUMNS = ["project", "project_name", "project_description", "slug", "is_private", "branches"]
+
+
+def _compose(loader, anchors):
+    # Build one node from the event stream, like yaml.composer.Composer.compose_node
+    # (the C loader exposes events but not the composer).
+    event = loader.get_event()
+    if isinstance(event, yaml.AliasEvent):
+        if event.anchor not in anchors:
+            raise ManifestError(f"Unknown YAML alias '*{event.anchor}'.")
+        return anchors[event.anchor]
+    if isinstance(event, yaml.ScalarEvent):
+        tag = event.tag if event.tag not in (None, "!") else loader.resolve(yaml.ScalarNode, event.value, event.implicit)
+        node = yaml.ScalarNode(tag, event.value, event.start_mark, event.end_mark, style=event.style)
+    elif isinstance(event, yaml.SequenceStartEvent):
+        tag = event.tag if event.tag not in (None, "!") else loader.resolve(yaml.SequenceNode, None, event.implicit)
+        node = yaml.SequenceNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+        if event.anchor:
+            anchors[event.anchor] = node
+        while not loader.check_event(yaml.SequenceEndEvent):
+            node.value.append(_compose(loader, anchors))
+        node.end_mark = loader.get_event().end_mark
+    elif isinstance(event, yaml.MappingStartEvent):
+        tag = event.tag if event.tag not in (None, "!") else loader.resolve(yaml.MappingNode, None, event.implicit)
+        node = yaml.MappingNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+        if event.anchor:
+            anchors[event.anchor] = node
+        while not loader.check_event(yaml.MappingEndEvent):
+            key = _compose(loader, anchors)
+            node.value.append((key, _compose(loader, anchors)))
+        node.end_mark = loader.get_event().end_mark
+    else:
+        raise ManifestError(f"Unexpected YAML event {event}.")
+    if event.anchor:
+        anchors[event.anchor] = node
+    return node
+
+
+def _skip(loader, anchors):
+    # Consume the events of one node without building it; anchored nodes are kept for later aliases
+    event = loader.peek_event()
+    if not isinstance(event, yaml.AliasEvent) and event.anchor:
+        _compose(loader, anchors)
+        return
+    loader.get_event()
+    if isinstance(event, yaml.SequenceStartEvent):
+        while not loader.check_event(yaml.SequenceEndEvent):
+            _skip(loader, anchors)
+        loader.get_event()
+    elif isinstance(event, yaml.MappingStartEvent):
+        while not loader.check_event(yaml.MappingEndEvent):
+            _skip(loader, anchors)
+        loader.get_event()
+
+
+def _project_record(project):
+    return {
+        "key": project["key"],
+        "name": project.get("name", project["key"]),
+        "description": project.get("description", ""),
+    }
+
+
+def _repository_record(project_key, repo):
+    return {
+        "project": project_key,
+        "slug": repo["slug"],
+        "is_private": repo.get("is_private", True),
+        "branches": repo.get("branches", ""),
+    }
+
+
+def _iter_yaml(file):
+    """
+    Walk the `projects:` list of a YAML manifest one repository at a time instead of building the whole document.
+    Repositories are streamed once the project's `key` is known; those listed before it are held until the
+    project mapping ends. Other project fields, including merge keys (`<<: *defaults`), must come before
+    `repositories:`.
+    :raises ManifestError: If a project has no key, or a field follows a streamed `repositories:` list.
+    """
+    loader = YAML_LOADER(file)
+    anchors = {}
+
+    def value(node=None):
+        data = loader.construct_object(node or _compose(loader, anchors), deep=True)
+        # Constructed objects are only needed for aliases within the record being built
+        loader.constructed_objects = {}
+        return data
+
+    def merge(project):
+        # `<<: *a` or `<<: [*a, *b]`: keys of the project itself win, then the earlier mappings
+        sources = value()
+        for source in sources if isinstance(sources, list) else [sources]:
+            if not isinstance(source, dict):
+                raise ManifestError("A merge key ('<<') must refer to a mapping or a list of mappings.")
+            for field, data in source.items():
+                project.setdefault(field, data)
+
+    def expect(event_type, what):
+        if not loader.check_event(event_type):
+            raise ManifestError(f"Expected {what} in the manifest, got {loader.peek_event()}.")
+        loader.get_event()
+
+    try:
+        loader.get_event()  # StreamStart
+        if loader.check_event(yaml.StreamEndEvent):
+            return
+        loader.get_event()  # DocumentStart
+        expect(yaml.MappingStartEvent, "a mapping with a 'projects' list")
+        while not loader.check_event(yaml.MappingEndEvent):
+            if value() != "projects":
+                _skip(loader, anchors)
+                continue
+            if loader.check_event(yaml.ScalarEvent):
+                value()  # `projects:` left empty
+                continue
+            expect(yaml.SequenceStartEvent, "a list of projects")
+            while not loader.check_event(yaml.SequenceEndEvent):
+                expect(yaml.MappingStartEvent, "a project mapping")
+                project, announced, listed, pending = {}, False, False, []
+                while not loader.check_event(yaml.MappingEndEvent):
+                    key_node = _compose(loader, anchors)
+                    key = "<<" if key_node.tag == MERGE_TAG else value(key_node)
+                    if key != "repositories":
+                        if announced:
+                            # The project was already handed out with the fields read so far
+                            raise ManifestError(f"Project '{project['key']}': '{key}' must come before "
+                                                f"'repositories'.")
+                        if key == "<<":
+                            merge(project)
+                        else:
+                            project[key] = value()
+                        continue
+                    listed = True
+                    if not announced and "key" in project:
+                        yield "project", _project_record(project)
+                        announced = True
+                    if loader.check_event(yaml.ScalarEvent):
+                        value()  # `repositories:` left empty
+                        continue
+                    expect(yaml.SequenceStartEvent, "a list of repositories")
+                    while not loader.check_event(yaml.SequenceEndEvent):
+                        if announced:
+                            yield "repository", _repository_record(project["key"], value())
+                        else:
+                            # No key yet: keep this project's repositories until its mapping is complete
+                            pending.append(value())
+                    loader.get_event()
+                loader.get_event()
+                if "key" not in project:
+                    raise ManifestError(f"A project has no 'key' (fields: {', '.join(map(str, project)) or 'none'}).")
+                if not announced:
+                    yield "project", _project_record(project)
+                if not listed:
+                    # Repositories that only came in through a merge key
+                    pending.extend(project.get("repositories") or [])
+                for repo in pending:
+                    yield "repository", _repository_record(project["key"], repo)
+            loader.get_event()
+    finally:
+        loader.dispose()
+
+
+def _iter_json_lines(file):
+    """
+    One JSON object per line: a project ({"key", "name", "description"}, optionally with "repositories")
+    or a repository ({"project", "slug", "is_private", "branches"}).
+    """
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError as e:
+            raise ManifestError(f"Line {number}: {e}")
+        if "slug" in entry:
+            yield "repository", _repository_record(entry["project"], entry)
+        else:
+            yield "project", _project_record(entry)
+            for repo in entry.get("repositories", []):
+                yield "repository", _repository_record(entry["key"], repo)
+
+
+def _iter_csv(file):
+    """
+    One row per repository with the columns of CSV_COLUMNS; a project is announced on its first row.
+    """
+    projects = set()
+    for row in csv.DictReader(file):
+        project_key = row["project"]
+        if project_key not in projects:
+            projects.add(project_key)
+            yield "project", _project_record({
+                "key": project_key,
+                "name": row.get("project_name") or project_key,
+                "description": row.get("project_description") or "",
+            })
+        if row.get("slug"):
+            is_private = (row.get("is_private") or "true").strip().lower() not in ("false", "no", "0")
+            yield "repository", _repository_record(project_key, dict(row, is_private=is_private))
+
+
+READERS = {
+    ".yaml": _iter_yaml,
+    ".yml": _iter_yaml,
+    ".jsonl": _iter_json_lines,
+    ".ndjson": _iter_json_lines,
+    ".csv": _iter_csv,
+}
+
+
+def iter_manifest(path):
+    """
+    Stream the records of a bulk manifest as ("project", {...}) and ("repository", {...}) tuples,
+    every project before its repositories. The format follows the extension: YAML (.yaml/.yml),
+    JSON Lines (.jsonl/.ndjson) or CSV (.csv).
+    The file is opened right away, so a missing file raises FileNotFoundError here; parse errors
+    (yaml.YAMLError, ManifestError) surface while iterating.
+    """
+    reader = READERS.get(os.path.splitext(path)[1].lower(), _iter_yaml)
+    file = open(path, "r", newline="" if reader is _iter_csv else None, encoding="utf-8")
+
+    def records():
+        with file:
+            yield from reader(file)
+    return records()
+
+
+def load_section(path, key, default=None):
+    """
+    Read one top-level section of a YAML manifest (e.g. `permissions`) without building the others,
+    so a section next to a very large `projects:` list stays cheap to load.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        loader = YAML_LOADER(file)
+        anchors = {}
+        try:
+            loader.get_event()  # StreamStart
+            if loader.check_event(yaml.StreamEndEvent):
+                return default
+            loader.get_event()  # DocumentStart
+            if not loader.check_event(yaml.MappingStartEvent):
+                raise ManifestError(f"Expected a mapping with a '{key}' section in the manifest.")
+            loader.get_event()
+            while not loader.check_event(yaml.MappingEndEvent):
+                if loader.construct_object(_compose(loader, anchors), deep=True) == key:
+                    return loader.construct_object(_compose(loader, anchors), deep=True)
+                _skip(loader, anchors)
+            return default
+        finally:
+            loader.dispose()
+
+
+def load_manifest(path):
+    """
+    Read a whole manifest, in any supported format, into the YAML document shape:
+    {"projects": [{"key", "name", "description", "repositories": [...]}]}
+    """
+    projects = {}
+    for kind, record in iter_manifest(path):
+        if kind == "project":
+            projects[record["key"]] = dict(record, repositories=[])
+        elif record["project"] in projects:
+            projects[record["project"]]["repositories"].append(record)
+        else:
+            raise ManifestError(f"Repository '{record['slug']}' refers to unknown project '{record['project']}'.")
+    return {"projects": list(projects.values())}
+
+
+def run_manifest_command(yaml_file_path, command, api_failure):
+    """
+    Run `command()` for a manifest-driven bulk operation and print why it failed instead of raising:
+    a missing file, a YAML syntax error, an invalid section or a failed API call.
+    :param api_failure: What was being done when a BitbucketAPIError is raised, e.g. "Failed to read group members".
+    :return: The result of `command`, or None if it failed.
+    """
+    from colorama import Fore
+
+    from .api import BitbucketAPIError
+
+    try:
+        return command()
+    except FileNotFoundError:
+        print(f"{Fore.RED}Error: File '{yaml_file_path}' not found.")
+    except yaml.YAMLError as e:
+        print(f"{Fore.RED}Error parsing YAML file: {e}")
+    except ManifestError as e:
+        print(f"{Fore.RED}Error reading manifest '{yaml_file_path}': {e}")
+    except BitbucketAPIError as e:
+        print(f"{Fore.RED}{api_failure}: {e.response.text}")
@@ -0,0 +1,309 @@
+import json
+import threading
+from urllib.parse import urlsplit
+
+# Upper bounds (seconds) of the latency histogram buckets, as in the Prometheus client defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Path segments followed by identifiers, and the placeholders those become in an endpoint template
+PATH_PARAMETERS = {
+    "workspaces": ("{workspace}",),
+    "projects": ("{project_key}",),
+    "users": ("{user}",),
+    "members": ("{user}",),
+    "groups": ("{group}",),
+    "branch-restrictions": ("{id}",),
+    "pullrequests": ("{id}",),
+    "tags": ("{tag}",),
+}
+# Segments after which the rest of the path is one identifier (branch names and file paths contain '/')
+GREEDY_PARAMETERS = {"branches": "{branch}", "src": "{commit}/{path}"}
+
+
+def endpoint_template(url):
+    """
+    Reduce a request URL to its endpoint template, e.g.
+    https://api.bitbucket.org/2.0/repositories/ws/web/refs/branches?pagelen=100
+    -> /repositories/{workspace}/{repo_slug}/refs/branches
+    """
+    parts = [part for part in urlsplit(url or "").path.split("/") if part]
+    if "2.0" in parts:
+        parts = parts[parts.index("2.0") + 1:]
+    template = []
+    i = 0
+    while i < len(parts):
+        segment = parts[i]
+        template.append(segment)
+        i += 1
+        if segment in GREEDY_PARAMETERS:
+            if i < len(parts):
+                template.append(GREEDY_PARAMETERS[segment])
+            break
+        if segment == "repositories":
+            # /repositories/{workspace}/{repo_slug}/..., but /workspaces/{workspace}/permissions/repositories/{repo_slug}
+            names = ("{workspace}", "{repo_slug}") if len(template) == 1 else ("{repo_slug}",)
+        else:
+            names = PATH_PARAMETERS.get(segment, ())
+        for name in names:
+            if i < len(parts):
+                template.append(name)
+                i += 1
+    return "/" + "/".join(template)
+
+
+class Histogram:
+    """
+    Cumulative-bucket latency histogram (not thread-safe on its own; RequestMetrics locks around it).
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.bounds):
+            if value <= bound:
+                break
+        else:
+            index = len(self.bounds)
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def cumulative(self):
+        """
+        [(upper bound, count of observations <= bound)], ending with ("+Inf", count).
+        """
+        total, result = 0, []
+        for bound, count in zip(self.bounds + ("+Inf",), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket holding the q-quantile (the observed maximum for the last bucket).
+        """
+        if not self.count:
+            return 0.0
+        for bound, total in self.cumulative():
+            if total >= q * self.count:
+                return self.max if bound == "+Inf" else min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": round(self.max, 6),
+            "buckets": {str(bound): total for bound, total in self.cumulative()},
+        }
+
+
+class RequestHook:
+    """
+    Interface of the objects a RequestScheduler notifies (BitbucketAPI.add_hook).
+    Every method is called from the thread (or event loop) that sends the request.
+    """
+    def on_response(self, method, url, response, seconds):
+        """One attempt got a response (including 429s and errors that will be retried)."""
+
+    def on_error(self, method, url, error, seconds):
+        """One attempt failed without a response (connection error, timeout)."""
+
+    def on_retry(self, method, url, reason):
+        """An attempt is about to be repeated; reason is the status code or the exception name."""
+
+    def on_throttle(self, method, url, seconds):
+        """The request waited for the rate limiter or a 429 pause before being sent."""
+
+
+def _size(body):
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    if isinstance(body, str):
+        return len(body.encode("utf-8"))
+    return 0
+
+
+class RequestMetrics(RequestHook):
+    """
+    Collects per-endpoint-template latency histograms, status code counts, retries, bytes
+    transferred and throttle waits. Thread-safe; dump with to_dict()/to_json() or to_prometheus().
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.endpoints = {}
+        self.throttle = {"waits": 0, "seconds": 0.0}
+        self.lock = threading.Lock()
+
+    def _endpoint(self, method, url):
+        key = (method.upper(), endpoint_template(url))
+        endpoint = self.endpoints.get(key)
+        if endpoint is None:
+            endpoint = self.endpoints[key] = {
+                "latency": Histogram(self.buckets), "statuses": {}, "errors": 0, "retries": {},
+                "bytes_sent": 0, "bytes_received": 0, "throttle_seconds": 0.0,
+            }
+        return endpoint
+
+    def on_response(self, method, url, response, seconds):
+        request = getattr(response, "request", None)
+        sent = _size(getattr(request, "body", None))
+        received = _size(getattr(response, "content", None))
+        with self.lock:
+            endpoint = self._endpoint(method, url)
+            endpoint["latency"].observe(seconds)
+            status = str(response.status_code)
+            endpoint["statuses"][status] = endpoint["statuses"].get(status, 0) + 1
+            endpoint["bytes_sent"] += sent
+            endpoint["bytes_received"] += received
+
+    def on_error(self, method, url, error, seconds):
+        with self.lock:
+            endpoint = self._endpoint(method, url)
+            endpoint["latency"].observe(seconds)
+            endpoint["errors"] += 1
+
+    def on_retry(self, method, url, reason):
+        with self.lock:
+            retries = self._endpoint(method, url)["retries"]
+            retries[str(reason)] = retries.get(str(reason), 0) + 1
+
+    def on_throttle(self, method, url, seconds):
+        with self.lock:
+            self.throttle["waits"] += 1
+            self.throttle["seconds"] += seconds
+            self._endpoint(method, url)["throttle_seconds"] += seconds
+
+    def to_dict(self):
+        with self.lock:
+            endpoints = [
+                {
+                    "method": method,
+                    "endpoint": template,
+                    "requests": data["latency"].count,
+                    "statuses": dict(data["statuses"]),
+                    "errors": data["errors"],
+                    "retries": dict(data["retries"]),
+                    "bytes_sent": data["bytes_sent"],
+                    "bytes_received": data["bytes_received"],
+                    "throttle_seconds": round(data["throttle_seconds"], 6),
+                    "latency": data["latency"].to_dict(),
+                }
+                for (method, template), data in sorted(self.endpoints.items(), key=lambda item: item[0][::-1])
+            ]
+            throttle = {"waits": self.throttle["waits"], "seconds": round(self.throttle["seconds"], 6)}
+        return {
+            "requests": sum(e["requests"] for e in endpoints),
+            "retries": sum(sum(e["retries"].values()) for e in endpoints),
+            "bytes_sent": sum(e["bytes_sent"] for e in endpoints),
+            "bytes_received": sum(e["bytes_received"] for e in endpoints),
+            "throttle": throttle,
+            "endpoints": endpoints,
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self):
+        """
+        The metrics in the Prometheus text exposition format (e.g. for a node_exporter textfile collector).
+        """
+        def labels(**values):
+            escaped = {k: str(v).replace("\\", "\\\\").replace('"', '\\"') for k, v in values.items()}
+            return "{" + ",".join(f'{k}="{v}"' for k, v in escaped.items()) + "}"
+
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self.lock:
+            items = sorted(self.endpoints.items())
+            family("bitbucket_request_duration_seconds", "histogram", "Latency of Bitbucket API request attempts.")
+            for (method, template), data in items:
+                histogram = data["latency"]
+                for bound, total in histogram.cumulative():
+                    le = bound if bound == "+Inf" else repr(float(bound))
+                    lines.append(f"bitbucket_request_duration_seconds_bucket"
+                                 f"{labels(method=method, endpoint=template, le=le)} {total}")
+                lines.append(f"bitbucket_request_duration_seconds_sum{labels(method=method, endpoint=template)} "
+                             f"{histogram.sum:.6f}")
+                lines.append(f"bitbucket_request_duration_seconds_count{labels(method=method, endpoint=template)} "
+                             f"{histogram.count}")
+            family("bitbucket_responses_total", "counter", "Responses by status code.")
+            for (method, template), data in items:
+                for status, count in sorted(data["statuses"].items()):
+                    lines.append(f"bitbucket_responses_total{labels(method=method, endpoint=template, status=status)} "
+                                 f"{count}")
+                if data["errors"]:
+                    lines.append(f"bitbucket_responses_total{labels(method=method, endpoint=template, status='error')} "
+                                 f"{data['errors']}")
+            family("bitbucket_retries_total", "counter", "Retried request attempts by reason.")
+            for (method, template), data in items:
+                for reason, count in sorted(data["retries"].items()):
+                    lines.append(f"bitbucket_retries_total{labels(method=method, endpoint=template, reason=reason)} "
+                                 f"{count}")
+            for name, key, help_text in [
+                ("bitbucket_request_bytes_total", "bytes_sent", "Request body bytes sent."),
+                ("bitbucket_response_bytes_total", "bytes_received", "Response body bytes received."),
+                ("bitbucket_throttle_wait_seconds_total", "throttle_seconds", "Time spent waiting for the rate limiter."),
+            ]:
+                family(name, "counter", help_text)
+                for (method, template), data in items:
+                    lines.append(f"{name}{labels(method=method, endpoint=template)} {data[key]}")
+            family("bitbucket_throttle_waits_total", "counter", "Requests delayed by the rate limiter or a 429 pause.")
+            lines.append(f"bitbucket_throttle_waits_total {self.throttle['waits']}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """
+        Write the metrics to `path`: Prometheus text for .prom/.txt files, JSON otherwise.
+        """
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json() + "\n"
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text)
+
+    def slowest_endpoints(self, limit=10):
+        """
+        Summary lines for the endpoint templates with the most total request time.
+        """
+        endpoints = sorted(self.to_dict()["endpoints"], key=lambda e: e["latency"]["sum"], reverse=True)[:limit]
+        return [
+            f"{e['latency']['sum']:8.3f}s  {e['requests']:5d} req  p95 {e['latency']['p95']:.3f}s  "
+            f"{e['method']} {e['endpoint']}"
+            for e in endpoints
+        ]
+
+
+def _step_label(name):
+    if isinstance(name, tuple):
+        return " ".join(str(part) for part in (name[0],) + name[2:])
+    return str(name)
+
+
+def slowest_steps(executor, limit=10):
+    """
+    Profile of a BulkExecutor run: the groups (repositories, projects) with the most step time,
+    each followed by its steps, slowest first.
+    """
+    groups = {}
+    for name, seconds in executor.timings.items():
+        group = executor.tasks[name]["group"]
+        groups.setdefault(group, []).append((seconds, name))
+    ranked = sorted(groups.items(), key=lambda item: sum(seconds for seconds, _ in item[1]), reverse=True)[:limit]
+    lines = []
+    for group, steps in ranked:
+        label = group[-1] if isinstance(group, tuple) else f"project {group}"
+        lines.append(f"{sum(seconds for seconds, _ in steps):8.3f}s  {label}")
+        for seconds, name in sorted(steps, key=lambda step: step[0], reverse=True):
+            lines.append(f"{seconds:12.3f}s  {_step_label(name)}")
+    return lines
@@ -0,0 +1,211 @@
+import json
+import os
+import random
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+TOKEN_URL = "https://bitbucket.org/site/oauth2/access_token"
+AUTHORIZE_URL = "https://bitbucket.org/site/oauth2/authorize"
+# Refresh this many seconds before expiry (Bitbucket access tokens live for two hours)
+DEFAULT_REFRESH_MARGIN = 300
+# Below this much validity a token is not used any more: callers wait for the refresh
+EXPIRY_SLACK = 30
+
+
+class OAuthError(Exception):
+    """
+    Raised when the token endpoint does not issue a token.
+    """
+    def __init__(self, response):
+        self.response = response
+        self.status_code = response.status_code
+        super().__init__(f"OAuth token request failed ({response.status_code}): {response.text}")
+
+
+def default_token_cache_path():
+    return os.getenv("BITBUCKET_TOKEN_CACHE") or os.path.join(os.path.expanduser("~"), ".bitbucket_cli", "tokens.json")
+
+
+def authorize_url(client_id):
+    return f"{AUTHORIZE_URL}?client_id={client_id}&response_type=code"
+
+
+class FileLock:
+    """
+    Exclusive advisory lock on `path`, held across processes (flock, or msvcrt on Windows).
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, "a+")
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            else:
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.file.close()
+
+
+class OAuthTokenManager:
+    """
+    Access tokens of one OAuth consumer, kept in an on-disk cache shared by every CLI process
+    ({client_id: {"access_token", "refresh_token", "expires_at"}}, mode 0600).
+
+    headers() returns precomputed request headers, rebuilt only when the token changes. A token that
+    enters the refresh window (`refresh_margin` seconds before expiry, jittered per process so parallel
+    jobs do not all refresh at the same moment) is refreshed by one background thread while callers
+    keep using the current one; callers only wait when there is no usable token at all.
+    Refreshes hold a file lock and re-read the cache first, so a token another process just
+    obtained is adopted instead of requesting a new one.
+    Tokens come from the refresh_token grant when a refresh token is known (see exchange_code),
+    and from the client_credentials grant otherwise.
+    """
+    def __init__(self, client_id, client_secret, cache_path=None, session=None, token_url=TOKEN_URL,
+                 refresh_margin=DEFAULT_REFRESH_MARGIN):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.cache_path = cache_path or default_token_cache_path()
+        self.token_url = token_url
+        self.refresh_margin = refresh_margin * (1 + random.random())
+        if session is None:
+            import requests
+            session = requests.Session()
+        self.session = session
+        self.token = None
+        self._headers = None
+        self.lock = threading.Lock()
+        self._refreshing = False
+
+    def headers(self):
+        """
+        {"Authorization": "Bearer ...", "Content-Type": "application/json"}, shared between calls: copy to change.
+        :raises OAuthError: If no token can be obtained.
+        """
+        remaining = self.token["expires_at"] - time.time() if self.token else 0
+        if remaining < EXPIRY_SLACK:
+            with self.lock:
+                if self.token is None or self.token["expires_at"] - time.time() < EXPIRY_SLACK:
+                    self._refresh()
+        elif remaining < self.refresh_margin:
+            self._refresh_in_background()
+        return self._headers
+
+    def status(self):
+        """
+        The cached token's expiry, without the secrets.
+        """
+        token = self.token or self._read_cache().get(self.client_id)
+        if not token:
+            return {"client_id": self.client_id, "cached": False, "cache": self.cache_path}
+        return {"client_id": self.client_id, "cached": True, "cache": self.cache_path,
+                "expires_in": int(token["expires_at"] - time.time()), "refreshable": bool(token.get("refresh_token"))}
+
+    def exchange_code(self, code, redirect_uri=None):
+        """
+        Exchange an authorization code (from authorize_url) for tokens and store them in the cache.
+        """
+        data = {"grant_type": "authorization_code", "code": code}
+        if redirect_uri:
+            data["redirect_uri"] = redirect_uri
+        with self.lock, FileLock(self._lock_path()):
+            self._store(self._request(data), self._read_cache())
+        return self.status()
+
+    def _refresh_in_background(self):
+        with self.lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                with self.lock:
+                    self._refresh()
+            except Exception:
+                # The current token stays valid; the next call in the window tries again
+                pass
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="bitbucket-token-refresh", daemon=True).start()
+
+    def _refresh(self):
+        # Called with self.lock held
+        with FileLock(self._lock_path()):
+            tokens = self._read_cache()
+            cached = tokens.get(self.client_id)
+            if cached and cached["expires_at"] - time.time() > self.refresh_margin:
+                # Another process (or an earlier run) already has a fresh token
+                self._use(cached)
+                return
+            known = cached or self.token or {}
+            token = None
+            if known.get("refresh_token"):
+                try:
+                    token = self._request({"grant_type": "refresh_token", "refresh_token": known["refresh_token"]})
+                except OAuthError as e:
+                    # A revoked or expired refresh token: fall back to the consumer's own grant
+                    if e.status_code not in (400, 401):
+                        raise
+            if token is None:
+                token = self._request({"grant_type": "client_credentials"})
+            self._store(token, tokens, known.get("refresh_token"))
+
+    def _request(self, data):
+        response = self.session.post(self.token_url, data=data, auth=(self.client_id, self.client_secret), timeout=30)
+        if response.status_code != 200:
+            raise OAuthError(response)
+        return response.json()
+
+    def _store(self, response, tokens, refresh_token=None):
+        token = {
+            "access_token": response["access_token"],
+            "refresh_token": response.get("refresh_token") or refresh_token,
+            "expires_at": time.time() + float(response.get("expires_in", 3600)),
+        }
+        tokens[self.client_id] = token
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.cache_path}.{os.getpid()}.tmp"
+        descriptor = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+            json.dump(tokens, file)
+        # Readers never see a half-written cache
+        os.replace(temporary, self.cache_path)
+        self._use(token)
+
+    def _use(self, token):
+        self._headers = {"Authorization": f"Bearer {token['access_token']}", "Content-Type": "application/json"}
+        self.token = token
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _lock_path(self):
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return self.cache_path + ".lock"
@@ -0,0 +1,240 @@
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor
+
+from .api import BitbucketAPIError
+from .executor import DEFAULT_WORKERS
+from .repositories import PROJECT_KEYS_PER_QUERY
+from .rules import ManifestError, as_list
+
+PERMISSIONS = ("read", "write", "admin")
+# `permission: none` in a rule revokes access
+REVOKE = "none"
+
+
+def normalize_rules(rules):
+    """
+    Validate permission rules and fill in defaults. A rule is a mapping of
+    users/groups (who), repositories (slug globs) and/or projects (keys) (where), and permission.
+    :raises ManifestError: If a rule is incomplete or names an unknown permission.
+    """
+    normalized = []
+    for number, rule in enumerate(rules or [], 1):
+        if not isinstance(rule, dict):
+            raise ManifestError(f"Permission rule {number} must be a mapping.")
+        entry = {
+            "users": as_list(rule.get("users")),
+            "groups": as_list(rule.get("groups")),
+            "repositories": as_list(rule.get("repositories")),
+            "projects": as_list(rule.get("projects")),
+            "permission": str(rule.get("permission", "")).lower(),
+        }
+        if not entry["users"] and not entry["groups"]:
+            raise ManifestError(f"Permission rule {number} needs 'users' or 'groups'.")
+        if not entry["repositories"] and not entry["projects"]:
+            raise ManifestError(f"Permission rule {number} needs 'repositories' or 'projects'.")
+        if entry["permission"] not in PERMISSIONS + (REVOKE,):
+            raise ManifestError(
+                f"Permission rule {number} has permission '{entry['permission']}'; "
+                f"expected one of {', '.join(PERMISSIONS + (REVOKE,))}."
+            )
+        normalized.append(entry)
+    return normalized
+
+
+def rule_selects(rule, repo):
+    """
+    Whether a rule's `projects` keys and `repositories` globs select a repository of the listing.
+    """
+    if rule["projects"] and repo["project"] not in rule["projects"]:
+        return False
+    return not rule["repositories"] or any(fnmatch.fnmatchcase(repo["slug"], p) for p in rule["repositories"])
+
+
+def expand_rules(rules, repositories):
+    """
+    Expand rules against one repository listing.
+    :return: {(repo_slug, "user"|"group", name): permission}; a later rule overrides an earlier one for the same pair.
+    """
+    desired = {}
+    for rule in rules:
+        slugs = [repo["slug"] for repo in repositories if rule_selects(rule, repo)]
+        for slug in slugs:
+            for user in rule["users"]:
+                desired[(slug, "user", user)] = rule["permission"]
+            for group in rule["groups"]:
+                desired[(slug, "group", group)] = rule["permission"]
+    return desired
+
+
+def list_rule_repositories(repos_api, workspace, rules):
+    """
+    One paged repository listing for all rules: only the projects they name when every rule names
+    projects, the whole workspace otherwise.
+    """
+    project_keys = sorted({key for rule in rules for key in rule["projects"]})
+    if not project_keys or any(not rule["projects"] for rule in rules):
+        return list(repos_api.iter_workspace_repositories(workspace, prefetch=True))
+    repositories = []
+    for start in range(0, len(project_keys), PROJECT_KEYS_PER_QUERY):
+        chunk = project_keys[start:start + PROJECT_KEYS_PER_QUERY]
+        repositories.extend(repos_api.iter_workspace_repositories(workspace, chunk, prefetch=True))
+    return repositories
+
+
+def _user_keys(entry):
+    # Rules may name a user by nickname, uuid ("{...}") or account_id: each of them finds the permission
+    return [entry[key] for key in ("username", "uuid", "account_id") if entry.get(key)]
+
+
+def read_current_permissions(users_api, workspace, repo_slugs, group_repo_slugs=(), workers=DEFAULT_WORKERS):
+    """
+    Current explicit permissions of the given repositories, as {(repo_slug, "user"|"group", name): permission}.
+    A user permission is keyed by the user's nickname, uuid and account_id alike.
+    User permissions come from the workspace-level listing, falling back to concurrent per-repository
+    calls without admin rights; group permissions are listed concurrently for `group_repo_slugs` only.
+    """
+    repo_slugs = sorted(set(repo_slugs))
+    wanted = set(repo_slugs)
+    current = {}
+    try:
+        if repo_slugs:
+            for entry in users_api.iter_workspace_repository_permissions(workspace, prefetch=True):
+                if entry["repo_slug"] in wanted:
+                    for name in _user_keys(entry):
+                        current[(entry["repo_slug"], "user", name)] = entry["permission"]
+    except BitbucketAPIError:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            listings = pool.map(lambda slug: list(users_api.iter_users_and_permissions(workspace, slug)), repo_slugs)
+            for slug, users in zip(repo_slugs, listings):
+                for user in users:
+                    for name in _user_keys(user):
+                        current[(slug, "user", name)] = user["permission"]
+
+    group_repo_slugs = sorted(set(group_repo_slugs))
+    if group_repo_slugs:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            listings = pool.map(lambda slug: list(users_api.iter_groups_and_permissions(workspace, slug)),
+                                group_repo_slugs)
+            for slug, entries in zip(group_repo_slugs, listings):
+                for entry in entries:
+                    current[(slug, "group", entry["group"])] = entry["permission"]
+    return current
+
+
+def plan_permission_changes(desired, current):
+    """
+    Keep only the pairs that do not already have the desired permission.
+    :return: (changes, unchanged) where changes is a list of {"repo", "kind", "name", "permission", "current"}.
+    """
+    changes = []
+    unchanged = 0
+    for (repo_slug, kind, name), permission in sorted(desired.items()):
+        have = current.get((repo_slug, kind, name))
+        if have == permission or (permission == REVOKE and have is None):
+            unchanged += 1
+            continue
+        changes.append({"repo": repo_slug, "kind": kind, "name": name, "permission": permission, "current": have})
+    return changes, unchanged
+
+
+def apply_permission_changes(users_api, workspace, changes, workers=DEFAULT_WORKERS):
+    """
+    Apply the changes concurrently.
+    :return: The changes, in order, each with "success" and the API "result".
+    """
+    def apply(change):
+        repo_slug, name, permission = change["repo"], change["name"], change["permission"]
+        try:
+            if change["kind"] == "user":
+                if permission == REVOKE:
+                    result = users_api.remove_user_from_repo(workspace, repo_slug, name)
+                else:
+                    result = users_api.add_user_to_repo(workspace, repo_slug, name, permission)
+            elif permission == REVOKE:
+                result = users_api.remove_group_from_repo(workspace, repo_slug, name)
+            else:
+                result = users_api.add_group_to_repo(workspace, repo_slug, name, permission)
+        except Exception as e:
+            result = {"error": str(e)}
+        # add/remove return {"message"} on success and the API error body otherwise
+        return dict(change, success="error" not in result, result=result)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return list(pool.map(apply, changes))
+
+
+def sync_permissions(users_api, repos_api, workspace, rules, workers=DEFAULT_WORKERS, dry_run=False, inventory=None):
+    """
+    Make repository permissions match the rules with the fewest calls: one repository listing,
+    one permission listing (plus one per repository for group rules), then only the missing changes.
+    With an `inventory` (see inventory.Inventory) the repositories and current permissions are read
+    from it instead, and only the changes hit the API.
+    :return: (results, unchanged); with dry_run the planned changes are returned without "success".
+    """
+    rules = normalize_rules(rules)
+    repositories = list_rule_repositories(inventory or repos_api, workspace, rules)
+    desired = expand_rules(rules, repositories)
+    current = read_current_permissions(
+        inventory or users_api, workspace, {slug for slug, kind, _ in desired if kind == "user"},
+        {slug for slug, kind, _ in desired if kind == "group"}, workers=workers
+    )
+    changes, unchanged = plan_permission_changes(desired, current)
+    if dry_run:
+        return changes, unchanged
+    return apply_permission_changes(users_api, workspace, changes, workers=workers), unchanged
+
+
+def format_permission_summary(results, unchanged):
+    from colorama import Fore
+
+    lines = []
+    for result in results:
+        action = "revoke" if result["permission"] == REVOKE else result["permission"]
+        target = f"{result['kind']} '{result['name']}' on '{result['repo']}'"
+        if "success" not in result:
+            lines.append(f"{Fore.CYAN}~ {action} for {target} (currently {result['current'] or 'none'})")
+        elif not result["success"]:
+            lines.append(f"{Fore.RED}Failed to {action} {target}: {result['result']}")
+    granted = sum(1 for r in results if r.get("success") and r["permission"] != REVOKE)
+    revoked = sum(1 for r in results if r.get("success") and r["permission"] == REVOKE)
+    failed = sum(1 for r in results if r.get("success") is False)
+    if results and "success" not in results[0]:
+        lines.append(f"{Fore.CYAN}Plan: {len(results)} change(s), {unchanged} already in place.")
+    else:
+        lines.append(
+            f"{Fore.GREEN if not failed else Fore.YELLOW}Permissions: {granted} granted, {revoked} revoked, "
+            f"{unchanged} unchanged, {failed} failed."
+        )
+    return lines
+
+
+def bulk_update_permissions(users_api, repos_api, yaml_file_path, workspace, workers=DEFAULT_WORKERS, dry_run=False,
+                            inventory=None):
+    """
+    Grant or revoke repository permissions for the rules in the `permissions:` section of a YAML manifest:
+
+        permissions:
+          - users: [alice, bob]
+            groups: [developers]
+            repositories: ["web-*", api]
+            projects: [PROJ1]
+            permission: write   # read, write, admin or none (revoke)
+
+    :return: The results of sync_permissions, or None if the manifest or the listings could not be read.
+    """
+    from colorama import Fore
+
+    from .manifest import load_section, run_manifest_command
+
+    def command():
+        rules = load_section(yaml_file_path, "permissions")
+        if not rules:
+            print(f"{Fore.YELLOW}No 'permissions' section in '{yaml_file_path}'.")
+            return [], 0
+        results, unchanged = sync_permissions(users_api, repos_api, workspace, rules, workers=workers, dry_run=dry_run,
+                                              inventory=inventory)
+        for line in format_permission_summary(results, unchanged):
+            print(line)
+        return results, unchanged
+
+    return run_manifest_command(yaml_file_path, command, "Failed to read the current permissions")
@@ -1,22 +1,54 @@
-import requests
+from .api import api_base_url, paginate, response_json
+
+def _create_project_result(response, project_key, name):
+    if response.status_code == 201:
+        return {"success": True, "message": f"Project '{name}' (Key: {project_key}) created successfully."}
+    elif response.status_code == 400 and "already exists" in response_json(response).get("error", {}).get("message", "").lower():
+        return {"success": False, "message": f"Project '{name}' (Key: {project_key}) already exists."}
+    else:
+        return {"success": False, "message": f"Failed to create project '{name}' (Key: {project_key}). Error: {response.text}"}
 
 class BitbucketProjects:
     def __init__(self, auth):
         self.auth = auth
-        self.base_url = "https://api.bitbucket.org/2.0"
+        self.client = auth.client
+        self.base_url = api_base_url()
 
     def create_project(self, workspace, project_key, name, description):
         url = f"{self.base_url}/workspaces/{workspace}/projects"
         payload = {"key": project_key, "name": name, "description": description}
-        response = requests.post(url, headers=self.auth.get_headers(), json=payload)
-        if response.status_code == 201:
-            return {"success": True, "message": f"Project '{name}' (Key: {project_key}) created successfully."}
-        elif response.status_code == 400 and "already exists" in response.json().get("error", {}).get("message", "").lower():
-            return {"success": False, "message": f"Project '{name}' (Key: {project_key}) already exists."}
-        else:
-            return {"success": False, "message": f"Failed to create project '{name}' (Key: {project_key}). Error: {response.text}"}
+        response = self.client.post(url, headers=self.auth.get_headers(), json=payload)
+        return _create_project_result(response, project_key, name)
 
     def delete_project(self, workspace, project_key):
         url = f"{self.base_url}/workspaces/{workspace}/projects/{project_key}"
-        response = requests.delete(url, headers=self.auth.get_headers())
-        return response.status_code == 204
\ No newline at end of file
+        response = self.client.delete(url, headers=self.auth.get_headers())
+        return response.status_code == 204
+
+    def iter_projects(self, workspace, prefetch=False):
+        """
+        Lazily yield every project of the workspace, page by page.
+        Raises BitbucketAPIError if a page cannot be fetched.
+        """
+        url = f"{self.base_url}/workspaces/{workspace}/projects"
+        yield from paginate(self.client, url, headers=self.auth.get_headers(), prefetch=prefetch)
+
+class AsyncBitbucketProjects:
+    """
+    asyncio counterpart of BitbucketProjects; returns the same result dicts.
+    """
+    def __init__(self, auth, client=None):
+        self.auth = auth
+        self.client = client or auth.async_client
+        self.base_url = api_base_url()
+
+    async def create_project(self, workspace, project_key, name, description):
+        url = f"{self.base_url}/workspaces/{workspace}/projects"
+        payload = {"key": project_key, "name": name, "description": description}
+        response = await self.client.post(url, headers=self.auth.get_headers(), json=payload)
+        return _create_project_result(response, project_key, name)
+
+    async def delete_project(self, workspace, project_key):
+        url = f"{self.base_url}/workspaces/{workspace}/projects/{project_key}"
+        response = await self.client.delete(url, headers=self.auth.get_headers())
+        return response.status_code == 204
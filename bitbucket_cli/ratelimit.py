@@ -0,0 +1,271 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+
+# Methods that can safely be sent again after a server error or a dropped connection
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRYABLE_STATUS_CODES = frozenset({500, 502, 503, 504})
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_BASE = 1.0
+DEFAULT_BACKOFF_MAX = 60.0
+
+
+def parse_retry_after(value, now=None):
+    """
+    Parse a Retry-After header (delta seconds or HTTP date) into seconds to wait.
+    Returns None if the value cannot be parsed.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = now or datetime.now(timezone.utc)
+    return max((retry_at - now).total_seconds(), 0.0)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate_per_hour` tokens are added per hour, up to `burst` tokens.
+    """
+    def __init__(self, rate_per_hour, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate_per_hour = float(rate_per_hour)
+        self.burst = float(burst or max(1, int(self.rate_per_hour / 60)))
+        self.tokens = self.burst
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate_per_hour / 3600.0)
+        self.updated = now
+
+    def take(self):
+        """
+        Try to take one token. Returns 0 on success, otherwise the seconds until one is available.
+        """
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) * 3600.0 / self.rate_per_hour
+
+    def acquire(self):
+        """
+        Take one token, sleeping until one is available. Returns the seconds waited.
+        """
+        waited = 0.0
+        while True:
+            delay = self.take()
+            if not delay:
+                return waited
+            self.sleep(delay)
+            waited += delay
+
+
+class RequestScheduler:
+    """
+    Sits under every request of the shared client:
+    - paces requests through an optional token bucket (requests/hour and burst),
+    - on HTTP 429 pauses *all* callers for Retry-After (or a jittered exponential backoff) and retries,
+    - honours X-RateLimit-Remaining/Reset and lowers the bucket rate to X-RateLimit-Limit,
+    - retries server errors and connection failures with jittered exponential backoff for idempotent methods.
+    Objects in `hooks` (see metrics.RequestHook) are told about every attempt, retry and throttle wait.
+    """
+    retry_exceptions = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+    def __init__(self, rate_per_hour=None, burst=None, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_base=DEFAULT_BACKOFF_BASE, backoff_max=DEFAULT_BACKOFF_MAX,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.bucket = TokenBucket(rate_per_hour, burst, clock=clock, sleep=sleep) if rate_per_hour else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.clock = clock
+        self.sleep = sleep
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+        self.hooks = []
+
+    def notify(self, event, *args):
+        for hook in self.hooks:
+            getattr(hook, event)(*args)
+
+    def backoff(self, attempt):
+        # "Full jitter": spreads retries of concurrent workers instead of retrying in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+    def pause_remaining(self):
+        with self.lock:
+            return self.paused_until - self.clock()
+
+    def wait(self):
+        """
+        Block until a request may be sent. Returns the seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            delay = self.pause_remaining()
+            if delay <= 0:
+                break
+            self.sleep(delay)
+            waited += delay
+        if self.bucket:
+            waited += self.bucket.acquire()
+        return waited
+
+    def observe(self, response):
+        headers = response.headers
+        limit = headers.get("X-RateLimit-Limit")
+        if self.bucket and limit:
+            try:
+                self.bucket.rate_per_hour = min(self.bucket.rate_per_hour, float(limit))
+            except ValueError:
+                pass
+        remaining, reset = headers.get("X-RateLimit-Remaining"), headers.get("X-RateLimit-Reset")
+        if remaining == "0" and reset:
+            try:
+                reset = float(reset)
+            except ValueError:
+                return
+            # Reset is either an epoch timestamp or a number of seconds
+            self.pause(reset - time.time() if reset > 1e9 else reset)
+
+    def retry_delay(self, response, attempt, idempotent):
+        """
+        Decide whether a response must be retried.
+        Returns None to accept the response, otherwise the seconds to wait before retrying.
+        """
+        self.observe(response)
+        if attempt >= self.max_retries:
+            return None
+        if response.status_code == 429:
+            # The request was rejected, not processed, so it is safe to resend any method.
+            # Every caller is paused, not just this one.
+            delay = parse_retry_after(response.headers.get("Retry-After"))
+            self.pause(delay if delay is not None else self.backoff(attempt))
+            return 0.0
+        if idempotent and response.status_code in RETRYABLE_STATUS_CODES:
+            return self.backoff(attempt)
+        return None
+
+    def send(self, method, send, url=None):
+        """
+        Send a request through the scheduler.
+        :param method: HTTP method, used to decide whether the call may be retried.
+        :param send: Callable performing the request and returning a response.
+        :param url: Request URL, only passed on to the hooks.
+        """
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            waited = self.wait()
+            if waited and self.hooks:
+                self.notify("on_throttle", method, url, waited)
+            started = time.perf_counter()
+            try:
+                response = send()
+            except self.retry_exceptions as e:
+                if self.hooks:
+                    self.notify("on_error", method, url, e, time.perf_counter() - started)
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                if self.hooks:
+                    self.notify("on_retry", method, url, type(e).__name__)
+                self.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+            if self.hooks:
+                self.notify("on_response", method, url, response, time.perf_counter() - started)
+
+            delay = self.retry_delay(response, attempt, idempotent)
+            if delay is None:
+                return response
+            if self.hooks:
+                self.notify("on_retry", method, url, response.status_code)
+            if delay:
+                self.sleep(delay)
+            attempt += 1
+
+
+class AsyncRequestScheduler(RequestScheduler):
+    """
+    asyncio flavour of RequestScheduler: same policy, but waits without blocking the event loop.
+    """
+    def __init__(self, *args, retry_exceptions=None, async_sleep=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if retry_exceptions is not None:
+            self.retry_exceptions = retry_exceptions
+        if async_sleep is None:
+            import asyncio
+            async_sleep = asyncio.sleep
+        self.async_sleep = async_sleep
+
+    async def wait(self):
+        waited = 0.0
+        while True:
+            delay = self.pause_remaining()
+            if delay <= 0:
+                break
+            await self.async_sleep(delay)
+            waited += delay
+        while self.bucket:
+            delay = self.bucket.take()
+            if not delay:
+                break
+            await self.async_sleep(delay)
+            waited += delay
+        return waited
+
+    async def send(self, method, send, url=None):
+        """
+        Send a request through the scheduler.
+        :param send: Coroutine function performing the request and returning a response.
+        :param url: Request URL, only passed on to the hooks.
+        """
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            waited = await self.wait()
+            if waited and self.hooks:
+                self.notify("on_throttle", method, url, waited)
+            started = time.perf_counter()
+            try:
+                response = await send()
+            except self.retry_exceptions as e:
+                if self.hooks:
+                    self.notify("on_error", method, url, e, time.perf_counter() - started)
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                if self.hooks:
+                    self.notify("on_retry", method, url, type(e).__name__)
+                await self.async_sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+            if self.hooks:
+                self.notify("on_response", method, url, response, time.perf_counter() - started)
+
+            delay = self.retry_delay(response, attempt, idempotent)
+            if delay is None:
+                return response
+            if self.hooks:
+                self.notify("on_retry", method, url, response.status_code)
+            if delay:
+                await self.async_sleep(delay)
+            attempt += 1
@@ -0,0 +1,209 @@
+import yaml
+from colorama import Fore
+from concurrent.futures import ThreadPoolExecutor
+
+from .bulk import (
+    create_project_task,
+    create_repository_task,
+    initial_commit_task,
+    create_branches_task,
+    protect_main_task,
+)
+from .executor import BulkExecutor, BufferedReport, DEFAULT_WORKERS
+from .manifest import ManifestError, load_manifest
+from .repositories import PROJECT_KEYS_PER_QUERY
+from .rules import as_list
+
+
+def _is_main_protected(restrictions, branch="main"):
+    return any(
+        restriction.get("kind") == "push" and restriction.get("pattern") == branch
+        for restriction in restrictions
+    )
+
+
+def snapshot_workspace(projects_api, repos_api, branch_api, workspace, data, workers=DEFAULT_WORKERS):
+    """
+    Read the current state of everything a manifest mentions.
+    Projects and repositories come from paged workspace listings; branches and branch restrictions
+    are fetched concurrently, and only for manifest repositories that already exist.
+    :return: {"projects": set, "repositories": {slug: repo}, "branches": {slug: set}, "restrictions": {slug: list}}
+    """
+    project_keys = [project["key"] for project in data.get("projects", [])]
+    projects = {project["key"] for project in projects_api.iter_projects(workspace, prefetch=True)}
+
+    repositories = {}
+    for start in range(0, len(project_keys), PROJECT_KEYS_PER_QUERY):
+        chunk = project_keys[start:start + PROJECT_KEYS_PER_QUERY]
+        for repo in repos_api.iter_workspace_repositories(workspace, chunk, prefetch=True):
+            repositories[repo["slug"]] = repo
+
+    wanted = {}
+    for project in data.get("projects", []):
+        for repo in project.get("repositories", []):
+            if repo["slug"] in repositories:
+                wanted[repo["slug"]] = "main" in as_list(repo.get("branches", ""))
+
+    def fetch(repo_slug):
+        branches = set(repos_api.iter_branches(workspace, repo_slug))
+        restrictions = list(branch_api.iter_branch_restrictions(workspace, repo_slug)) if wanted[repo_slug] else []
+        return branches, restrictions
+
+    branches, restrictions = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for repo_slug, (repo_branches, repo_restrictions) in zip(wanted, pool.map(fetch, wanted)):
+            branches[repo_slug] = repo_branches
+            restrictions[repo_slug] = repo_restrictions
+
+    return {"projects": projects, "repositories": repositories, "branches": branches, "restrictions": restrictions}
+
+
+def plan_changes(data, snapshot):
+    """
+    Compute the minimal list of actions that makes the workspace match the manifest.
+    """
+    actions = []
+    for project_data in data.get("projects", []):
+        project_key = project_data["key"]
+        if project_key not in snapshot["projects"]:
+            actions.append({
+                "action": "create_project",
+                "project": project_key,
+                "name": project_data["name"],
+                "description": project_data.get("description", ""),
+            })
+
+        for repo_data in project_data.get("repositories", []):
+            repo_slug = repo_data["slug"]
+            branch_list = as_list(repo_data.get("branches", ""))
+            existing_branches = snapshot["branches"].get(repo_slug, set())
+            repo_actions = []
+            if repo_slug not in snapshot["repositories"]:
+                repo_actions.append({"action": "create_repository", "is_private": repo_data.get("is_private", True)})
+            if not existing_branches:
+                repo_actions.append({"action": "initial_commit"})
+                existing_branches = {"main"}
+            missing = [branch for branch in branch_list if branch not in existing_branches]
+            if missing:
+                repo_actions.append({"action": "create_branches", "branches": missing})
+            if "main" in branch_list and not _is_main_protected(snapshot["restrictions"].get(repo_slug, [])):
+                repo_actions.append({"action": "protect_branch", "branch": "main"})
+            for action in repo_actions:
+                action.update(project=project_key, repo=repo_slug)
+                actions.append(action)
+    return actions
+
+
+def format_plan(actions):
+    lines = []
+    for action in actions:
+        kind = action["action"]
+        if kind == "create_project":
+            lines.append(f"{Fore.GREEN}+ project {action['project']} ({action['name']})")
+        elif kind == "create_repository":
+            lines.append(f"{Fore.GREEN}+ repository {action['repo']} in project {action['project']}")
+        elif kind == "initial_commit":
+            lines.append(f"{Fore.GREEN}+ initial commit in '{action['repo']}'")
+        elif kind == "create_branches":
+            lines.append(f"{Fore.GREEN}+ branches {', '.join(action['branches'])} in '{action['repo']}'")
+        elif kind == "protect_branch":
+            lines.append(f"{Fore.GREEN}+ protect '{action['branch']}' in '{action['repo']}'")
+    lines.append(f"{Fore.CYAN}Plan: {len(actions)} change(s).")
+    return lines
+
+
+def apply_plan(projects_api, repos_api, branch_api, workspace, actions, workers=DEFAULT_WORKERS):
+    """
+    Run a plan on the BulkExecutor, keeping the project -> repo -> commit -> branches/protection ordering
+    for the steps that are part of the plan.
+    :return: A dict mapping task name to 'done', 'failed' or 'skipped'.
+    """
+    executor = BulkExecutor(workers=workers)
+    reports = {}
+    states = {}
+    for action in actions:
+        kind, project_key, repo_slug = action["action"], action["project"], action.get("repo")
+        if kind == "create_project":
+            report = reports[project_key] = BufferedReport()
+            executor.add(
+                ("project", project_key),
+                create_project_task(projects_api, workspace, project_key, action["name"], action["description"], report),
+                group=project_key
+            )
+            continue
+
+        group = (project_key, repo_slug)
+        report = reports.setdefault(group, BufferedReport())
+        state = states.setdefault(repo_slug, {})
+        if kind == "create_repository":
+            deps = [name for name in [("project", project_key)] if name in executor.tasks]
+            executor.add(
+                ("repo", repo_slug),
+                create_repository_task(repos_api, workspace, project_key, repo_slug, action["is_private"], report),
+                deps=deps, group=group
+            )
+        elif kind == "initial_commit":
+            deps = [name for name in [("repo", repo_slug)] if name in executor.tasks]
+            executor.add(
+                ("commit", repo_slug),
+                initial_commit_task(repos_api, workspace, repo_slug, state, report),
+                deps=deps, group=group
+            )
+        elif kind == "create_branches":
+            deps = [name for name in [("commit", repo_slug)] if name in executor.tasks]
+            executor.add(
+                ("branches", repo_slug),
+                create_branches_task(repos_api, workspace, repo_slug, action["branches"], state, report,
+                                     workers=workers),
+                deps=deps, group=group
+            )
+        elif kind == "protect_branch":
+            deps = [name for name in [("commit", repo_slug)] if name in executor.tasks]
+            executor.add(
+                ("protect", repo_slug, action["branch"]),
+                protect_main_task(branch_api, workspace, repo_slug, report),
+                deps=deps, group=group
+            )
+
+    def on_error(name, group, error):
+        reports[group].add(f"{Fore.RED}  Unexpected error in step {name[0]} for '{name[1]}': {error}")
+
+    return executor.run(on_group_done=lambda group: reports[group].flush(), on_error=on_error)
+
+
+def reconcile_projects_and_repositories(projects_api, repos_api, branch_api, yaml_file_path, workspace,
+                                        workers=DEFAULT_WORKERS, confirm=input, inventory=None):
+    """
+    Plan/apply mode for bulk manifests: snapshot the workspace, print the minimal diff against the YAML file
+    and, once confirmed, issue only the calls needed. Re-running an unchanged manifest makes no changes.
+    With an `inventory` (see inventory.Inventory) the snapshot is read from it instead of the API.
+    :return: The apply_plan status dict ({} if nothing was applied), or None if the manifest could not be read.
+    """
+    try:
+        data = load_manifest(yaml_file_path)
+
+        print(f"{Fore.CYAN}Reading current workspace state...")
+        if inventory is not None:
+            snapshot = snapshot_workspace(inventory, inventory, inventory, workspace, data, workers=workers)
+        else:
+            snapshot = snapshot_workspace(projects_api, repos_api, branch_api, workspace, data, workers=workers)
+        actions = plan_changes(data, snapshot)
+        if not actions:
+            print(f"{Fore.GREEN}No changes. The workspace already matches '{yaml_file_path}'.")
+            return {}
+        for line in format_plan(actions):
+            print(line)
+        if confirm("Apply these changes? (yes/no): ").strip().lower() not in ("y", "yes"):
+            print(f"{Fore.YELLOW}No changes applied.")
+            return {}
+        status = apply_plan(projects_api, repos_api, branch_api, workspace, actions, workers=workers)
+        print(f"{Fore.GREEN}Reconcile process completed successfully.")
+        return status
+    except FileNotFoundError:
+        print(f"{Fore.RED}Error: File '{yaml_file_path}' not found.")
+    except yaml.YAMLError as e:
+        print(f"{Fore.RED}Error parsing YAML file: {e}")
+    except ManifestError as e:
+        print(f"{Fore.RED}Error reading manifest '{yaml_file_path}': {e}")
+    except Exception as e:
+        print(f"{Fore.RED}An unexpected error occurred during reconcile: {e}")
@@ -0,0 +1,174 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from .executor import DEFAULT_WORKERS
+from .permissions import list_rule_repositories, rule_selects
+from .rules import ManifestError, as_list
+
+FORK_POLICIES = ("allow_forks", "no_public_forks", "no_forks")
+# Rule keys and the repository listing field each one sets
+SETTINGS = {
+    "private": "is_private",
+    "description": "description",
+    "main_branch": "mainbranch",
+    "fork_policy": "fork_policy",
+    "move_to": "project",
+}
+
+
+def normalize_settings_rules(rules):
+    """
+    Validate repository settings rules. A rule selects repositories by `repositories` (slug globs)
+    and/or `projects` (keys) and sets any of private, description, main_branch, fork_policy and
+    move_to (the key of the project to move them to).
+    :raises ManifestError: If a rule selects nothing, sets nothing or has an invalid value.
+    """
+    normalized = []
+    for number, rule in enumerate(rules or [], 1):
+        if not isinstance(rule, dict):
+            raise ManifestError(f"Repository settings rule {number} must be a mapping.")
+        unknown = set(rule) - set(SETTINGS) - {"repositories", "projects"}
+        if unknown:
+            raise ManifestError(f"Repository settings rule {number} has unknown keys: {', '.join(sorted(unknown))}.")
+        entry = {
+            "repositories": as_list(rule.get("repositories")),
+            "projects": as_list(rule.get("projects")),
+            "settings": {field: rule[key] for key, field in SETTINGS.items() if rule.get(key) is not None},
+        }
+        if not entry["repositories"] and not entry["projects"]:
+            raise ManifestError(f"Repository settings rule {number} needs 'repositories' or 'projects'.")
+        if not entry["settings"]:
+            raise ManifestError(
+                f"Repository settings rule {number} sets nothing; expected one of {', '.join(SETTINGS)}."
+            )
+        settings = entry["settings"]
+        if "is_private" in settings and not isinstance(settings["is_private"], bool):
+            raise ManifestError(f"Repository settings rule {number}: 'private' must be true or false.")
+        if "fork_policy" in settings and settings["fork_policy"] not in FORK_POLICIES:
+            raise ManifestError(
+                f"Repository settings rule {number} has fork_policy '{settings['fork_policy']}'; "
+                f"expected one of {', '.join(FORK_POLICIES)}."
+            )
+        for field in ("description", "mainbranch", "project"):
+            if field in settings:
+                settings[field] = str(settings[field])
+        normalized.append(entry)
+    return normalized
+
+
+def plan_repository_updates(rules, repositories):
+    """
+    Compare the settings the rules ask for with one repository listing; a later rule overrides an earlier
+    one for the same setting.
+    :return: (changes, unchanged) where changes is a list of {"repo", "settings", "current"} holding only
+             the settings that differ, and unchanged counts the selected repositories already in place.
+    """
+    changes, unchanged = [], 0
+    for repo in repositories:
+        desired = {}
+        for rule in rules:
+            if rule_selects(rule, repo):
+                desired.update(rule["settings"])
+        if not desired:
+            continue
+        # Bitbucket reports an empty description as "" or leaves it out
+        current = dict(repo, description=repo.get("description") or "")
+        differ = {field: value for field, value in desired.items() if current.get(field) != value}
+        if not differ:
+            unchanged += 1
+            continue
+        changes.append({"repo": repo["slug"], "settings": differ,
+                        "current": {field: current.get(field) for field in differ}})
+    return changes, unchanged
+
+
+def apply_repository_updates(repos_api, workspace, changes, workers=DEFAULT_WORKERS):
+    """
+    PUT the changes concurrently, one request per repository.
+    :return: The changes, in order, each with "success" and the API "message".
+    """
+    def apply(change):
+        try:
+            result = repos_api.update_repository(workspace, change["repo"], change["settings"])
+        except Exception as e:
+            result = {"success": False, "message": str(e)}
+        message = result["message"]
+        if not result["success"] and result.get("error_details"):
+            message = f"{message} {result['error_details']}"
+        return dict(change, success=result["success"], message=message)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return list(pool.map(apply, changes))
+
+
+def update_repositories(repos_api, workspace, rules, workers=DEFAULT_WORKERS, dry_run=False, inventory=None):
+    """
+    Make repository settings match the rules with the fewest calls: one repository listing (which carries
+    the current settings), then one PUT per repository that differs. With an `inventory` (see
+    inventory.Inventory) the current settings are read from it instead of the API.
+    :return: (results, unchanged); with dry_run the planned changes are returned without "success".
+    :raises BitbucketAPIError: If the repositories cannot be listed.
+    """
+    rules = normalize_settings_rules(rules)
+    repositories = list_rule_repositories(inventory or repos_api, workspace, rules)
+    changes, unchanged = plan_repository_updates(rules, repositories)
+    if dry_run:
+        return changes, unchanged
+    return apply_repository_updates(repos_api, workspace, changes, workers=workers), unchanged
+
+
+def _describe(settings):
+    return ", ".join(f"{field}={value!r}" for field, value in settings.items())
+
+
+def format_repository_update_summary(results, unchanged):
+    from colorama import Fore
+
+    lines = []
+    for result in results:
+        if "success" not in result:
+            lines.append(f"{Fore.CYAN}~ {result['repo']}: {_describe(result['settings'])} "
+                         f"(currently {_describe(result['current'])})")
+        elif not result["success"]:
+            lines.append(f"{Fore.RED}{result['message']}")
+    if results and "success" not in results[0]:
+        lines.append(f"{Fore.CYAN}Plan: {len(results)} repositories to update, {unchanged} already in place.")
+        return lines
+    updated = sum(1 for r in results if r["success"])
+    failed = len(results) - updated
+    lines.append(f"{Fore.GREEN if not failed else Fore.YELLOW}Repositories: {updated} updated, "
+                 f"{unchanged} unchanged, {failed} failed.")
+    return lines
+
+
+def bulk_update_repository_settings(repos_api, yaml_file_path, workspace, workers=DEFAULT_WORKERS, dry_run=False,
+                                    inventory=None):
+    """
+    Apply the `repository_settings:` rules of a YAML manifest:
+
+        repository_settings:
+          - projects: [PROJ1]
+            repositories: ["web-*"]
+            private: true
+            description: Web front-ends
+            main_branch: main
+            fork_policy: no_public_forks   # allow_forks, no_public_forks or no_forks
+            move_to: PROJ2
+
+    :return: The results of update_repositories, or None if the manifest or the listing could not be read.
+    """
+    from colorama import Fore
+
+    from .manifest import load_section, run_manifest_command
+
+    def command():
+        rules = load_section(yaml_file_path, "repository_settings")
+        if not rules:
+            print(f"{Fore.YELLOW}No 'repository_settings' section in '{yaml_file_path}'.")
+            return [], 0
+        results, unchanged = update_repositories(repos_api, workspace, rules, workers=workers, dry_run=dry_run,
+                                                 inventory=inventory)
+        for line in format_repository_update_summary(results, unchanged):
+            print(line)
+        return results, unchanged
+
+    return run_manifest_command(yaml_file_path, command, "Failed to list the repositories")
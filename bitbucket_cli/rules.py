@@ -0,0 +1,11 @@
+class ManifestError(ValueError):
+    pass
+
+
+def as_list(value):
+    # Accept YAML lists as well as "a;b;c" strings, like the `branches` field of repositories
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(";") if item.strip()]
+    return [str(item) for item in value]
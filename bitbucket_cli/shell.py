@@ -0,0 +1,278 @@
+import argparse
+import cmd
+import io
+import os
+import shlex
+import sys
+import threading
+from contextlib import redirect_stdout
+
+from colorama import Fore
+
+from .commands import add_subcommands, run_command
+
+try:
+    import readline
+except ImportError:  # Windows without pyreadline
+    readline = None
+
+HISTORY_LENGTH = 1000
+
+# Arguments (by argparse dest) whose values are existing project keys or repository slugs.
+# Positional targets of a 'create' action are new names, so they are not completed.
+COMPLETIONS = {
+    "keys": "projects",
+    "move_to": "projects",
+    "project": "projects",
+    "projects": "projects",
+    "slugs": "repositories",
+    "repos": "repositories",
+}
+
+# Commands that can change the project or repository listings
+WRITES = {"project", "repo", "bulk"}
+
+
+def default_history_path():
+    return os.getenv("BITBUCKET_HISTORY") or os.path.join(os.path.expanduser("~"), ".bitbucket_cli", "history")
+
+
+class SessionListings:
+    """
+    Project keys and repository slugs of the workspace, fetched once per session for completion
+    (from the inventory with --from-inventory). Loading starts in the background when the shell opens;
+    invalidate() makes the next lookup fetch them again.
+    """
+    def __init__(self, projects_source, repos_source, workspace):
+        self.sources = {"projects": lambda: [p["key"] for p in projects_source.iter_projects(workspace, prefetch=True)],
+                        "repositories": lambda: list(repos_source.iter_repository_slugs(workspace, prefetch=True))}
+        self.values = {}
+        # Bumped by invalidate(), so a listing fetched before a change is not kept
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get(self, kind):
+        with self.lock:
+            if kind in self.values:
+                return self.values[kind]
+            generation = self.generation
+        # Fetched without the lock: a slow listing must not block the other kind or invalidate()
+        try:
+            values = sorted(self.sources[kind]())
+        except Exception:
+            # Completion must never break the prompt: no candidates this time, retried next time
+            return []
+        with self.lock:
+            if generation == self.generation:
+                self.values.setdefault(kind, values)
+        return values
+
+    def load_in_background(self):
+        def run():
+            for kind in self.sources:
+                self.get(kind)
+
+        threading.Thread(target=run, name="bitbucket-shell-listings", daemon=True).start()
+
+    def invalidate(self):
+        with self.lock:
+            self.values.clear()
+            self.generation += 1
+
+
+def _subparsers(parser):
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            return action.choices
+    return {}
+
+
+def _current_argument(parser, words):
+    """
+    The argparse action the next word of `words` (the arguments after the subcommand) is a value of.
+    """
+    options = {string: action for action in parser._actions for string in action.option_strings}
+    positional = next((a for a in parser._actions if not a.option_strings and a.dest != "help"), None)
+    current, remaining = positional, None
+    for word in words:
+        if word in options:
+            action = options[word]
+            if action.nargs == 0:
+                current, remaining = positional, None
+            else:
+                # One value for a plain option, any number for nargs='*'/'+'
+                current, remaining = action, (1 if action.nargs is None else None)
+        elif remaining is not None:
+            remaining -= 1
+            if not remaining:
+                current, remaining = positional, None
+    return current
+
+
+class BitbucketShell(cmd.Cmd):
+    """
+    Interactive loop over the subcommands, e.g. `repo list --project PROJ1`, sharing one
+    authenticated client (connection pool, response cache, rate limiter) for the whole session.
+    History is kept across sessions; Tab completes commands, options, project keys and repository slugs.
+    """
+    intro = "Bitbucket CLI shell. Type 'help' for the commands, 'menu' for the menu, 'exit' to leave."
+    prompt = "bitbucket> "
+
+    def __init__(self, args, auth, listings, history_path=None, stdin=None, stdout=None):
+        super().__init__(stdin=stdin, stdout=stdout)
+        if stdin is not None:
+            self.use_rawinput = False
+        self.args = args
+        self.auth = auth
+        self.listings = listings
+        self.history_path = history_path or default_history_path()
+        self.parser = argparse.ArgumentParser(prog="bitbucket", add_help=False)
+        add_subcommands(self.parser)
+        self.commands = _subparsers(self.parser)
+
+    def preloop(self):
+        self.listings.load_in_background()
+        if readline is None or not self.use_rawinput:
+            return
+        # Options and globs ('--project', 'web-*') are completed as whole words
+        readline.set_completer_delims(" \t\n")
+        readline.set_history_length(HISTORY_LENGTH)
+        try:
+            readline.read_history_file(self.history_path)
+        except OSError:
+            pass
+
+    def postloop(self):
+        if readline is None or not self.use_rawinput:
+            return
+        directory = os.path.dirname(self.history_path)
+        try:
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            readline.write_history_file(self.history_path)
+        except OSError as e:
+            print(f"{Fore.YELLOW}History not saved: {e}", file=self.stdout)
+
+    def cmdloop(self, intro=None):
+        while True:
+            try:
+                return super().cmdloop(intro)
+            except KeyboardInterrupt:
+                # Ctrl-C cancels the line or the running command, not the session
+                print("^C", file=self.stdout)
+                intro = ""
+
+    def emptyline(self):
+        pass
+
+    def default(self, line):
+        try:
+            args = self.parser.parse_args(shlex.split(line), namespace=argparse.Namespace(**vars(self.args)))
+        except SystemExit:
+            # argparse already printed the usage error
+            return
+        except ValueError as e:
+            print(f"{Fore.RED}{e}", file=self.stdout)
+            return
+        if args.command == "shell":
+            print(f"{Fore.YELLOW}Already in the shell.", file=self.stdout)
+            return
+        # Targets come from the line: stdin is the shell's own input
+        stdin, sys.stdin = sys.stdin, io.StringIO()
+        try:
+            run_command(args, self.auth, self.stdout)
+        except Exception as e:
+            # A failed command (e.g. a dropped connection) does not end the session
+            print(f"{Fore.RED}Error: {e}", file=self.stdout)
+        finally:
+            sys.stdin = stdin
+        if args.command in WRITES and getattr(args, "action", None) != "list":
+            self.listings.invalidate()
+
+    def do_menu(self, line):
+        """Open the numbered menu; '0' returns to the shell."""
+        from .cli import menu
+
+        with redirect_stdout(self.stdout):
+            menu(self.args, self.args.workspace, self.auth)
+
+    def do_refresh(self, line):
+        """Fetch the project keys and repository slugs used for completion again."""
+        self.listings.invalidate()
+        self.listings.load_in_background()
+
+    def do_exit(self, line):
+        """Leave the shell."""
+        return True
+
+    do_quit = do_exit
+
+    def do_EOF(self, line):
+        print(file=self.stdout)
+        return True
+
+    def do_help(self, line):
+        """List the commands, or show the help of one: help repo create"""
+        words = line.split()
+        if words and words[0] in self.commands:
+            parser = self.commands[words[0]]
+            if len(words) > 1 and words[1] in _subparsers(parser):
+                parser = _subparsers(parser)[words[1]]
+            parser.print_help(self.stdout)
+            return
+        if words:
+            return super().do_help(line)
+        print("Commands (as on the command line, without the global options):", file=self.stdout)
+        for name, parser in self.commands.items():
+            if name == "shell":
+                continue
+            print(f"  {name:<10} {' | '.join(_subparsers(parser))}", file=self.stdout)
+        print("Shell: menu, refresh, help [COMMAND [ACTION]], exit", file=self.stdout)
+
+    def completenames(self, text, *ignored):
+        names = [name for name in self.commands if name != "shell"] + ["menu", "refresh", "help", "exit", "quit"]
+        return [name + " " for name in names if name.startswith(text)]
+
+    def completedefault(self, text, line, begidx, endidx):
+        words = shlex.split(line[:begidx]) if line[:begidx].strip() else []
+        return self.complete_words(words, text)
+
+    def complete_words(self, words, text):
+        """
+        Candidates for `text` after the complete `words` of the line.
+        """
+        if not words or words[0] not in self.commands:
+            return []
+        actions = _subparsers(self.commands[words[0]])
+        if len(words) == 1:
+            return [name + " " for name in actions if name.startswith(text)]
+        parser = actions.get(words[1])
+        if parser is None:
+            return []
+        if text.startswith("-"):
+            options = [s for a in parser._actions for s in a.option_strings if s.startswith("--")]
+            return [option + " " for option in options if option.startswith(text)]
+        argument = _current_argument(parser, words[2:])
+        if argument is None:
+            return []
+        if argument.choices:
+            return [choice + " " for choice in argument.choices if choice.startswith(text)]
+        kind = COMPLETIONS.get(argument.dest)
+        if kind is None or (not argument.option_strings and words[1] == "create"):
+            return []
+        return [value + " " for value in self.listings.get(kind) if value.startswith(text)]
+
+
+def run_shell(args, auth):
+    """
+    Run the interactive shell until 'exit' or end of input.
+    Raises InventoryError if --from-inventory is given without a synced inventory.
+    """
+    from .inventory import open_inventory
+    from .projects import BitbucketProjects
+    from .repositories import BitbucketRepositories
+
+    projects_source, repos_source = BitbucketProjects(auth), BitbucketRepositories(auth)
+    if args.from_inventory:
+        projects_source = repos_source = open_inventory(args.workspace, args.inventory)
+    BitbucketShell(args, auth, SessionListings(projects_source, repos_source, args.workspace)).cmdloop()
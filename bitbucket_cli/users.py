@@ -1,81 +1,298 @@
-import requests
-from tabulate import tabulate  # Ensure tabulate is imported
+from concurrent.futures import ThreadPoolExecutor
+
+from .api import BitbucketAPIError, api_base_url, paginate, response_json
+from .async_api import apaginate
+from .executor import DEFAULT_WORKERS
+
+def _user_name(user):
+    return user["nickname"] if "nickname" in user else user["username"]
+
+def _user_ids(user):
+    # Kept next to the nickname, so rules naming a user by uuid or account_id match too
+    return {key: user[key] for key in ("uuid", "account_id") if user.get(key)}
+
+def _add_user_result(response, repo_slug, username, permission):
+    if response.status_code in [200, 201]:
+        return {"message": f"User '{username}' added to repository '{repo_slug}' with '{permission}' permission."}
+    else:
+        return response_json(response)
+
+def _remove_user_result(response, repo_slug, username):
+    if response.status_code == 204:
+        return {"message": f"User '{username}' removed from repository '{repo_slug}'."}
+    else:
+        return response_json(response)
+
+def _add_group_result(response, repo_slug, group_slug, permission):
+    if response.status_code in [200, 201]:
+        return {"message": f"Group '{group_slug}' added to repository '{repo_slug}' with '{permission}' permission."}
+    else:
+        return response_json(response)
+
+def _remove_group_result(response, repo_slug, group_slug):
+    if response.status_code == 204:
+        return {"message": f"Group '{group_slug}' removed from repository '{repo_slug}'."}
+    else:
+        return response_json(response)
+
+def _members_table(members):
+    from tabulate import tabulate  # Imported on use: it is slow to import and only needed here
+
+    table_data = []  # Prepare data for tabular output
+    for member in members:
+        table_data.append([
+            member["user"]["nickname"],  # Use 'nickname' instead of 'username'
+            member["user"]["display_name"],
+            member["workspace"]["name"],
+        ])
+
+    # Define table headers
+    headers = ["Nickname", "Display Name", "Workspace Name"]
+
+    # Return the table as a string
+    return tabulate(table_data, headers=headers, tablefmt="grid")
+
+def _members_error(error):
+    # Handle non-JSON responses gracefully
+    try:
+        return error.response.json()
+    except ValueError:
+        return {
+            "error": f"Failed to parse response. Status Code: {error.status_code}, Response: {error.response.text}"
+        }
+
+def _repo_user_permission(user):
+    return {
+        "username": _user_name(user["user"]),
+        "permission": user["permission"],
+        **_user_ids(user["user"])
+    }
+
+def _repo_group_permission(entry):
+    return {
+        "group": entry["group"]["slug"],
+        "permission": entry["permission"]
+    }
+
+def _workspace_repository_permission(entry):
+    return {
+        "repo_slug": entry["repository"]["full_name"].split("/")[-1],
+        "username": _user_name(entry["user"]),
+        "permission": entry["permission"],
+        **_user_ids(entry["user"])
+    }
+
+def _users_error_result(error, repo_slug):
+    return {
+        "success": False,
+        "message": f"Failed to fetch users for repository '{repo_slug}'. Error: {error.response.text}"
+    }
 
 class BitbucketUsers:
     def __init__(self, auth):
         self.auth = auth
-        self.base_url = "https://api.bitbucket.org/2.0"
+        self.client = auth.client
+        self.base_url = api_base_url()
 
     def add_user_to_repo(self, workspace, repo_slug, username, permission):
         """
         Add a user to a repository with specific permission.
         Permissions: 'read', 'write', 'admin'
         """
-        url = f"https://api.bitbucket.org/2.0/repositories/{workspace}/{repo_slug}/permissions-config/users/{username}"
+        url = f"{self.base_url}/repositories/{workspace}/{repo_slug}/permissions-config/users/{username}"
         payload = {"permission": permission}
-        response = requests.put(url, json=payload, headers=self.auth.get_headers())
-        if response.status_code in [200, 201]:
-            return {"message": f"User '{username}' added to repository '{repo_slug}' with '{permission}' permission."}
-        else:
-            return response.json()
+        response = self.client.put(url, json=payload, headers=self.auth.get_headers())
+        return _add_user_result(response, repo_slug, username, permission)
 
     def remove_user_from_repo(self, workspace, repo_slug, username):
         """
         Remove a user's access to a repository.
         """
-        url = f"https://api.bitbucket.org/2.0/repositories/{workspace}/{repo_slug}/permissions-config/users/{username}"
-        response = requests.delete(url, headers=self.auth.get_headers())
-        if response.status_code == 204:
-            return {"message": f"User '{username}' removed from repository '{repo_slug}'."}
-        else:
-            return response.json()
+        url = f"{self.base_url}/repositories/{workspace}/{repo_slug}/permissions-config/users/{username}"
+        response = self.client.delete(url, headers=self.auth.get_headers())
+        return _remove_user_result(response, repo_slug, username)
+
+    def add_group_to_repo(self, workspace, repo_slug, group_slug, permission):
+        """
+        Give a workspace group a permission on a repository.
+        Permissions: 'read', 'write', 'admin'
+        """
+        url = f"{self.base_url}/repositories/{workspace}/{repo_slug}/permissions-config/groups/{group_slug}"
+        response = self.client.put(url, json={"permission": permission}, headers=self.auth.get_headers())
+        return _add_group_result(response, repo_slug, group_slug, permission)
+
+    def remove_group_from_repo(self, workspace, repo_slug, group_slug):
+        """
+        Remove a group's access to a repository.
+        """
+        url = f"{self.base_url}/repositories/{workspace}/{repo_slug}/permissions-config/groups/{group_slug}"
+        response = self.client.delete(url, headers=self.auth.get_headers())
+        return _remove_group_result(response, repo_slug, group_slug)
+
+    def iter_groups_and_permissions(self, workspace, repo_slug, prefetch=False):
+        """
+        Lazily yield {"group", "permission"} for every group with explicit access to a repository.
+        Raises BitbucketAPIError if a page cannot be fetched.
+        """
+        url = f"{self.base_url}/repositories/{workspace}/{repo_slug}/permissions-config/groups"
+        for entry in paginate(self.client, url, headers=self.auth.get_headers(), prefetch=prefetch):
+            yield _repo_group_permission(entry)
+
+    def iter_members(self, workspace, prefetch=False):
+        """
+        Lazily yield every member of a workspace, page by page.
+        Raises BitbucketAPIError if a page cannot be fetched.
+        """
+        url = f"{self.base_url}/workspaces/{workspace}/members"
+        yield from paginate(self.client, url, headers=self.auth.get_headers(), prefetch=prefetch)
 
     def list_users_and_groups(self, workspace):
         """
         List all users in a workspace and their current groups.
         """
-        url = f"https://api.bitbucket.org/2.0/workspaces/{workspace}/members"
-        response = requests.get(url, headers=self.auth.get_headers())
-
-        if response.status_code == 200:
-            members = response.json().get("values", [])
-            table_data = []  # Prepare data for tabular output
-            for member in members:
-                table_data.append([
-                    member["user"]["nickname"],  # Use 'nickname' instead of 'username'
-                    member["user"]["display_name"],
-                    member["workspace"]["name"],
-                ])
-
-            # Define table headers
-            headers = ["Nickname", "Display Name", "Workspace Name"]
-
-            # Return the table as a string
-            return tabulate(table_data, headers=headers, tablefmt="grid")
-        else:
-            # Handle non-JSON responses gracefully
-            try:
-                return response.json()
-            except requests.exceptions.JSONDecodeError:
-                return {
-                    "error": f"Failed to parse response. Status Code: {response.status_code}, Response: {response.text}"
-                }
+        try:
+            return _members_table(self.iter_members(workspace))
+        except BitbucketAPIError as e:
+            return _members_error(e)
+
+    def iter_users_and_permissions(self, workspace, repo_slug, prefetch=False):
+        """
+        Lazily yield {"username", "permission"} for every user with explicit access to a repository.
+        Raises BitbucketAPIError if a page cannot be fetched.
+        """
+        url = f"{self.base_url}/repositories/{workspace}/{repo_slug}/permissions-config/users"
+        for user in paginate(self.client, url, headers=self.auth.get_headers(), prefetch=prefetch):
+            yield _repo_user_permission(user)
 
     def list_users_and_permissions(self, workspace, repo_slug):
+        try:
+            users = list(self.iter_users_and_permissions(workspace, repo_slug))
+            return {"success": True, "users": users}
+        except BitbucketAPIError as e:
+            return _users_error_result(e, repo_slug)
+
+    def iter_workspace_repository_permissions(self, workspace, project_key=None, prefetch=False):
+        """
+        Lazily yield explicit user permissions for every repository in the workspace,
+        optionally restricted to one project. Requires workspace admin rights.
+        Raises BitbucketAPIError if a page cannot be fetched.
+        """
+        url = f"{self.base_url}/workspaces/{workspace}/permissions/repositories"
+        params = {"q": f"repository.project.key=\"{project_key}\""} if project_key else None
+        for entry in paginate(self.client, url, headers=self.auth.get_headers(), params=params, prefetch=prefetch):
+            yield _workspace_repository_permission(entry)
+
+    def list_project_permissions(self, workspace, project_key, repositories, workers=DEFAULT_WORKERS):
+        """
+        Collect user permissions for every repository of a project in a handful of requests.
+        Uses the workspace-level permissions endpoint; if it is not available (e.g. no admin rights)
+        falls back to concurrent per-repository calls.
+        :param repositories: Repositories of the project, as returned by list_repositories.
+        :return: A dict mapping repo slug to a list_users_and_permissions-style result.
+        """
+        try:
+            permissions = {repo["slug"]: {"success": True, "users": []} for repo in repositories}
+            for entry in self.iter_workspace_repository_permissions(workspace, project_key, prefetch=True):
+                if entry["repo_slug"] in permissions:
+                    permissions[entry["repo_slug"]]["users"].append(
+                        {"username": entry["username"], "permission": entry["permission"]}
+                    )
+            return permissions
+        except BitbucketAPIError:
+            slugs = [repo["slug"] for repo in repositories]
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                results = pool.map(lambda repo_slug: self.list_users_and_permissions(workspace, repo_slug), slugs)
+                return dict(zip(slugs, results))
+
+class AsyncBitbucketUsers:
+    """
+    asyncio counterpart of BitbucketUsers; returns the same result dicts.
+    """
+    def __init__(self, auth, client=None):
+        self.auth = auth
+        self.client = client or auth.async_client
+        self.base_url = api_base_url()
+
+    async def add_user_to_repo(self, workspace, repo_slug, username, permission):
+        """
+        Add a user to a repository with specific permission.
+        Permissions: 'read', 'write', 'admin'
+        """
+        url = f"{self.base_url}/repositories/{workspace}/{repo_slug}/permissions-config/users/{username}"
+        payload = {"permission": permission}
+        response = await self.client.put(url, json=payload, headers=self.auth.get_headers())
+        return _add_user_result(response, repo_slug, username, permission)
+
+    async def remove_user_from_repo(self, workspace, repo_slug, username):
+        """
+        Remove a user's access to a repository.
+        """
+        url = f"{self.base_url}/repositories/{workspace}/{repo_slug}/permissions-config/users/{username}"
+        response = await self.client.delete(url, headers=self.auth.get_headers())
+        return _remove_user_result(response, repo_slug, username)
+
+    async def add_group_to_repo(self, workspace, repo_slug, group_slug, permission):
+        url = f"{self.base_url}/repositories/{workspace}/{repo_slug}/permissions-config/groups/{group_slug}"
+        response = await self.client.put(url, json={"permission": permission}, headers=self.auth.get_headers())
+        return _add_group_result(response, repo_slug, group_slug, permission)
+
+    async def remove_group_from_repo(self, workspace, repo_slug, group_slug):
+        url = f"{self.base_url}/repositories/{workspace}/{repo_slug}/permissions-config/groups/{group_slug}"
+        response = await self.client.delete(url, headers=self.auth.get_headers())
+        return _remove_group_result(response, repo_slug, group_slug)
+
+    async def iter_groups_and_permissions(self, workspace, repo_slug, prefetch=False):
+        url = f"{self.base_url}/repositories/{workspace}/{repo_slug}/permissions-config/groups"
+        async for entry in apaginate(self.client, url, headers=self.auth.get_headers(), prefetch=prefetch):
+            yield _repo_group_permission(entry)
+
+    async def iter_members(self, workspace, prefetch=False):
+        url = f"{self.base_url}/workspaces/{workspace}/members"
+        async for member in apaginate(self.client, url, headers=self.auth.get_headers(), prefetch=prefetch):
+            yield member
+
+    async def list_users_and_groups(self, workspace):
+        """
+        List all users in a workspace and their current groups.
+        """
+        try:
+            return _members_table([member async for member in self.iter_members(workspace)])
+        except BitbucketAPIError as e:
+            return _members_error(e)
+
+    async def iter_users_and_permissions(self, workspace, repo_slug, prefetch=False):
         url = f"{self.base_url}/repositories/{workspace}/{repo_slug}/permissions-config/users"
-        response = requests.get(url, headers=self.auth.get_headers())
-        if response.status_code == 200:
-            data = response.json()
-            users = [
-                {
-                    "username": user["user"]["nickname"] if "nickname" in user["user"] else user["user"]["username"],
-                    "permission": user["permission"]
-                }
-                for user in data.get("values", [])
-            ]
+        async for user in apaginate(self.client, url, headers=self.auth.get_headers(), prefetch=prefetch):
+            yield _repo_user_permission(user)
+
+    async def list_users_and_permissions(self, workspace, repo_slug):
+        try:
+            users = [user async for user in self.iter_users_and_permissions(workspace, repo_slug)]
             return {"success": True, "users": users}
-        else:
-            return {
-                "success": False,
-                "message": f"Failed to fetch users for repository '{repo_slug}'. Error: {response.text}"
-            }
\ No newline at end of file
+        except BitbucketAPIError as e:
+            return _users_error_result(e, repo_slug)
+
+    async def iter_workspace_repository_permissions(self, workspace, project_key=None, prefetch=False):
+        url = f"{self.base_url}/workspaces/{workspace}/permissions/repositories"
+        params = {"q": f"repository.project.key=\"{project_key}\""} if project_key else None
+        async for entry in apaginate(self.client, url, headers=self.auth.get_headers(), params=params, prefetch=prefetch):
+            yield _workspace_repository_permission(entry)
+
+    async def list_project_permissions(self, workspace, project_key, repositories):
+        """
+        Collect user permissions for every repository of a project.
+        Same strategy as BitbucketUsers.list_project_permissions; the per-repository fallback runs concurrently on the event loop.
+        """
+        try:
+            permissions = {repo["slug"]: {"success": True, "users": []} for repo in repositories}
+            async for entry in self.iter_workspace_repository_permissions(workspace, project_key, prefetch=True):
+                if entry["repo_slug"] in permissions:
+                    permissions[entry["repo_slug"]]["users"].append(
+                        {"username": entry["username"], "permission": entry["permission"]}
+                    )
+            return permissions
+        except BitbucketAPIError:
+            slugs = [repo["slug"] for repo in repositories]
+            import asyncio
+            results = await asyncio.gather(*(self.list_users_and_permissions(workspace, slug) for slug in slugs))
+            return dict(zip(slugs, results))
@@ -11,6 +11,9 @@ setup(
         "pyyaml",
         "colorama",
     ],
+    extras_require={
+        "async": ["aiohttp"],
+    },
     entry_points={
         "console_scripts": [
             "bitbucket_cli=bitbucket_cli.cli:main"
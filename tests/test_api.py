@@ -0,0 +1,100 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import MagicMock, patch
+
+from bitbucket_cli.api import BitbucketAPI, BitbucketAPIError, paginate
+from bitbucket_cli.auth import BitbucketAuth
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = json.dumps({"values": []}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestBitbucketAPI(unittest.TestCase):
+    def setUp(self):
+        self.server = HTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/2.0/repositories/ws"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused(self):
+        client = BitbucketAPI(pool_size=2)
+        for _ in range(5):
+            self.assertEqual(client.get(self.url).status_code, 200)
+        stats = client.connection_stats()["127.0.0.1"]
+        self.assertEqual(stats["requests"], 5)
+        self.assertEqual(stats["connections"], 1)
+        self.assertEqual(stats["reused"], 4)
+        client.close()
+
+    def test_pool_size_is_configurable(self):
+        client = BitbucketAPI(pool_size=25)
+        adapter = client.session.get_adapter("https://api.bitbucket.org")
+        self.assertEqual(adapter._pool_maxsize, 25)
+
+    @patch.dict("os.environ", {"BITBUCKET_POOL_SIZE": "7"})
+    def test_auth_injects_shared_client(self):
+        auth = BitbucketAuth()
+        self.assertIsInstance(auth.client, BitbucketAPI)
+        self.assertEqual(auth.client.pool_size, 7)
+
+        client = BitbucketAPI()
+        self.assertIs(BitbucketAuth(client=client).client, client)
+
+
+def _page(values, next_url=None, status_code=200):
+    response = MagicMock(status_code=status_code, text="error")
+    response.json.return_value = {"values": values, "next": next_url} if next_url else {"values": values}
+    return response
+
+
+class TestPaginate(unittest.TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.get.side_effect = [
+            _page([1, 2], "https://api/page2"),
+            _page([3, 4], "https://api/page3"),
+            _page([5]),
+        ]
+
+    def test_follows_next_links(self):
+        items = list(paginate(self.client, "https://api/page1", params={"q": "x"}))
+        self.assertEqual(items, [1, 2, 3, 4, 5])
+        first_call = self.client.get.call_args_list[0]
+        self.assertEqual(first_call.kwargs["params"], {"q": "x", "pagelen": 100})
+        self.assertEqual(self.client.get.call_args_list[1].args[0], "https://api/page2")
+
+    def test_prefetch_yields_same_items(self):
+        items = list(paginate(self.client, "https://api/page1", prefetch=True))
+        self.assertEqual(items, [1, 2, 3, 4, 5])
+
+    def test_is_lazy(self):
+        items = paginate(self.client, "https://api/page1")
+        self.assertEqual(next(items), 1)
+        self.assertEqual(self.client.get.call_count, 1)
+
+    def test_error_raises(self):
+        self.client.get.side_effect = [_page([1], "https://api/page2"), _page([], status_code=500)]
+        with self.assertRaises(BitbucketAPIError):
+            list(paginate(self.client, "https://api/page1", prefetch=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
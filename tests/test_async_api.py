@@ -0,0 +1,145 @@
+import asyncio
+import gc
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+
+from bitbucket_cli.async_api import AsyncBitbucketAPI, aiohttp, apaginate
+from bitbucket_cli.projects import AsyncBitbucketProjects
+from bitbucket_cli.repositories import AsyncBitbucketRepositories
+from bitbucket_cli.users import AsyncBitbucketUsers
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    throttled = set()
+
+    def _send(self, status, body=None, headers=None):
+        content = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _read_body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_GET(self):
+        base = f"http://127.0.0.1:{self.server.server_port}"
+        if self.path.startswith("/repositories/ws?"):
+            self._send(200, {"values": [{"slug": "a"}, {"slug": "b"}], "next": f"{base}/repositories/ws/page2"})
+        elif self.path == "/repositories/ws/page2":
+            self._send(200, {"values": [{"slug": "c", "name": "C"}]})
+        elif self.path.startswith("/repositories/ws/web/permissions-config/users"):
+            self._send(200, {"values": [{"user": {"nickname": "alice"}, "permission": "admin"}]})
+        else:
+            self._send(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        body = self._read_body()
+        if self.path == "/workspaces/ws/projects":
+            self._send(201, {"key": json.loads(body)["key"]})
+        elif self.path == "/repositories/ws/existing":
+            self._send(400, {"error": {"message": "Repository with this Slug and Owner already exists."}})
+        elif self.path == "/repositories/ws/throttled/src":
+            if "src" not in self.throttled:
+                self.throttled.add("src")
+                self._send(429, {"error": {"message": "Rate limit"}}, {"Retry-After": "0"})
+            else:
+                self._send(201, None, {"Location": "https://api/repositories/ws/throttled/commit/abc123"})
+        else:
+            self._send(404, {"error": {"message": "not found"}})
+
+    def do_DELETE(self):
+        self._send(204 if self.path != "/repositories/ws/missing" else 404)
+
+    def log_message(self, *args):
+        pass
+
+
+@unittest.skipIf(aiohttp is None, "aiohttp is not installed")
+class TestAsyncClient(unittest.TestCase):
+    def setUp(self):
+        _Handler.throttled = set()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.auth = MagicMock()
+        self.auth.get_headers.return_value = {"Authorization": "Basic dummy_token", "Content-Type": "application/json"}
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def run_with(self, resource_class, call):
+        async def main():
+            async with AsyncBitbucketAPI(pool_size=5) as client:
+                resource = resource_class(self.auth, client=client)
+                resource.base_url = self.base_url
+                return await call(resource)
+        return asyncio.run(main())
+
+    def test_create_project(self):
+        result = self.run_with(AsyncBitbucketProjects, lambda api: api.create_project("ws", "PRJ", "Project", ""))
+        self.assertTrue(result["success"])
+
+    def test_create_repository_already_exists(self):
+        result = self.run_with(AsyncBitbucketRepositories, lambda api: api.create_repository("ws", "PRJ", "existing"))
+        self.assertFalse(result["success"])
+        self.assertTrue(result["already_exists"])
+
+    def test_list_repositories_follows_pagination(self):
+        result = self.run_with(AsyncBitbucketRepositories, lambda api: api.list_repositories("ws", "PRJ"))
+        self.assertEqual([repo["slug"] for repo in result["repositories"]], ["a", "b", "c"])
+
+    def test_delete_repositories_concurrently(self):
+        result = self.run_with(AsyncBitbucketRepositories, lambda api: api.delete_repositories("ws", ["a", "missing", "b"]))
+        self.assertEqual(result, [("a", True), ("missing", False), ("b", True)])
+
+    def test_commit_initial_file_retries_after_429(self):
+        result = self.run_with(AsyncBitbucketRepositories, lambda api: api.commit_initial_file("ws", "throttled"))
+        self.assertEqual(result, {"success": True, "commit": "abc123"})
+
+    def test_list_users_and_permissions(self):
+        result = self.run_with(AsyncBitbucketUsers, lambda api: api.list_users_and_permissions("ws", "web"))
+        self.assertEqual(result, {"success": True, "users": [{"username": "alice", "permission": "admin"}]})
+
+    def test_apaginate_prefetch(self):
+        async def main():
+            async with AsyncBitbucketAPI() as client:
+                url = f"{self.base_url}/repositories/ws?q=x"
+                return [repo["slug"] async for repo in apaginate(client, url, prefetch=True)]
+        self.assertEqual(asyncio.run(main()), ["a", "b", "c"])
+
+
+class TestApaginate(unittest.TestCase):
+    def test_abandoned_generator_cancels_the_prefetch(self):
+        pending = []
+
+        class Client:
+            async def get(self, url, headers=None, params=None):
+                if url == "page2":
+                    pending.append(asyncio.current_task())
+                    await asyncio.Event().wait()
+                return MagicMock(status_code=200, json=lambda: {"values": [1, 2], "next": "page2"})
+
+        async def main():
+            pages = apaginate(Client(), "page1", prefetch=True)
+            self.assertEqual(await pages.__anext__(), 1)
+            await asyncio.sleep(0)
+            # Dropped without aclose(): the loop finalizes the generator
+            del pages
+            gc.collect()
+            for _ in range(5):
+                await asyncio.sleep(0)
+            return pending[0]
+
+        self.assertTrue(asyncio.run(main()).cancelled())
+
+
+if __name__ == "__main__":
+    unittest.main()
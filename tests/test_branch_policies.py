@@ -0,0 +1,115 @@
+import unittest
+from unittest.mock import MagicMock
+
+from bitbucket_cli.branch_policies import (
+    apply_branch_policies, apply_branch_template, plan_restriction_changes, template_restrictions
+)
+from bitbucket_cli.manifest import ManifestError
+
+TEMPLATE = {
+    "patterns": ["main", "release/*"],
+    "push": {"groups": ["release-managers"]},
+    "merge": True,
+    "prevent_force_push": True,
+    "required_approvals": 2,
+    "exempt_users": ["release-bot"],
+}
+
+
+class TestBranchTemplates(unittest.TestCase):
+    def test_template_restrictions(self):
+        restrictions = template_restrictions(TEMPLATE)
+        self.assertEqual(len(restrictions), 8)
+        push = restrictions[0]
+        self.assertEqual((push["kind"], push["pattern"], push["branch_match_kind"]), ("push", "main", "glob"))
+        self.assertEqual(push["users"], [{"username": "release-bot"}])
+        self.assertEqual(push["groups"], [{"slug": "release-managers"}])
+        merge = restrictions[1]
+        self.assertEqual((merge["kind"], merge["users"], merge["groups"]),
+                         ("restrict_merges", [{"username": "release-bot"}], []))
+        self.assertEqual(restrictions[3]["value"], 2)
+
+    def test_invalid_templates(self):
+        with self.assertRaises(ManifestError):
+            template_restrictions({"patterns": ["main"], "pushh": True})
+        with self.assertRaises(ManifestError):
+            template_restrictions({"push": True})
+
+    def test_plan_creates_missing_updates_different_and_ignores_others(self):
+        desired = template_restrictions({"patterns": ["main"], "push": True, "required_approvals": 2,
+                                         "prevent_delete": True})
+        existing = [
+            {"id": 1, "kind": "push", "branch_match_kind": "glob", "pattern": "main", "users": [], "groups": []},
+            {"id": 2, "kind": "require_approvals_to_merge", "branch_match_kind": "glob", "pattern": "main", "value": 1},
+            {"id": 3, "kind": "force", "branch_match_kind": "glob", "pattern": "main"},
+        ]
+        changes, unchanged = plan_restriction_changes(desired, existing)
+        self.assertEqual(unchanged, 1)
+        self.assertEqual([(c["action"], c["restriction"]["kind"], c["id"]) for c in changes],
+                         [("create", "delete", None), ("update", "require_approvals_to_merge", 2)])
+
+    def test_existing_users_are_compared_by_nickname(self):
+        desired = template_restrictions({"patterns": ["main"], "push": True, "exempt_users": ["bot"]})
+        existing = [{"id": 1, "kind": "push", "branch_match_kind": "glob", "pattern": "main",
+                     "users": [{"nickname": "bot", "uuid": "{1}"}], "groups": [], "value": None}]
+        self.assertEqual(plan_restriction_changes(desired, existing), ([], 1))
+
+    def test_users_listed_with_only_a_nickname_or_uuid_are_unchanged(self):
+        desired = template_restrictions({"patterns": ["main"], "push": True, "exempt_users": ["bot", "{2}"]})
+        self.assertEqual(desired[0]["users"], [{"username": "bot"}, {"uuid": "{2}"}])
+        existing = [{"id": 1, "kind": "push", "branch_match_kind": "glob", "pattern": "main",
+                     "users": [{"uuid": "{2}", "display_name": "Deploy"}, {"nickname": "bot"}], "groups": [],
+                     "value": None}]
+        self.assertEqual(plan_restriction_changes(desired, existing), ([], 1))
+        # A different user in its place is still an update
+        existing[0]["users"] = [{"uuid": "{3}"}, {"nickname": "bot"}]
+        self.assertEqual([c["action"] for c in plan_restriction_changes(desired, existing)[0]], ["update"])
+
+
+class TestApplyBranchPolicies(unittest.TestCase):
+    def setUp(self):
+        self.workspace = "test_workspace"
+        self.repos_api = MagicMock()
+        self.repos_api.iter_workspace_repositories.side_effect = lambda *args, **kwargs: iter([
+            {"slug": "web", "project": "PROJ1"}, {"slug": "api", "project": "PROJ1"}, {"slug": "docs", "project": "PROJ2"},
+        ])
+        self.branch_api = MagicMock()
+        self.branch_api.iter_branch_restrictions.side_effect = lambda ws, slug, prefetch=False: iter(
+            [{"id": 7, "kind": "push", "branch_match_kind": "glob", "pattern": "main", "users": [], "groups": []}]
+            if slug == "web" else []
+        )
+        self.branch_api.create_branch_restriction.return_value = {"success": True, "message": "created"}
+
+    def test_restrictions_read_once_per_selected_repository(self):
+        results, unchanged = apply_branch_policies(
+            self.branch_api, self.repos_api, self.workspace, [{"template": "pr-only", "projects": ["PROJ1"]}], workers=3
+        )
+        self.assertEqual(unchanged, 1)
+        self.assertEqual([(r["repo"], r["action"], r["success"]) for r in results], [("api", "create", True)])
+        self.assertEqual(sorted(c.args[1] for c in self.branch_api.iter_branch_restrictions.call_args_list),
+                         ["api", "web"])
+        self.repos_api.iter_workspace_repositories.assert_called_once_with(self.workspace, ["PROJ1"], prefetch=True)
+
+    def test_later_policy_wins_and_dry_run_makes_no_changes(self):
+        templates = {"strict": {"patterns": ["main"], "push": {"users": ["admin"]}}}
+        policies = [{"template": "pr-only", "repositories": ["*"]}, {"template": "strict", "repositories": ["web"]}]
+        results, unchanged = apply_branch_policies(self.branch_api, self.repos_api, self.workspace, policies,
+                                                   templates, dry_run=True)
+        self.assertEqual(unchanged, 0)
+        self.assertEqual([(r["repo"], r["action"]) for r in results],
+                         [("api", "create"), ("docs", "create"), ("web", "update")])
+        self.branch_api.create_branch_restriction.assert_not_called()
+
+    def test_unknown_template(self):
+        with self.assertRaises(ManifestError):
+            apply_branch_policies(self.branch_api, self.repos_api, self.workspace, [{"template": "x", "projects": ["P"]}])
+
+    def test_apply_template_to_one_repository(self):
+        result = apply_branch_template(self.branch_api, self.workspace, "web", {"patterns": ["main"], "push": True})
+        self.assertTrue(result["success"])
+        self.assertEqual(result["changes"], [])
+        self.branch_api.create_branch_restriction.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
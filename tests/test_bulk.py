@@ -0,0 +1,192 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from bitbucket_cli.bulk import bulk_create_projects_and_repositories, bulk_delete_projects_and_repositories
+from bitbucket_cli.journal import default_journal_path
+
+MANIFEST = """
+projects:
+  - key: PROJ1
+    name: Project 1
+    repositories:
+      - slug: web
+        branches: main;dev;uat
+      - slug: mobile
+        branches: "main;dev"
+"""
+
+
+class BulkTestCase(unittest.TestCase):
+    def setUp(self):
+        fd, self.yaml_path = tempfile.mkstemp(suffix=".yaml")
+        with os.fdopen(fd, "w") as f:
+            f.write(MANIFEST)
+        self.workspace = "test_workspace"
+        self.projects_api = MagicMock()
+        self.projects_api.create_project.return_value = {"success": True, "message": "created"}
+        self.repos_api = MagicMock()
+        self.repos_api.create_repository.return_value = {"success": True, "message": "created"}
+        self.repos_api.create_initial_commit.return_value = {"success": True, "commit": "abc123"}
+        self.repos_api.create_branches.side_effect = lambda ws, slug, names, **kwargs: {
+            "success": True, "branches": {name: {"success": True} for name in names}
+        }
+        self.branch_api = MagicMock()
+        self.branch_api.protect_branch.return_value = {"success": True}
+
+    def tearDown(self):
+        os.remove(self.yaml_path)
+        for operation in ("create", "delete"):
+            if os.path.exists(default_journal_path(self.yaml_path, operation)):
+                os.remove(default_journal_path(self.yaml_path, operation))
+
+
+class TestBulkCreate(BulkTestCase):
+    def test_bulk_create_runs_every_step(self):
+        bulk_create_projects_and_repositories(
+            self.projects_api, self.repos_api, self.branch_api, self.yaml_path, self.workspace, workers=6
+        )
+        self.projects_api.create_project.assert_called_once()
+        self.assertEqual(self.repos_api.create_repository.call_count, 2)
+        self.assertEqual(self.repos_api.create_initial_commit.call_count, 2)
+        self.assertEqual(self.repos_api.create_branches.call_count, 2)
+        self.assertEqual(self.repos_api.create_branches.call_args.kwargs["target_hash"], "abc123")
+        # Branches fan out on as many threads as the run itself
+        self.assertEqual(self.repos_api.create_branches.call_args.kwargs["workers"], 6)
+        self.assertEqual(self.branch_api.protect_branch.call_count, 2)
+        self.branch_api.client.get.assert_not_called()
+
+    def test_existing_repository_skips_follow_up_steps(self):
+        self.repos_api.create_repository.return_value = {
+            "success": False, "already_exists": True, "message": "Repository already exists"
+        }
+        bulk_create_projects_and_repositories(
+            self.projects_api, self.repos_api, self.branch_api, self.yaml_path, self.workspace, workers=4
+        )
+        self.repos_api.create_initial_commit.assert_not_called()
+        self.repos_api.create_branches.assert_not_called()
+        self.branch_api.protect_branch.assert_not_called()
+
+
+class TestBulkManifestFormats(BulkTestCase):
+    def test_csv_manifest(self):
+        fd, csv_path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "w") as f:
+            f.write("project,project_name,slug,branches\nPROJ1,Project 1,web,main;dev\nPROJ1,Project 1,mobile,dev\n")
+        self.addCleanup(os.remove, csv_path)
+        self.addCleanup(os.remove, default_journal_path(csv_path, "create"))
+        bulk_create_projects_and_repositories(
+            self.projects_api, self.repos_api, self.branch_api, csv_path, self.workspace, workers=4
+        )
+        self.projects_api.create_project.assert_called_once_with(self.workspace, "PROJ1", "Project 1", "")
+        self.assertEqual(self.repos_api.create_repository.call_count, 2)
+        self.branch_api.protect_branch.assert_called_once_with(self.workspace, "web", branch_name="main")
+
+    def test_delete_requires_repositories_after_their_project(self):
+        fd, jsonl_path = tempfile.mkstemp(suffix=".jsonl")
+        with os.fdopen(fd, "w") as f:
+            f.write('{"key": "PROJ1"}\n{"key": "PROJ2"}\n{"project": "PROJ1", "slug": "web"}\n')
+        self.addCleanup(os.remove, jsonl_path)
+        self.addCleanup(os.remove, default_journal_path(jsonl_path, "delete"))
+        bulk_delete_projects_and_repositories(
+            self.projects_api, self.repos_api, jsonl_path, self.workspace, workers=4
+        )
+        self.repos_api.delete_repository.assert_not_called()
+
+
+class TestBulkResume(BulkTestCase):
+    def run_create(self, resume):
+        bulk_create_projects_and_repositories(
+            self.projects_api, self.repos_api, self.branch_api, self.yaml_path, self.workspace,
+            workers=4, resume=resume
+        )
+
+    def test_resume_skips_completed_steps(self):
+        self.branch_api.protect_branch.return_value = {"success": False, "message": "throttled"}
+        self.repos_api.create_branches.side_effect = lambda ws, slug, names, **kwargs: {
+            "success": slug != "web",
+            "branches": {name: {"success": slug != "web" or name != "uat"} for name in names}
+        }
+        self.run_create(resume=False)
+
+        for api in (self.projects_api, self.repos_api, self.branch_api):
+            api.reset_mock()
+        self.branch_api.protect_branch.return_value = {"success": True}
+        self.repos_api.create_branches.side_effect = lambda ws, slug, names, **kwargs: {
+            "success": True, "branches": {name: {"success": True} for name in names}
+        }
+        self.run_create(resume=True)
+
+        self.projects_api.create_project.assert_not_called()
+        self.repos_api.create_repository.assert_not_called()
+        self.repos_api.create_initial_commit.assert_not_called()
+        # Only the branch that failed is created again, from the journaled commit
+        self.repos_api.create_branches.assert_called_once_with(
+            self.workspace, "web", ["uat"], target_hash="abc123", workers=4
+        )
+        self.assertEqual(self.branch_api.protect_branch.call_count, 2)
+
+    def test_resume_creates_branches_added_to_the_manifest(self):
+        self.run_create(resume=False)
+        with open(self.yaml_path, "w") as f:
+            f.write(MANIFEST.replace("main;dev;uat", "main;dev;uat;qa"))
+        self.repos_api.reset_mock()
+        self.run_create(resume=True)
+        self.repos_api.create_branches.assert_called_once_with(self.workspace, "web", ["qa"], target_hash="abc123",
+                                                              workers=4)
+
+    def test_run_without_resume_starts_a_new_journal(self):
+        self.run_create(resume=False)
+        self.projects_api.reset_mock()
+        self.run_create(resume=False)
+        self.projects_api.create_project.assert_called_once()
+
+    def test_journal_of_another_workspace_is_ignored(self):
+        self.run_create(resume=False)
+        self.projects_api.reset_mock()
+        self.workspace = "other_workspace"
+        self.run_create(resume=True)
+        self.projects_api.create_project.assert_called_once()
+
+
+class TestBulkDelete(BulkTestCase):
+    def test_project_deleted_after_all_its_repositories(self):
+        calls = []
+        self.repos_api.delete_repository.side_effect = lambda ws, slug, **kwargs: calls.append(slug) or True
+        self.projects_api.delete_project.side_effect = lambda ws, key: calls.append(key) or True
+        bulk_delete_projects_and_repositories(
+            self.projects_api, self.repos_api, self.yaml_path, self.workspace, workers=4
+        )
+        self.assertEqual(sorted(calls[:2]), ["mobile", "web"])
+        self.assertEqual(calls[2], "PROJ1")
+
+    def test_missing_repository_does_not_block_project_delete(self):
+        self.repos_api.delete_repository.return_value = True
+        bulk_delete_projects_and_repositories(
+            self.projects_api, self.repos_api, self.yaml_path, self.workspace, workers=4
+        )
+        self.repos_api.delete_repository.assert_any_call(self.workspace, "web", missing_ok=True)
+        self.projects_api.delete_project.assert_called_once_with(self.workspace, "PROJ1")
+
+    def test_failed_repository_delete_is_retried_on_resume(self):
+        self.repos_api.delete_repository.side_effect = lambda ws, slug, **kwargs: slug != "mobile"
+        status = bulk_delete_projects_and_repositories(
+            self.projects_api, self.repos_api, self.yaml_path, self.workspace, workers=4
+        )
+        self.assertEqual((status[("repo", "mobile")], status[("project", "PROJ1")]), ("failed", "skipped"))
+        self.projects_api.delete_project.assert_not_called()
+
+        self.repos_api.delete_repository.reset_mock()
+        self.repos_api.delete_repository.side_effect = None
+        self.repos_api.delete_repository.return_value = True
+        status = bulk_delete_projects_and_repositories(
+            self.projects_api, self.repos_api, self.yaml_path, self.workspace, workers=4, resume=True
+        )
+        self.assertEqual(set(status.values()), {"done"})
+        self.repos_api.delete_repository.assert_called_once_with(self.workspace, "mobile", missing_ok=True)
+        self.projects_api.delete_project.assert_called_once_with(self.workspace, "PROJ1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+from unittest.mock import MagicMock
+
+from bitbucket_cli.api import BitbucketAPI
+from bitbucket_cli.cache import ResponseCache
+
+BASE = "https://api.bitbucket.org/2.0"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _response(status_code=200, headers=None):
+    return MagicMock(status_code=status_code, headers=headers or {})
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ResponseCache(maxsize=3, ttls={"repositories": 60}, clock=self.clock)
+        self.client = BitbucketAPI(cache=self.cache)
+        self.client.session.request = MagicMock(return_value=_response())
+
+    def test_resource_type(self):
+        self.assertEqual(ResponseCache.resource_type(f"{BASE}/repositories/ws"), "repositories")
+        self.assertEqual(ResponseCache.resource_type(f"{BASE}/repositories/ws/web/permissions-config/users"), "permissions")
+        self.assertEqual(ResponseCache.resource_type(f"{BASE}/workspaces/ws/members"), "members")
+        self.assertIsNone(ResponseCache.resource_type(f"{BASE}/repositories/ws/web/refs/branches/main"))
+
+    def test_listing_served_from_cache_until_ttl(self):
+        params = {"q": 'project.key="P"', "pagelen": 100}
+        self.client.get(f"{BASE}/repositories/ws", params=params)
+        self.client.get(f"{BASE}/repositories/ws", params=params)
+        self.assertEqual(self.client.session.request.call_count, 1)
+        self.clock.now = 61
+        self.client.get(f"{BASE}/repositories/ws", params=params)
+        self.assertEqual(self.client.session.request.call_count, 2)
+
+    def test_non_listing_requests_are_not_cached(self):
+        self.client.get(f"{BASE}/repositories/ws/web/refs/branches/main")
+        self.client.get(f"{BASE}/repositories/ws/web/refs/branches/main")
+        self.assertEqual(self.client.session.request.call_count, 2)
+
+    def test_repository_write_invalidates_listings(self):
+        self.client.get(f"{BASE}/repositories/ws")
+        self.client.get(f"{BASE}/workspaces/ws/permissions/repositories")
+        self.client.get(f"{BASE}/repositories/other")
+        self.client.delete(f"{BASE}/repositories/ws/web")
+        self.assertEqual(len(self.cache.entries), 1)
+        self.client.get(f"{BASE}/repositories/ws")
+        self.assertEqual(self.client.session.request.call_count, 5)
+
+    def test_user_permission_write_invalidates_repo_permissions(self):
+        self.client.get(f"{BASE}/repositories/ws/web/permissions-config/users")
+        self.client.get(f"{BASE}/repositories/ws/api/permissions-config/users")
+        self.client.put(f"{BASE}/repositories/ws/web/permissions-config/users/alice", json={"permission": "read"})
+        paths = [entry["path"] for entry in self.cache.entries.values()]
+        self.assertEqual(paths, ["/repositories/ws/api/permissions-config/users"])
+
+    def test_etag_revalidation(self):
+        self.client.session.request.return_value = _response(200, {"ETag": '"v1"'})
+        first = self.client.get(f"{BASE}/repositories/ws")
+        self.clock.now = 61
+        self.client.session.request.return_value = _response(304)
+        second = self.client.get(f"{BASE}/repositories/ws", headers={"Authorization": "Basic x"})
+        self.assertIs(first, second)
+        sent_headers = self.client.session.request.call_args.kwargs["headers"]
+        self.assertEqual(sent_headers["If-None-Match"], '"v1"')
+        self.assertEqual(self.cache.stats()["revalidated"], 1)
+
+    def test_lru_eviction(self):
+        for slug in ("a", "b", "c", "d"):
+            self.client.get(f"{BASE}/workspaces/{slug}/members")
+        self.assertEqual(len(self.cache.entries), 3)
+        self.client.get(f"{BASE}/workspaces/a/members")
+        self.assertEqual(self.client.session.request.call_count, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -28,7 +28,7 @@ class TestBitbucketCLI(unittest.TestCase):
 
     def test_create_project_success(self):
         projects_api = BitbucketProjects(self.auth)
-        with patch("requests.post") as mock_post:
+        with patch.object(self.auth.client, "post") as mock_post:
             mock_post.return_value.status_code = 201
             result = projects_api.create_project(
                 self.workspace, "TEST", "Test Project", "Description"
@@ -37,7 +37,7 @@ class TestBitbucketCLI(unittest.TestCase):
 
     def test_create_project_already_exists(self):
         projects_api = BitbucketProjects(self.auth)
-        with patch("requests.post") as mock_post:
+        with patch.object(self.auth.client, "post") as mock_post:
             mock_post.return_value.status_code = 400
             mock_post.return_value.json.return_value = {
                 "error": {"message": "Project already exists"}
@@ -50,14 +50,14 @@ class TestBitbucketCLI(unittest.TestCase):
 
     def test_delete_project_success(self):
         projects_api = BitbucketProjects(self.auth)
-        with patch("requests.delete") as mock_delete:
+        with patch.object(self.auth.client, "delete") as mock_delete:
             mock_delete.return_value.status_code = 204
             result = projects_api.delete_project(self.workspace, "TEST")
             self.assertTrue(result)
 
     def test_create_repository_success(self):
         repos_api = BitbucketRepositories(self.auth)
-        with patch("requests.post") as mock_post:
+        with patch.object(self.auth.client, "post") as mock_post:
             mock_post.return_value.status_code = 201
             result = repos_api.create_repository(
                 self.workspace, "TEST", "test-repo", True
@@ -66,7 +66,7 @@ class TestBitbucketCLI(unittest.TestCase):
 
     def test_create_repository_already_exists(self):
         repos_api = BitbucketRepositories(self.auth)
-        with patch("requests.post") as mock_post:
+        with patch.object(self.auth.client, "post") as mock_post:
             mock_post.return_value.status_code = 400
             mock_post.return_value.json.return_value = {
             "error": {"message": "Repository already exists"}
@@ -77,9 +77,19 @@ class TestBitbucketCLI(unittest.TestCase):
             self.assertFalse(result["success"])
             self.assertTrue(result["already_exists"])
 
+    def test_create_repository_non_json_error(self):
+        repos_api = BitbucketRepositories(self.auth)
+        with patch.object(self.auth.client, "post") as mock_post:
+            mock_post.return_value.status_code = 503
+            mock_post.return_value.text = "<html>Service Unavailable</html>"
+            mock_post.return_value.json.side_effect = ValueError("not json")
+            result = repos_api.create_repository(self.workspace, "TEST", "test-repo", True)
+            self.assertFalse(result["success"])
+            self.assertIn("Service Unavailable", result["error_details"]["error"]["message"])
+
     def test_list_repositories_success(self):
         repos_api = BitbucketRepositories(self.auth)
-        with patch("requests.get") as mock_get:
+        with patch.object(self.auth.client, "get") as mock_get:
             mock_get.return_value.status_code = 200
             mock_get.return_value.json.return_value = {
                 "values": [{"slug": "test-repo", "name": "Test Repo"}]
@@ -88,16 +98,79 @@ class TestBitbucketCLI(unittest.TestCase):
             self.assertTrue(result["success"])
             self.assertEqual(len(result["repositories"]), 1)
 
+    def test_list_repositories_follows_pagination(self):
+        repos_api = BitbucketRepositories(self.auth)
+        first, second = MagicMock(status_code=200), MagicMock(status_code=200)
+        first.json.return_value = {"values": [{"slug": "a"}], "next": "https://next"}
+        second.json.return_value = {"values": [{"slug": "b", "name": "B"}]}
+        with patch.object(self.auth.client, "get", side_effect=[first, second]):
+            result = repos_api.list_repositories(self.workspace, "TEST")
+            self.assertEqual([r["slug"] for r in result["repositories"]], ["a", "b"])
+
     def test_delete_repository_success(self):
         repos_api = BitbucketRepositories(self.auth)
-        with patch("requests.delete") as mock_delete:
+        with patch.object(self.auth.client, "delete") as mock_delete:
             mock_delete.return_value.status_code = 204
             result = repos_api.delete_repository(self.workspace, "test-repo")
             self.assertTrue(result)
 
+    def test_delete_repositories_keeps_order(self):
+        repos_api = BitbucketRepositories(self.auth)
+        with patch.object(self.auth.client, "delete") as mock_delete:
+            mock_delete.side_effect = lambda url, headers: MagicMock(status_code=404 if url.endswith("b") else 204)
+            result = repos_api.delete_repositories(self.workspace, ["a", "b", "c"], workers=3)
+            self.assertEqual(result, [("a", True), ("b", False), ("c", True)])
+
+    def test_commit_initial_file_returns_commit_hash(self):
+        self.auth.get_headers.return_value = {"Authorization": "Basic dummy_token", "Content-Type": "application/json"}
+        repos_api = BitbucketRepositories(self.auth)
+        with patch.object(self.auth.client, "post") as mock_post:
+            mock_post.return_value.status_code = 201
+            mock_post.return_value.headers = {
+                "Location": "https://api.bitbucket.org/2.0/repositories/test_workspace/test-repo/commit/abc123"
+            }
+            result = repos_api.commit_initial_file(self.workspace, "test-repo")
+            self.assertTrue(result["success"])
+            self.assertEqual(result["commit"], "abc123")
+            self.assertNotIn("Content-Type", mock_post.call_args.kwargs["headers"])
+
+    def test_create_initial_commit_falls_back_to_git(self):
+        repos_api = BitbucketRepositories(self.auth)
+        with patch.object(self.auth.client, "post") as mock_post, \
+                patch("bitbucket_cli.repositories.subprocess.check_call") as mock_call, \
+                patch.dict("os.environ", {"BITBUCKET_USERNAME": "u", "BITBUCKET_APP_PASSWORD": "p"}):
+            mock_post.return_value.status_code = 500
+            result = repos_api.create_initial_commit(self.workspace, "test-repo")
+            self.assertTrue(result["success"])
+            commands = [call.args[0] for call in mock_call.call_args_list]
+            self.assertNotIn("clone", [arg for command in commands for arg in command])
+            self.assertEqual(commands[-1][-1], "HEAD:refs/heads/main")
+
+    def test_create_branches_resolves_base_once(self):
+        repos_api = BitbucketRepositories(self.auth)
+        with patch.object(self.auth.client, "get") as mock_get, patch.object(self.auth.client, "post") as mock_post:
+            mock_get.return_value.status_code = 200
+            mock_get.return_value.json.return_value = {"target": {"hash": "abc123"}}
+            mock_post.return_value.status_code = 201
+            result = repos_api.create_branches(self.workspace, "test-repo", ["main", "dev", "uat", "qa"])
+            self.assertTrue(result["success"])
+            self.assertEqual(set(result["branches"]), {"main", "dev", "uat", "qa"})
+            self.assertEqual(mock_get.call_count, 1)
+            self.assertEqual(mock_post.call_count, 3)
+
+    def test_create_branches_with_known_hash_skips_lookup(self):
+        repos_api = BitbucketRepositories(self.auth)
+        with patch.object(self.auth.client, "get") as mock_get, patch.object(self.auth.client, "post") as mock_post:
+            mock_post.return_value.status_code = 400
+            mock_post.return_value.text = "BRANCH_ALREADY_EXISTS"
+            result = repos_api.create_branches(self.workspace, "test-repo", ["dev"], target_hash="abc123")
+            mock_get.assert_not_called()
+            self.assertFalse(result["success"])
+            self.assertEqual(mock_post.call_args.kwargs["json"]["target"]["hash"], "abc123")
+
     def test_add_user_to_repo(self):
         users_api = BitbucketUsers(self.auth)
-        with patch("requests.put") as mock_put:
+        with patch.object(self.auth.client, "put") as mock_put:
             mock_put.return_value.status_code = 201
             result = users_api.add_user_to_repo(
                 self.workspace, "test-repo", "test_user", "admin"
@@ -106,7 +179,7 @@ class TestBitbucketCLI(unittest.TestCase):
 
     def test_remove_user_from_repo(self):
         users_api = BitbucketUsers(self.auth)
-        with patch("requests.delete") as mock_delete:
+        with patch.object(self.auth.client, "delete") as mock_delete:
             mock_delete.return_value.status_code = 204
             result = users_api.remove_user_from_repo(
                 self.workspace, "test-repo", "test_user"
@@ -115,7 +188,7 @@ class TestBitbucketCLI(unittest.TestCase):
 
     def test_list_users_and_groups(self):
         users_api = BitbucketUsers(self.auth)
-        with patch("requests.get") as mock_get:
+        with patch.object(self.auth.client, "get") as mock_get:
             mock_get.return_value.status_code = 200
             mock_get.return_value.json.return_value = {
                 "values": [
@@ -128,9 +201,38 @@ class TestBitbucketCLI(unittest.TestCase):
             result = users_api.list_users_and_groups(self.workspace)
             self.assertIn("Test User", result)
 
+    def test_list_project_permissions_uses_workspace_endpoint(self):
+        users_api = BitbucketUsers(self.auth)
+        repos = [{"slug": "web", "name": "Web"}, {"slug": "api", "name": "API"}]
+        with patch.object(self.auth.client, "get") as mock_get:
+            mock_get.return_value.status_code = 200
+            mock_get.return_value.json.return_value = {
+                "values": [
+                    {"repository": {"full_name": "test_workspace/web"}, "user": {"nickname": "alice"}, "permission": "admin"},
+                    {"repository": {"full_name": "test_workspace/other"}, "user": {"nickname": "bob"}, "permission": "read"},
+                ]
+            }
+            result = users_api.list_project_permissions(self.workspace, "TEST", repos)
+            self.assertEqual(mock_get.call_count, 1)
+            self.assertIn("/workspaces/test_workspace/permissions/repositories", mock_get.call_args.args[0])
+            self.assertEqual(result["web"]["users"], [{"username": "alice", "permission": "admin"}])
+            self.assertEqual(result["api"]["users"], [])
+
+    def test_list_project_permissions_falls_back_to_per_repo_calls(self):
+        users_api = BitbucketUsers(self.auth)
+        repos = [{"slug": "web", "name": "Web"}, {"slug": "api", "name": "API"}]
+        forbidden = MagicMock(status_code=403, text="Forbidden")
+        allowed = MagicMock(status_code=200)
+        allowed.json.return_value = {"values": [{"user": {"nickname": "carol"}, "permission": "write"}]}
+        with patch.object(self.auth.client, "get") as mock_get:
+            mock_get.side_effect = lambda url, **kwargs: forbidden if "/workspaces/" in url else allowed
+            result = users_api.list_project_permissions(self.workspace, "TEST", repos, workers=2)
+            self.assertEqual(mock_get.call_count, 3)
+            self.assertEqual(result["api"]["users"], [{"username": "carol", "permission": "write"}])
+
     def test_protect_branch_success(self):
         branch_api = BitbucketBranchPermissions(self.auth)
-        with patch("requests.post") as mock_post:
+        with patch.object(self.auth.client, "post") as mock_post:
             mock_post.return_value.status_code = 201
             result = branch_api.protect_branch(
                 self.workspace, "test-repo", "main"
@@ -139,7 +241,7 @@ class TestBitbucketCLI(unittest.TestCase):
 
     def test_protect_branch_failure(self):
         branch_api = BitbucketBranchPermissions(self.auth)
-        with patch("requests.post") as mock_post:
+        with patch.object(self.auth.client, "post") as mock_post:
             mock_post.return_value.status_code = 400
             mock_post.return_value.text = "Invalid request"
             result = branch_api.protect_branch(self.workspace, "test-repo", "main")
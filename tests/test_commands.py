@@ -0,0 +1,183 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from bitbucket_cli.cli import main, parse_args
+from bitbucket_cli.commands import ResultWriter, read_targets
+
+
+class TestReadTargets(unittest.TestCase):
+    def test_arguments_win_over_stdin(self):
+        self.assertEqual(read_targets(["web", "mobile"], stdin=io.StringIO("api\n")), ["web", "mobile"])
+
+    def test_stdin_when_no_arguments_or_dash(self):
+        stdin = "web\n\n# comment\n mobile \n"
+        self.assertEqual(read_targets([], stdin=io.StringIO(stdin)), ["web", "mobile"])
+        self.assertEqual(read_targets(["-"], stdin=io.StringIO(stdin)), ["web", "mobile"])
+
+
+class TestResultWriter(unittest.TestCase):
+    def test_ndjson(self):
+        stream = io.StringIO()
+        writer = ResultWriter("ndjson", stream)
+        writer.write({"repo": "web", "success": True})
+        writer.write({"repo": "api", "success": False})
+        self.assertEqual(writer.close(), 1)
+        self.assertEqual([json.loads(line)["repo"] for line in stream.getvalue().splitlines()], ["web", "api"])
+
+    def test_json(self):
+        stream = io.StringIO()
+        writer = ResultWriter("json", stream)
+        writer.write({"key": "PROJ1"})
+        self.assertEqual(writer.close(), 0)
+        self.assertEqual(json.loads(stream.getvalue()), [{"key": "PROJ1"}])
+
+
+@patch.dict(os.environ, {"BITBUCKET_WORKSPACE": "test_workspace"})
+@patch("bitbucket_cli.auth.BitbucketAuth", MagicMock())
+class TestSubcommands(unittest.TestCase):
+    def run_main(self, argv, stdin=""):
+        stdout = io.StringIO()
+        with patch("sys.stdout", stdout), patch("sys.stdin", io.StringIO(stdin)):
+            code = main(argv)
+        return code, [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+    @patch.dict(os.environ, {"BITBUCKET_POOL_SIZE": "16"})
+    @patch("bitbucket_cli.projects.BitbucketProjects.iter_projects")
+    def test_connection_pool_covers_the_workers(self, iter_projects):
+        iter_projects.side_effect = lambda *args, **kwargs: iter([])
+        with patch("bitbucket_cli.auth.BitbucketAuth") as auth:
+            self.run_main(["--workers", "32", "project", "list"])
+            auth.assert_called_once_with(pool_size=32)
+            auth.reset_mock()
+            self.run_main(["--workers", "2", "project", "list"])
+            auth.assert_called_once_with(pool_size=16)
+
+    def test_parse_args_without_command_keeps_the_menu(self):
+        self.assertIsNone(parse_args([]).command)
+
+    @patch("bitbucket_cli.repositories.BitbucketRepositories.delete_repository")
+    def test_repo_delete_many_targets_from_stdin(self, delete_repository):
+        delete_repository.side_effect = lambda ws, slug: slug != "missing"
+        code, results = self.run_main(["--workers", "3", "repo", "delete"], stdin="web\nmissing\napi\n")
+        self.assertEqual(code, 1)
+        self.assertEqual(results, [
+            {"success": True, "repo": "web"},
+            {"success": False, "repo": "missing"},
+            {"success": True, "repo": "api"},
+        ])
+
+    @patch("bitbucket_cli.users.BitbucketUsers.add_user_to_repo")
+    def test_perm_set(self, add_user_to_repo):
+        add_user_to_repo.return_value = {"message": "added"}
+        code, results = self.run_main(["perm", "set", "web", "api", "--user", "alice", "--permission", "write"])
+        self.assertEqual(code, 0)
+        self.assertEqual([r["repo"] for r in results], ["web", "api"])
+        self.assertTrue(all(r["success"] for r in results))
+        add_user_to_repo.assert_any_call("test_workspace", "api", "alice", "write")
+
+    @patch("bitbucket_cli.permissions.sync_permissions")
+    def test_perm_apply_writes_changes_and_summary(self, sync_permissions):
+        sync_permissions.return_value = ([{"repo": "web-app", "kind": "user", "name": "alice", "permission": "write",
+                                           "current": None, "success": True, "result": {"message": "added"}}], 3)
+        code, results = self.run_main(["perm", "apply", "--users", "alice", "--repos", "web-*", "--permission", "write"])
+        self.assertEqual(code, 0)
+        self.assertEqual(results[-1], {"summary": True, "changes": 1, "unchanged": 3, "failed": 0})
+        rule = sync_permissions.call_args.args[3][0]
+        self.assertEqual((rule["users"], rule["repositories"], rule["permission"]), (["alice"], ["web-*"], "write"))
+
+    @patch("bitbucket_cli.groups.BitbucketGroups.sync_group_members")
+    def test_group_sync_from_stdin(self, sync_group_members):
+        sync_group_members.return_value = ([{"group": "devs", "user": "bob", "action": "add"}], 1)
+        code, results = self.run_main(["group", "sync", "--group", "devs", "--keep-others", "--dry-run"],
+                                      stdin="alice\nbob\n")
+        self.assertEqual(code, 0)
+        self.assertTrue(results[0]["planned"])
+        self.assertEqual(results[-1], {"summary": True, "changes": 1, "unchanged": 1, "failed": 0})
+        sync_group_members.assert_called_once_with("test_workspace", {"devs": ["alice", "bob"]}, remove=False,
+                                                   workers=4, dry_run=True)
+
+    @patch("bitbucket_cli.branch_policies.apply_branch_policies")
+    def test_branch_apply_template(self, apply_branch_policies):
+        apply_branch_policies.return_value = ([{"repo": "web", "action": "create", "kind": "push", "pattern": "main",
+                                                "success": False, "message": "denied"}], 0)
+        code, results = self.run_main(["branch", "apply", "hardened", "--projects", "PROJ1"])
+        self.assertEqual(code, 1)
+        self.assertEqual(results[-1]["failed"], 1)
+        self.assertEqual(apply_branch_policies.call_args.args[3],
+                         [{"template": "hardened", "repositories": [], "projects": ["PROJ1"]}])
+
+    @patch("bitbucket_cli.projects.BitbucketProjects.iter_projects")
+    def test_metrics_file_written_at_exit(self, iter_projects):
+        iter_projects.return_value = iter([])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metrics.prom")
+            with patch("sys.stderr", io.StringIO()):
+                code, _ = self.run_main(["--metrics", path, "project", "list"])
+            self.assertEqual(code, 0)
+            with open(path) as file:
+                self.assertIn("# TYPE bitbucket_request_duration_seconds histogram", file.read())
+
+    @patch("bitbucket_cli.projects.BitbucketProjects.create_project")
+    def test_exception_is_reported_per_target(self, create_project):
+        create_project.side_effect = [{"success": True, "message": "created"}, RuntimeError("boom")]
+        code, results = self.run_main(["--workers", "1", "project", "create", "P1", "P2"])
+        self.assertEqual(code, 1)
+        self.assertEqual(results[1], {"project": "P2", "success": False, "error": "boom"})
+
+    @patch("bitbucket_cli.bulk.bulk_create_projects_and_repositories")
+    def test_bulk_create_reports_step_status(self, bulk_create):
+        def run(*args, **kwargs):
+            print("progress line")
+            return {("project", "PROJ1"): "done", ("repo", "web"): "failed"}
+        bulk_create.side_effect = run
+        code, results = self.run_main(["bulk", "create", "manifest.yaml"])
+        self.assertEqual(code, 1)
+        self.assertEqual(results, [
+            {"step": ["project", "PROJ1"], "status": "done", "success": True},
+            {"step": ["repo", "web"], "status": "failed", "success": False},
+        ])
+
+    @patch("bitbucket_cli.repository_settings.update_repositories")
+    def test_repo_update_builds_one_rule_from_the_options(self, update_repositories):
+        update_repositories.return_value = ([{"repo": "web", "settings": {"is_private": False}}], 2)
+        code, results = self.run_main(["repo", "update", "--projects", "PROJ1", "--public", "--dry-run"])
+        self.assertEqual(code, 0)
+        rules = update_repositories.call_args.args[2]
+        self.assertEqual(rules, [{"repositories": [], "projects": ["PROJ1"], "private": False, "description": None,
+                                  "main_branch": None, "fork_policy": None, "move_to": None}])
+        self.assertTrue(update_repositories.call_args.kwargs["dry_run"])
+        self.assertEqual(results, [{"repo": "web", "settings": {"is_private": False}, "planned": True},
+                                   {"summary": True, "changes": 1, "unchanged": 2, "failed": 0}])
+
+    @patch("bitbucket_cli.bulk.bulk_create_projects_and_repositories")
+    def test_bulk_create_dry_run_sends_nothing(self, bulk_create):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "manifest.yaml")
+            with open(path, "w") as f:
+                f.write("projects:\n  - key: P1\n    repositories:\n      - slug: web\n        branches: main;dev\n")
+            code, results = self.run_main(["bulk", "create", path, "--dry-run", "--rate-limit", "600"])
+        self.assertEqual(code, 0)
+        bulk_create.assert_not_called()
+        self.assertEqual([r["path"] for r in results[:-1]], [
+            "/workspaces/test_workspace/projects", "/repositories/test_workspace/web",
+            "/repositories/test_workspace/web/src", "/repositories/test_workspace/web/refs/branches",
+            "/repositories/test_workspace/web/branch-restrictions",
+        ])
+        self.assertTrue(all(r["planned"] for r in results[:-1]))
+        self.assertEqual((results[-1]["summary"], results[-1]["requests"], results[-1]["rate_per_hour"]),
+                         (True, 5, 600))
+
+    def test_inventory_query_without_a_synced_inventory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "missing.sqlite")
+            code, results = self.run_main(["--inventory", path, "inventory", "perms", "--permission", "admin"])
+        self.assertEqual(code, 1)
+        self.assertIn("inventory sync", results[0]["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+
+from bitbucket_cli.estimate import estimate, plan_bulk_run, simulate
+from bitbucket_cli.journal import BulkJournal, default_journal_path
+
+MANIFEST = """
+projects:
+  - key: PROJ1
+    name: Project 1
+    repositories:
+      - slug: web
+        branches: main;dev;uat
+      - slug: mobile
+        branches: "dev"
+"""
+
+
+class TestBulkPlan(unittest.TestCase):
+    def setUp(self):
+        fd, self.yaml_path = tempfile.mkstemp(suffix=".yaml")
+        with os.fdopen(fd, "w") as f:
+            f.write(MANIFEST)
+        self.addCleanup(os.remove, self.yaml_path)
+
+    def requests(self, steps):
+        return [(op["method"], op["path"]) for step in steps for op in step["operations"]]
+
+    def test_create_plan_lists_every_request(self):
+        steps = plan_bulk_run(self.yaml_path, "ws", "create")
+        self.assertEqual(self.requests(steps), [
+            ("POST", "/workspaces/ws/projects"),
+            ("POST", "/repositories/ws/web"),
+            ("POST", "/repositories/ws/web/src"),
+            ("POST", "/repositories/ws/web/refs/branches"),
+            ("POST", "/repositories/ws/web/refs/branches"),
+            ("POST", "/repositories/ws/web/branch-restrictions"),
+            ("POST", "/repositories/ws/mobile"),
+            ("POST", "/repositories/ws/mobile/src"),
+            ("POST", "/repositories/ws/mobile/refs/branches"),
+        ])
+        result = estimate(steps, workers=4, latency=1.0, rate_per_hour=None)
+        self.assertEqual(result["requests"], 9)
+        # Each branches step may first GET the main branch when the commit hash is unknown
+        self.assertEqual(result["max_requests"], 11)
+        self.assertEqual(result["max_git_pushes"], 2)
+        self.assertEqual(result["endpoints"]["POST /repositories/{workspace}/{repo_slug}/refs/branches"], 3)
+        # project, then per repository: repo, commit, then branches (two at once) alongside protect
+        self.assertEqual(result["estimated_seconds"], 4.0)
+
+    def test_resumed_plan_leaves_out_journaled_steps(self):
+        journal_path = default_journal_path(self.yaml_path, "create")
+        self.addCleanup(os.remove, journal_path)
+        with BulkJournal(journal_path, "ws") as journal:
+            for step in [("project", "PROJ1"), ("repo", "web"), ("commit", "web"), ("branches", "web"),
+                         ("branch", "web", "dev")]:
+                journal.record(step)
+        steps = plan_bulk_run(self.yaml_path, "ws", "create", resume=True)
+        # A journaled branches step does not hide the branch that is still missing
+        self.assertEqual([s["name"] for s in steps], [
+            ("branches", "web"), ("protect", "web", "main"), ("repo", "mobile"), ("commit", "mobile"),
+            ("branches", "mobile"),
+        ])
+        self.assertEqual(len(steps[0]["operations"]), 1)
+        self.assertEqual(steps[2]["deps"], [])
+
+    def test_delete_plan_removes_projects_after_their_repositories(self):
+        steps = plan_bulk_run(self.yaml_path, "ws", "delete")
+        self.assertEqual(self.requests(steps), [
+            ("DELETE", "/repositories/ws/web"),
+            ("DELETE", "/repositories/ws/mobile"),
+            ("DELETE", "/workspaces/ws/projects/PROJ1"),
+        ])
+        self.assertEqual(steps[-1]["deps"], [("repo", "web"), ("repo", "mobile")])
+        self.assertEqual(simulate(steps, workers=1, latency=1.0), 3.0)
+        self.assertEqual(simulate(steps, workers=2, latency=1.0), 2.0)
+
+
+class TestEstimate(unittest.TestCase):
+    def steps(self, count):
+        return [{"name": ("repo", str(i)), "deps": [], "parallel": False,
+                 "operations": [{"method": "DELETE", "endpoint": "/repositories/{workspace}/{repo_slug}"}]}
+                for i in range(count)]
+
+    def test_rate_budget_bounds_large_runs(self):
+        result = estimate(self.steps(1200), workers=8, latency=0.5, rate_per_hour=1000)
+        self.assertEqual(result["concurrency_seconds"], 75.0)
+        # 16 requests of burst, the other 1184 at 1000 per hour
+        self.assertEqual(result["estimated_seconds"], 4262.4)
+        self.assertFalse(result["fits_in_hour"])
+
+    def test_measured_latencies_override_the_default(self):
+        latencies = {("DELETE", "/repositories/{workspace}/{repo_slug}"): 2.0}
+        result = estimate(self.steps(4), workers=2, latency=0.1, latencies=latencies, rate_per_hour=1000)
+        self.assertEqual(result["estimated_seconds"], 4.0)
+        self.assertTrue(result["fits_in_hour"])
+
+
+if __name__ == "__main__":
+    unittest.main()
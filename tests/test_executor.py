@@ -0,0 +1,130 @@
+import threading
+import time
+import unittest
+
+from bitbucket_cli.executor import BulkExecutor
+
+
+class TestBulkExecutor(unittest.TestCase):
+    def test_dependencies_run_in_order(self):
+        order = []
+        executor = BulkExecutor(workers=4)
+        a = executor.add("a", lambda: order.append("a") or True)
+        b = executor.add("b", lambda: order.append("b") or True, deps=[a])
+        executor.add("c", lambda: order.append("c") or True, deps=[b])
+        status = executor.run()
+        self.assertEqual(order, ["a", "b", "c"])
+        self.assertEqual(set(status.values()), {"done"})
+
+    def test_failure_skips_dependents(self):
+        executor = BulkExecutor(workers=2)
+        a = executor.add("a", lambda: False)
+        b = executor.add("b", lambda: True, deps=[a])
+        executor.add("c", lambda: True, deps=[b])
+        executor.add("d", lambda: True)
+        status = executor.run()
+        self.assertEqual(status, {"a": "failed", "b": "skipped", "c": "skipped", "d": "done"})
+
+    def test_exception_is_reported(self):
+        errors = []
+        executor = BulkExecutor()
+
+        def boom():
+            raise RuntimeError("boom")
+
+        executor.add("a", boom, group="g")
+        status = executor.run(on_error=lambda name, group, e: errors.append((name, group, str(e))))
+        self.assertEqual(status["a"], "failed")
+        self.assertEqual(errors, [("a", "g", "boom")])
+
+    def test_independent_tasks_run_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+        executor = BulkExecutor(workers=3)
+        for i in range(3):
+            executor.add(i, lambda: barrier.wait() is not None)
+        status = executor.run()
+        self.assertEqual(set(status.values()), {"done"})
+
+    def test_group_done_called_once_per_group(self):
+        done = []
+        executor = BulkExecutor(workers=2)
+        root = executor.add("root", lambda: True, group="p")
+        for repo in ("r1", "r2"):
+            first = executor.add((repo, 1), lambda: time.sleep(0.01) or True, deps=[root], group=repo)
+            executor.add((repo, 2), lambda: True, deps=[first], group=repo)
+        executor.run(on_group_done=done.append)
+        self.assertEqual(done[0], "p")
+        self.assertEqual(sorted(done[1:]), ["r1", "r2"])
+
+    def test_duplicate_task_rejected(self):
+        executor = BulkExecutor()
+        executor.add("a", lambda: True)
+        with self.assertRaises(ValueError):
+            executor.add("a", lambda: True)
+
+
+    def test_journaled_tasks_are_not_run(self):
+        class Journal:
+            def __init__(self):
+                self.completed = {"a": {"commit": "abc"}}
+
+            def done(self, name):
+                return name in self.completed
+
+            def get(self, name):
+                return self.completed.get(name)
+
+            def record(self, name, data=None):
+                self.completed[name] = data
+
+        journal = Journal()
+        ran = []
+        executor = BulkExecutor(workers=2, journal=journal)
+        a = executor.add("a", lambda: ran.append("a") or True)
+        executor.add("b", lambda: ran.append("b") or True, deps=[a])
+        executor.add("c", lambda: False, deps=[a])
+        status = executor.run()
+        self.assertEqual(ran, ["b"])
+        self.assertEqual(status, {"a": "done", "b": "done", "c": "failed"})
+        self.assertEqual(executor.resumed, {"a"})
+        self.assertEqual(executor.results["a"], {"commit": "abc"})
+        self.assertIn("b", journal.completed)
+        self.assertNotIn("c", journal.completed)
+
+
+    def test_feed_starts_tasks_before_it_is_exhausted(self):
+        started = threading.Event()
+        groups = []
+        executor = BulkExecutor(workers=2)
+
+        def feed():
+            executor.add("a", lambda: started.set() or True, group="g1")
+            executor.close_group("g1")
+            yield
+            # The first task runs while the feed is still being consumed
+            self.assertTrue(started.wait(1))
+            executor.add("b", lambda: True, deps=["a"], group="g2")
+            yield
+            executor.add("c", lambda: True, group="g2")
+            executor.close_group("g2")
+            yield
+
+        status = executor.run(on_group_done=groups.append, feed=feed())
+        self.assertEqual(status, {"a": "done", "b": "done", "c": "done"})
+        self.assertEqual(groups, ["g1", "g2"])
+
+    def test_feed_error_is_raised_after_running_tasks_finish(self):
+        executor = BulkExecutor(workers=2)
+
+        def feed():
+            executor.add("a", lambda: time.sleep(0.05) or True)
+            yield
+            raise ValueError("bad input")
+
+        with self.assertRaises(ValueError):
+            executor.run(feed=feed())
+        self.assertEqual(executor.status, {"a": "done"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from fake_bitbucket import FakeBitbucket, parse_query  # noqa: E402
+
+MANIFEST = """projects:
+  - key: WEB
+    name: Web
+    repositories:
+      - slug: site
+        branches: main;develop
+      - slug: api
+        branches: main
+"""
+
+
+class TestParseQuery(unittest.TestCase):
+    def test_and_binds_tighter_than_or(self):
+        predicate = parse_query('(project.key="A" OR project.key="B") AND updated_on>"2024-01-01"')
+        self.assertTrue(predicate({"project": {"key": "B"}, "updated_on": "2024-05-01"}))
+        self.assertFalse(predicate({"project": {"key": "B"}, "updated_on": "2023-05-01"}))
+        self.assertFalse(predicate({"project": {"key": "C"}, "updated_on": "2024-05-01"}))
+
+    def test_rejects_unknown_syntax(self):
+        with self.assertRaises(ValueError):
+            parse_query('project.key ~ "A"')
+
+
+class TestAgainstFakeServer(unittest.TestCase):
+    """
+    The real HTTP stack (session, scheduler, pagination) against the local fake API.
+    """
+    def setUp(self):
+        self.server = FakeBitbucket(max_pagelen=1, throttle_every=7).start()
+        self.addCleanup(self.server.stop)
+        environment = patch.dict(os.environ, {
+            "BITBUCKET_API_URL": self.server.base_url,
+            "BITBUCKET_USERNAME": "bench",
+            "BITBUCKET_APP_PASSWORD": "bench",
+            "BITBUCKET_CACHE_SIZE": "0",
+        })
+        environment.start()
+        self.addCleanup(environment.stop)
+
+        from bitbucket_cli.auth import BitbucketAuth
+        from bitbucket_cli.branch_permissions import BitbucketBranchPermissions
+        from bitbucket_cli.projects import BitbucketProjects
+        from bitbucket_cli.repositories import BitbucketRepositories
+
+        auth = BitbucketAuth()
+        self.projects_api = BitbucketProjects(auth)
+        self.repos_api = BitbucketRepositories(auth)
+        self.branch_api = BitbucketBranchPermissions(auth)
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.manifest = os.path.join(workdir.name, "manifest.yaml")
+        with open(self.manifest, "w") as file:
+            file.write(MANIFEST)
+
+    def test_bulk_create_and_delete(self):
+        from bitbucket_cli.bulk import bulk_create_projects_and_repositories, bulk_delete_projects_and_repositories
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            status = bulk_create_projects_and_repositories(self.projects_api, self.repos_api, self.branch_api,
+                                                           self.manifest, "ws", workers=4)
+        self.assertEqual(set(status.values()), {"done"})
+        repositories = self.server.workspace("ws")["repositories"]
+        self.assertEqual(sorted(repositories["site"]["_branches"]), ["develop", "main"])
+        self.assertEqual(len(repositories["api"]["_restrictions"]), 1)
+        self.assertGreater(self.server.throttled, 0)
+
+        # One repository per page: the listing follows the `next` links
+        listed = self.repos_api.list_repositories("ws", "WEB")
+        self.assertEqual(sorted(repo["slug"] for repo in listed["repositories"]), ["api", "site"])
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            status = bulk_delete_projects_and_repositories(self.projects_api, self.repos_api, self.manifest, "ws")
+        self.assertEqual(set(status.values()), {"done"})
+        self.assertEqual(self.server.workspace("ws")["projects"], {})
+
+    def test_failed_repository_delete_finishes_on_resume(self):
+        from bitbucket_cli.bulk import bulk_delete_projects_and_repositories
+
+        self.server.add_project("ws", "WEB")
+        self.server.add_repository("ws", "WEB", "site")
+        self.server.add_repository("ws", "WEB", "api")
+        delete_repository = self.repos_api.delete_repository
+
+        def fail_api(workspace, slug, **kwargs):
+            # 'api' fails once (e.g. a dropped connection); 'site' is deleted
+            return slug != "api" and delete_repository(workspace, slug, **kwargs)
+
+        with patch.object(self.repos_api, "delete_repository", side_effect=fail_api), \
+                contextlib.redirect_stdout(io.StringIO()):
+            status = bulk_delete_projects_and_repositories(self.projects_api, self.repos_api, self.manifest, "ws")
+        self.assertEqual(status[("project", "WEB")], "skipped")
+        self.assertEqual(list(self.server.workspace("ws")["repositories"]), ["api"])
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            status = bulk_delete_projects_and_repositories(self.projects_api, self.repos_api, self.manifest, "ws",
+                                                           resume=True)
+        self.assertEqual(set(status.values()), {"done"})
+        self.assertEqual(self.server.workspace("ws")["repositories"], {})
+        self.assertEqual(self.server.workspace("ws")["projects"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from bitbucket_cli.groups import BitbucketGroups, plan_group_changes, read_group_members
+from bitbucket_cli.manifest import ManifestError
+
+
+class TestGroupSync(unittest.TestCase):
+    def setUp(self):
+        self.workspace = "test_workspace"
+        self.auth = MagicMock()
+        self.groups_api = BitbucketGroups(self.auth)
+        members = {"developers": ["alice", "bob"], "admins": ["carol"]}
+        self.iter_group_members = patch.object(
+            BitbucketGroups, "iter_group_members", side_effect=lambda ws, group: iter(members.get(group, []))
+        ).start()
+        self.addCleanup(patch.stopall)
+
+    def test_plan(self):
+        current = {"developers": {"alice", "bob"}}
+        changes, unchanged = plan_group_changes({"developers": ["alice", "dave"]}, current)
+        self.assertEqual(unchanged, 1)
+        self.assertEqual([(c["action"], c["user"]) for c in changes], [("add", "dave"), ("remove", "bob")])
+        changes, _ = plan_group_changes({"developers": ["alice", "dave"]}, current, remove=False)
+        self.assertEqual([(c["action"], c["user"]) for c in changes], [("add", "dave")])
+
+    def test_sync_reads_each_group_once_and_applies_only_the_diff(self):
+        self.auth.client.post.return_value = MagicMock(status_code=201)
+        self.auth.client.delete.return_value = MagicMock(status_code=204)
+        changes, unchanged = self.groups_api.sync_group_members(
+            self.workspace, {"developers": ["alice", "carol"], "admins": ["carol"]}, workers=4
+        )
+        self.assertEqual(unchanged, 2)
+        self.assertEqual(self.iter_group_members.call_count, 2)
+        self.assertEqual([(c["action"], c["group"], c["user"], c["success"]) for c in changes],
+                         [("add", "developers", "carol", True), ("remove", "developers", "bob", True)])
+        self.auth.client.post.assert_called_once()
+        self.assertTrue(self.auth.client.delete.call_args.args[0].endswith("/groups/developers/members/bob"))
+
+    def test_unchanged_membership_makes_no_calls(self):
+        changes, unchanged = self.groups_api.sync_group_members(self.workspace, {"admins": ["carol"]})
+        self.assertEqual((changes, unchanged), ([], 1))
+        self.auth.client.post.assert_not_called()
+        self.auth.client.delete.assert_not_called()
+
+    def test_failed_change_is_reported(self):
+        self.auth.client.post.return_value = MagicMock(status_code=404, json=MagicMock(return_value={}))
+        changes, _ = self.groups_api.sync_group_members(self.workspace, {"admins": ["carol", "dave"]}, remove=False)
+        self.assertEqual([(c["user"], c["success"]) for c in changes], [("dave", False)])
+
+    def test_manifest_groups_section(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".yaml", delete=False) as file:
+            file.write("groups:\n  developers: alice;dave\n  admins: [carol]\n")
+        self.addCleanup(os.remove, file.name)
+        changes, unchanged = self.groups_api.sync_groups_from_manifest(file.name, self.workspace, dry_run=True)
+        self.assertEqual([(c["action"], c["user"]) for c in changes], [("add", "dave"), ("remove", "bob")])
+        self.assertEqual(unchanged, 2)
+        with self.assertRaises(ManifestError):
+            read_group_members({"developers": {"alice": 1}})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from fake_bitbucket import FakeBitbucket  # noqa: E402
+
+from bitbucket_cli.inventory import Inventory, InventoryError, open_inventory  # noqa: E402
+from bitbucket_cli.permissions import sync_permissions  # noqa: E402
+
+
+class TestInventorySync(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeBitbucket().start()
+        self.addCleanup(self.server.stop)
+        environment = patch.dict(os.environ, {
+            "BITBUCKET_API_URL": self.server.base_url,
+            "BITBUCKET_USERNAME": "bench",
+            "BITBUCKET_APP_PASSWORD": "bench",
+            "BITBUCKET_CACHE_SIZE": "0",
+        })
+        environment.start()
+        self.addCleanup(environment.stop)
+
+        self.server.add_project("ws", "PROJ1")
+        self.server.add_project("ws", "PROJ2")
+        self.server.add_group("ws", "developers", ["alice"])
+        self.server.add_repository("ws", "PROJ1", "web", branches=["main", "dev"], users={"alice": "admin"},
+                                   groups={"developers": "write"})
+        self.server.add_repository("ws", "PROJ1", "api", branches=["main"], users={"bob": "read"})
+        self.server.add_repository("ws", "PROJ2", "docs")
+        self.server.workspace("ws")["repositories"]["web"]["_restrictions"][1] = {
+            "id": 1, "kind": "push", "pattern": "main", "users": [], "groups": []
+        }
+
+        from bitbucket_cli.auth import BitbucketAuth
+        from bitbucket_cli.branch_permissions import BitbucketBranchPermissions
+        from bitbucket_cli.projects import BitbucketProjects
+        from bitbucket_cli.repositories import BitbucketRepositories
+        from bitbucket_cli.users import BitbucketUsers
+
+        auth = BitbucketAuth()
+        self.apis = (BitbucketProjects(auth), BitbucketRepositories(auth), BitbucketUsers(auth),
+                     BitbucketBranchPermissions(auth))
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.path = os.path.join(workdir.name, "inventory.sqlite")
+        self.inventory = Inventory(self.path, "ws")
+        self.addCleanup(self.inventory.close)
+
+    def test_first_sync_mirrors_the_workspace(self):
+        stats = self.inventory.sync(*self.apis)
+        self.assertEqual((stats["repositories"], stats["refreshed"], stats["failed"], stats["full"]), (3, 3, [], True))
+        self.assertEqual([r["slug"] for r in self.inventory.repositories("PROJ1")], ["api", "web"])
+        self.assertEqual(self.inventory.permissions(permission="admin"),
+                         [{"repo_slug": "web", "project": "PROJ1", "username": "alice", "permission": "admin"}])
+        self.assertEqual([r["slug"] for r in self.inventory.unprotected_repositories()], ["api"])
+        self.assertEqual(list(self.inventory.iter_branches("ws", "web")), ["dev", "main"])
+        self.assertEqual(list(self.inventory.iter_groups_and_permissions("ws", "web")),
+                         [{"group": "developers", "permission": "write"}])
+
+    def test_incremental_sync_refetches_only_updated_repositories(self):
+        self.inventory.sync(*self.apis)
+        repositories = self.server.workspace("ws")["repositories"]
+        repositories["api"]["_branches"]["release"] = "abc"
+        repositories["api"]["updated_on"] = "2999-01-01T00:00:00.000000Z"
+        del repositories["docs"]
+
+        stats = self.inventory.sync(*self.apis)
+        self.assertEqual((stats["refreshed"], stats["removed"], stats["full"]), (1, 1, False))
+        self.assertEqual(list(self.inventory.iter_branches("ws", "api")), ["main", "release"])
+        self.assertEqual(list(self.inventory.iter_branches("ws", "web")), ["dev", "main"])
+        self.assertEqual(list(self.inventory.iter_repository_slugs()), ["api", "web"])
+
+    def test_planner_reads_current_state_from_the_inventory(self):
+        self.inventory.sync(*self.apis)
+        users_api, repos_api = MagicMock(), MagicMock()
+        rule = {"users": ["alice", "bob"], "projects": ["PROJ1"], "permission": "write"}
+        changes, unchanged = sync_permissions(users_api, repos_api, "ws", [rule], dry_run=True,
+                                              inventory=self.inventory)
+        self.assertEqual(sorted((c["repo"], c["name"], c["current"]) for c in changes), [
+            ("api", "alice", None), ("api", "bob", "read"), ("web", "alice", "admin"), ("web", "bob", None),
+        ])
+        self.assertEqual(unchanged, 0)
+        self.assertEqual(repos_api.method_calls + users_api.method_calls, [])
+
+    def test_open_requires_a_synced_inventory_of_the_same_workspace(self):
+        with self.assertRaises(InventoryError):
+            open_inventory("ws", self.path + ".missing")
+        self.inventory.sync(*self.apis)
+        with self.assertRaises(InventoryError):
+            open_inventory("other", self.path)
+        with open_inventory("ws", self.path) as inventory:
+            self.assertIsNotNone(inventory.meta("synced_at"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+
+from bitbucket_cli.journal import BulkJournal
+
+
+class TestBulkJournal(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".journal")
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_resume_loads_recorded_steps(self):
+        with BulkJournal(self.path, "ws") as journal:
+            journal.record(("repo", "web"))
+            journal.record(("commit", "web"), {"commit": "abc"})
+        with BulkJournal(self.path, "ws", resume=True) as journal:
+            self.assertTrue(journal.done(("repo", "web")))
+            self.assertEqual(journal.get(("commit", "web")), {"commit": "abc"})
+            self.assertFalse(journal.done(("repo", "mobile")))
+
+    def test_truncated_last_line_is_ignored(self):
+        with BulkJournal(self.path, "ws") as journal:
+            journal.record(("repo", "web"))
+        with open(self.path, "a") as file:
+            file.write('{"workspace": "ws", "step": ["repo", "mob')
+        with BulkJournal(self.path, "ws", resume=True) as journal:
+            self.assertEqual(set(journal.completed), {("repo", "web")})
+
+    def test_without_resume_the_journal_is_truncated(self):
+        with BulkJournal(self.path, "ws") as journal:
+            journal.record(("repo", "web"))
+        with BulkJournal(self.path, "ws") as journal:
+            self.assertFalse(journal.done(("repo", "web")))
+        self.assertEqual(os.path.getsize(self.path), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import yaml
+
+from bitbucket_cli import manifest
+from bitbucket_cli.manifest import ManifestError, iter_manifest, load_manifest, run_manifest_command
+from bitbucket_cli.rules import as_list
+
+YAML_MANIFEST = """
+defaults: &private
+  is_private: false
+projects:
+  - key: PROJ1
+    name: Project 1
+    description: "First"
+    repositories:
+      - slug: web
+        branches: main;dev
+      - <<: *private
+        slug: mobile
+        branches: [main, dev]
+  - key: PROJ2
+    name: Project 2
+"""
+
+EXPECTED = [
+    ("project", {"key": "PROJ1", "name": "Project 1", "description": "First"}),
+    ("repository", {"project": "PROJ1", "slug": "web", "is_private": True, "branches": "main;dev"}),
+    ("repository", {"project": "PROJ1", "slug": "mobile", "is_private": False, "branches": ["main", "dev"]}),
+    ("project", {"key": "PROJ2", "name": "Project 2", "description": ""}),
+]
+
+
+class TestManifest(unittest.TestCase):
+    def write(self, suffix, content):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_yaml_is_streamed_per_repository(self):
+        self.assertEqual(list(iter_manifest(self.write(".yaml", YAML_MANIFEST))), EXPECTED)
+
+    def test_pure_python_loader_gives_the_same_records(self):
+        with patch.object(manifest, "YAML_LOADER", yaml.SafeLoader):
+            self.assertEqual(list(iter_manifest(self.write(".yml", YAML_MANIFEST))), EXPECTED)
+
+    def test_records_are_yielded_before_the_file_is_fully_parsed(self):
+        path = self.write(".yaml", YAML_MANIFEST + "  - key: [unclosed\n")
+        records = iter_manifest(path)
+        self.assertEqual([next(records) for _ in EXPECTED], EXPECTED)
+        with self.assertRaises(yaml.YAMLError):
+            next(records)
+
+    def test_repositories_before_the_project_key(self):
+        path = self.write(".yaml", """
+projects:
+  - repositories:
+      - slug: web
+    name: Project 1
+    key: PROJ1
+  - key: PROJ2
+""")
+        self.assertEqual(list(iter_manifest(path)), [
+            ("project", {"key": "PROJ1", "name": "Project 1", "description": ""}),
+            ("repository", {"project": "PROJ1", "slug": "web", "is_private": True, "branches": ""}),
+            ("project", {"key": "PROJ2", "name": "PROJ2", "description": ""}),
+        ])
+
+    def test_merge_keys_in_a_project(self):
+        text = """
+defaults: &defaults
+  name: Shared
+  description: Same for all
+extra: &extra
+  description: Overridden
+  repositories:
+    - slug: api
+projects:
+  - <<: *defaults
+    key: P1
+    repositories:
+      - slug: web
+  - key: P2
+    name: Own name
+    <<: [*extra, *defaults]
+"""
+        path = self.write(".yaml", text)
+        self.assertEqual(load_manifest(path), {"projects": [
+            {"key": p["key"], "name": p["name"], "description": p["description"], "repositories": [
+                {"project": p["key"], "slug": r["slug"], "is_private": True, "branches": ""}
+                for r in p["repositories"]
+            ]} for p in yaml.safe_load(text)["projects"]
+        ]})
+
+    def test_project_field_after_streamed_repositories(self):
+        path = self.write(".yaml", """
+projects:
+  - key: PROJ1
+    repositories:
+      - slug: web
+    name: Project 1
+""")
+        with self.assertRaisesRegex(ManifestError, "'name' must come before 'repositories'"):
+            list(iter_manifest(path))
+
+    def test_project_without_key(self):
+        path = self.write(".yaml", "projects:\n  - name: Project 1\n    repositories:\n      - slug: web\n")
+        with self.assertRaisesRegex(ManifestError, "no 'key'"):
+            list(iter_manifest(path))
+
+    def test_json_lines(self):
+        path = self.write(".jsonl", "\n".join([
+            '{"key": "PROJ1", "name": "Project 1", "description": "First", "repositories": [{"slug": "web", "branches": "main;dev"}]}',
+            '{"project": "PROJ1", "slug": "mobile", "is_private": false, "branches": ["main", "dev"]}',
+            '',
+            '{"key": "PROJ2", "name": "Project 2"}',
+        ]))
+        self.assertEqual(list(iter_manifest(path)), EXPECTED)
+
+    def test_csv(self):
+        path = self.write(".csv", "\n".join([
+            "project,project_name,project_description,slug,is_private,branches",
+            "PROJ1,Project 1,First,web,,main;dev",
+            "PROJ1,Project 1,First,mobile,false,main;dev",
+            "PROJ2,Project 2,,,,",
+        ]))
+        records = list(iter_manifest(path))
+        self.assertEqual(records[:2], EXPECTED[:2])
+        self.assertEqual(records[2][1]["is_private"], False)
+        self.assertEqual(records[3], EXPECTED[3])
+
+    def test_load_manifest_matches_safe_load(self):
+        data = load_manifest(self.write(".yaml", YAML_MANIFEST))
+        self.assertEqual([p["key"] for p in data["projects"]], ["PROJ1", "PROJ2"])
+        self.assertEqual([r["slug"] for r in data["projects"][0]["repositories"]], ["web", "mobile"])
+
+    def test_repository_of_unknown_project(self):
+        path = self.write(".jsonl", '{"project": "NOPE", "slug": "web"}\n')
+        with self.assertRaises(ManifestError):
+            load_manifest(path)
+
+    def test_missing_file_raises_immediately(self):
+        with self.assertRaises(FileNotFoundError):
+            iter_manifest("/nonexistent/manifest.yaml")
+
+    def test_as_list(self):
+        self.assertEqual(as_list("a; b;;c "), ["a", "b", "c"])
+        self.assertEqual(as_list(["a", 1]), ["a", "1"])
+        self.assertEqual(as_list(None), [])
+
+    def test_run_manifest_command_reports_instead_of_raising(self):
+        def fail(error):
+            def command():
+                raise error
+            return command
+
+        for error, message in [(FileNotFoundError(), "not found"), (yaml.YAMLError("bad"), "Error parsing YAML"),
+                               (ManifestError("no key"), "no key")]:
+            stdout = io.StringIO()
+            with patch("sys.stdout", stdout):
+                self.assertIsNone(run_manifest_command("m.yaml", fail(error), "Failed to list"))
+            self.assertIn(message, stdout.getvalue())
+        self.assertEqual(run_manifest_command("m.yaml", lambda: ([], 0), "Failed to list"), ([], 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import json
+import unittest
+from unittest.mock import MagicMock
+
+import requests
+
+from bitbucket_cli.executor import BulkExecutor
+from bitbucket_cli.metrics import Histogram, RequestMetrics, endpoint_template, slowest_steps
+from bitbucket_cli.ratelimit import RequestScheduler
+
+BASE = "https://api.bitbucket.org/2.0"
+
+
+class TestEndpointTemplate(unittest.TestCase):
+    def test_templates(self):
+        cases = {
+            f"{BASE}/repositories/ws/web?pagelen=100": "/repositories/{workspace}/{repo_slug}",
+            f"{BASE}/repositories/ws/web/refs/branches/release/1.0": "/repositories/{workspace}/{repo_slug}/refs/branches/{branch}",
+            f"{BASE}/repositories/ws/web/src": "/repositories/{workspace}/{repo_slug}/src",
+            f"{BASE}/repositories/ws/web/permissions-config/users/alice":
+                "/repositories/{workspace}/{repo_slug}/permissions-config/users/{user}",
+            f"{BASE}/repositories/ws/web/branch-restrictions/12": "/repositories/{workspace}/{repo_slug}/branch-restrictions/{id}",
+            f"{BASE}/workspaces/ws/projects/PROJ1": "/workspaces/{workspace}/projects/{project_key}",
+            f"{BASE}/workspaces/ws/permissions/repositories": "/workspaces/{workspace}/permissions/repositories",
+            f"{BASE}/workspaces/ws/permissions/groups/devs/members/bob":
+                "/workspaces/{workspace}/permissions/groups/{group}/members/{user}",
+            "http://127.0.0.1:8000/2.0/repositories/ws": "/repositories/{workspace}",
+        }
+        for url, template in cases.items():
+            self.assertEqual(endpoint_template(url), template, url)
+
+    def test_histogram(self):
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 3.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative(), [(0.1, 1), (1.0, 3), ("+Inf", 4)])
+        self.assertEqual(histogram.quantile(0.5), 1.0)
+        self.assertEqual(histogram.quantile(1.0), 3.0)
+
+
+class TestRequestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = RequestMetrics()
+        self.sleeps = []
+        self.scheduler = RequestScheduler(sleep=self.sleeps.append, backoff_base=0)
+        self.scheduler.hooks.append(self.metrics)
+
+    def response(self, status_code, content=b"", headers=None):
+        return MagicMock(status_code=status_code, content=content, headers=headers or {},
+                         request=MagicMock(body=b'{"a": 1}'))
+
+    def test_statuses_retries_bytes_and_throttle(self):
+        url = f"{BASE}/repositories/ws/web"
+        send = MagicMock(side_effect=[self.response(429, headers={"Retry-After": "0.01"}), self.response(200, b"{}")])
+        self.scheduler.send("GET", send, url=url)
+        send = MagicMock(side_effect=[requests.exceptions.ConnectionError(), self.response(204)])
+        self.scheduler.send("DELETE", send, url=f"{BASE}/repositories/ws/api")
+
+        data = self.metrics.to_dict()
+        self.assertEqual(data["requests"], 4)
+        self.assertEqual(data["retries"], 2)
+        get, delete = (next(e for e in data["endpoints"] if e["method"] == m) for m in ("GET", "DELETE"))
+        self.assertEqual(get["endpoint"], "/repositories/{workspace}/{repo_slug}")
+        self.assertEqual(get["statuses"], {"429": 1, "200": 1})
+        self.assertEqual(get["retries"], {"429": 1})
+        self.assertEqual((get["bytes_sent"], get["bytes_received"]), (16, 2))
+        self.assertEqual((delete["errors"], delete["retries"]), (1, {"ConnectionError": 1}))
+        self.assertEqual(data["throttle"]["waits"], 1)
+        json.loads(self.metrics.to_json())
+
+    def test_prometheus_text(self):
+        self.scheduler.send("POST", lambda: self.response(201), url=f"{BASE}/workspaces/ws/projects")
+        text = self.metrics.to_prometheus()
+        labels = 'method="POST",endpoint="/workspaces/{workspace}/projects"'
+        self.assertIn("# TYPE bitbucket_request_duration_seconds histogram", text)
+        self.assertIn(f'bitbucket_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1', text)
+        self.assertIn(f'bitbucket_responses_total{{{labels},status="201"}} 1', text)
+        self.assertIn("bitbucket_throttle_waits_total 0", text)
+
+    def test_slowest_steps_per_repository(self):
+        executor = BulkExecutor(workers=2)
+        project = executor.add(("project", "P"), lambda: True, group="P")
+        executor.add(("repo", "web"), lambda: True, deps=[project], group=("P", "web"))
+        executor.add(("protect", "web", "main"), lambda: True, deps=[project], group=("P", "web"))
+        executor.run()
+        executor.timings.update({("project", "P"): 0.1, ("repo", "web"): 0.5, ("protect", "web", "main"): 0.2})
+        lines = slowest_steps(executor)
+        self.assertIn("web", lines[0])
+        self.assertTrue(lines[1].strip().endswith("repo"))
+        self.assertTrue(lines[2].strip().endswith("protect main"))
+        self.assertIn("project P", lines[3])
+
+
+if __name__ == "__main__":
+    unittest.main()
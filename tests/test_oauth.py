@@ -0,0 +1,106 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from bitbucket_cli.auth import BitbucketAuth
+from bitbucket_cli.oauth import OAuthError, OAuthTokenManager
+
+
+def token_response(token, expires_in=7200, refresh_token="refresh-1", status_code=200):
+    response = MagicMock(status_code=status_code, text="error")
+    response.json.return_value = {"access_token": token, "refresh_token": refresh_token, "expires_in": expires_in}
+    return response
+
+
+class TestOAuthTokenManager(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_path = os.path.join(directory.name, "tokens.json")
+        self.session = MagicMock()
+
+    def manager(self, session=None):
+        return OAuthTokenManager("key", "secret", cache_path=self.cache_path, session=session or self.session,
+                                 refresh_margin=300)
+
+    def test_token_is_fetched_once_and_shared_through_the_cache(self):
+        self.session.post.return_value = token_response("token-1")
+        manager = self.manager()
+        headers = manager.headers()
+        self.assertEqual(headers["Authorization"], "Bearer token-1")
+        self.assertIs(manager.headers(), headers)
+        self.assertEqual(self.session.post.call_args.kwargs["data"], {"grant_type": "client_credentials"})
+        self.assertEqual(os.stat(self.cache_path).st_mode & 0o777, 0o600)
+
+        # Another process finds the token in the cache without any request
+        other_session = MagicMock()
+        self.assertEqual(self.manager(other_session).headers()["Authorization"], "Bearer token-1")
+        other_session.post.assert_not_called()
+
+    def test_expired_token_is_refreshed_with_the_refresh_token(self):
+        with open(self.cache_path, "w") as file:
+            json.dump({"key": {"access_token": "old", "refresh_token": "refresh-1", "expires_at": time.time() - 1}},
+                      file)
+        self.session.post.return_value = token_response("token-2", refresh_token=None)
+        manager = self.manager()
+        self.assertEqual(manager.headers()["Authorization"], "Bearer token-2")
+        self.assertEqual(self.session.post.call_args.kwargs["data"],
+                         {"grant_type": "refresh_token", "refresh_token": "refresh-1"})
+        # Bitbucket may not rotate the refresh token: the previous one is kept
+        self.assertEqual(manager.token["refresh_token"], "refresh-1")
+
+    def test_revoked_refresh_token_falls_back_to_client_credentials(self):
+        with open(self.cache_path, "w") as file:
+            json.dump({"key": {"access_token": "old", "refresh_token": "revoked", "expires_at": 0}}, file)
+        self.session.post.side_effect = [token_response(None, status_code=400), token_response("token-3")]
+        self.assertEqual(self.manager().headers()["Authorization"], "Bearer token-3")
+        self.assertEqual(self.session.post.call_args.kwargs["data"], {"grant_type": "client_credentials"})
+
+    def test_token_in_the_refresh_window_is_refreshed_in_the_background(self):
+        self.session.post.return_value = token_response("token-1", expires_in=120)
+        manager = self.manager()
+        self.assertEqual(manager.headers()["Authorization"], "Bearer token-1")
+
+        released = threading.Event()
+        def slow_refresh(*args, **kwargs):
+            released.wait(5)
+            return token_response("token-2")
+        self.session.post.side_effect = slow_refresh
+        # Still valid: returned right away while the refresh runs
+        self.assertEqual(manager.headers()["Authorization"], "Bearer token-1")
+        released.set()
+        for _ in range(100):
+            if manager.token["access_token"] == "token-2":
+                break
+            time.sleep(0.01)
+        self.assertEqual(manager.headers()["Authorization"], "Bearer token-2")
+
+    def test_failed_request_raises(self):
+        self.session.post.return_value = token_response(None, status_code=401)
+        with self.assertRaises(OAuthError):
+            self.manager().headers()
+
+
+class TestBitbucketAuthHeaders(unittest.TestCase):
+    @patch.dict(os.environ, {"BITBUCKET_USERNAME": "user", "BITBUCKET_APP_PASSWORD": "password",
+                             "BITBUCKET_CLIENT_ID": "key", "BITBUCKET_CLIENT_SECRET": "secret"})
+    def test_app_password_wins_and_headers_are_built_once(self):
+        auth = BitbucketAuth(client=MagicMock())
+        self.assertIsNone(auth.oauth)
+        self.assertIs(auth.get_headers(), auth.get_headers())
+        self.assertTrue(auth.get_headers()["Authorization"].startswith("Basic "))
+
+    @patch.dict(os.environ, {"BITBUCKET_APP_PASSWORD": "", "BITBUCKET_CLIENT_ID": "key",
+                             "BITBUCKET_CLIENT_SECRET": "secret"})
+    def test_oauth_when_only_the_consumer_is_configured(self):
+        auth = BitbucketAuth(client=MagicMock())
+        auth.oauth.headers = MagicMock(return_value={"Authorization": "Bearer token"})
+        self.assertEqual(auth.get_headers(), {"Authorization": "Bearer token"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from bitbucket_cli.api import BitbucketAPIError
+from bitbucket_cli.manifest import ManifestError
+from bitbucket_cli.permissions import (
+    bulk_update_permissions, expand_rules, normalize_rules, plan_permission_changes, sync_permissions
+)
+
+REPOSITORIES = [
+    {"slug": "web-app", "project": "PROJ1"},
+    {"slug": "web-site", "project": "PROJ2"},
+    {"slug": "api", "project": "PROJ1"},
+]
+
+
+class TestPermissionRules(unittest.TestCase):
+    def test_invalid_rules(self):
+        with self.assertRaises(ManifestError):
+            normalize_rules([{"repositories": ["web"], "permission": "write"}])
+        with self.assertRaises(ManifestError):
+            normalize_rules([{"users": ["alice"], "permission": "write"}])
+        with self.assertRaises(ManifestError):
+            normalize_rules([{"users": ["alice"], "repositories": ["web"], "permission": "owner"}])
+
+    def test_expand_globs_projects_and_overrides(self):
+        rules = normalize_rules([
+            {"users": "alice;bob", "repositories": ["web-*"], "permission": "write"},
+            {"groups": ["devs"], "projects": ["PROJ1"], "permission": "read"},
+            {"users": ["bob"], "repositories": ["web-*"], "projects": ["PROJ2"], "permission": "admin"},
+        ])
+        desired = expand_rules(rules, REPOSITORIES)
+        self.assertEqual(desired, {
+            ("web-app", "user", "alice"): "write",
+            ("web-site", "user", "alice"): "write",
+            ("web-app", "user", "bob"): "write",
+            ("web-site", "user", "bob"): "admin",
+            ("web-app", "group", "devs"): "read",
+            ("api", "group", "devs"): "read",
+        })
+
+    def test_plan_skips_pairs_already_in_place(self):
+        desired = {("web", "user", "alice"): "write", ("web", "user", "bob"): "none",
+                   ("api", "user", "alice"): "write", ("api", "user", "carol"): "none"}
+        current = {("web", "user", "alice"): "write", ("api", "user", "alice"): "read",
+                   ("api", "user", "carol"): "read"}
+        changes, unchanged = plan_permission_changes(desired, current)
+        self.assertEqual(unchanged, 2)
+        self.assertEqual([(c["repo"], c["name"], c["permission"]) for c in changes],
+                         [("api", "alice", "write"), ("api", "carol", "none")])
+
+
+class TestSyncPermissions(unittest.TestCase):
+    def setUp(self):
+        self.workspace = "test_workspace"
+        self.repos_api = MagicMock()
+        self.repos_api.iter_workspace_repositories.side_effect = lambda *args, **kwargs: iter(REPOSITORIES)
+        self.users_api = MagicMock()
+        self.users_api.iter_workspace_repository_permissions.return_value = iter([
+            {"repo_slug": "web-app", "username": "alice", "permission": "write"},
+            {"repo_slug": "other", "username": "alice", "permission": "admin"},
+        ])
+        self.users_api.iter_groups_and_permissions.side_effect = lambda ws, slug: iter(
+            [{"group": "devs", "permission": "read"}] if slug == "api" else []
+        )
+        self.users_api.add_user_to_repo.return_value = {"message": "added"}
+        self.users_api.add_group_to_repo.return_value = {"message": "added"}
+
+    def test_only_missing_changes_are_applied(self):
+        rules = [
+            {"users": ["alice"], "repositories": ["web-*"], "permission": "write"},
+            {"groups": ["devs"], "projects": ["PROJ1"], "permission": "read"},
+        ]
+        results, unchanged = sync_permissions(self.users_api, self.repos_api, self.workspace, rules, workers=2)
+        self.assertEqual(unchanged, 2)
+        self.assertTrue(all(r["success"] for r in results))
+        self.repos_api.iter_workspace_repositories.assert_called_once_with(self.workspace, prefetch=True)
+        self.users_api.add_user_to_repo.assert_called_once_with(self.workspace, "web-site", "alice", "write")
+        self.users_api.add_group_to_repo.assert_called_once_with(self.workspace, "web-app", "devs", "read")
+        # Group listings only for the repositories a rule targets
+        self.assertEqual(sorted(c.args[1] for c in self.users_api.iter_groups_and_permissions.call_args_list),
+                         ["api", "web-app"])
+
+    def test_rule_naming_users_by_uuid_or_account_id(self):
+        from bitbucket_cli.users import _workspace_repository_permission
+
+        self.users_api.iter_workspace_repository_permissions.return_value = iter([
+            _workspace_repository_permission({"repository": {"full_name": "ws/web-app"}, "permission": "write",
+                                              "user": {"nickname": "alice", "uuid": "{a1}", "account_id": "557:a"}}),
+            _workspace_repository_permission({"repository": {"full_name": "ws/web-site"}, "permission": "write",
+                                              "user": {"nickname": "alice", "uuid": "{a1}", "account_id": "557:a"}}),
+        ])
+        rules = [{"users": ["{a1}"], "repositories": ["web-app"], "permission": "write"},
+                 {"users": ["557:a"], "repositories": ["web-site"], "permission": "write"}]
+        changes, unchanged = sync_permissions(self.users_api, self.repos_api, self.workspace, rules, dry_run=True)
+        self.assertEqual((changes, unchanged), ([], 2))
+
+    def test_project_rules_list_only_their_projects(self):
+        rules = [{"users": ["alice"], "projects": ["PROJ1"], "permission": "write"}]
+        sync_permissions(self.users_api, self.repos_api, self.workspace, rules, dry_run=True)
+        self.repos_api.iter_workspace_repositories.assert_called_once_with(self.workspace, ["PROJ1"], prefetch=True)
+        self.users_api.iter_groups_and_permissions.assert_not_called()
+
+    def test_per_repository_fallback_and_revoke(self):
+        response = MagicMock(status_code=403, text="forbidden")
+        self.users_api.iter_workspace_repository_permissions.side_effect = BitbucketAPIError(response)
+        self.users_api.iter_users_and_permissions.side_effect = lambda ws, slug: iter(
+            [{"username": "bob", "permission": "read"}] if slug == "api" else []
+        )
+        self.users_api.remove_user_from_repo.return_value = {"error": {"message": "no access"}}
+        rules = [{"users": ["bob"], "projects": ["PROJ1"], "permission": "none"}]
+        results, unchanged = sync_permissions(self.users_api, self.repos_api, self.workspace, rules)
+        self.assertEqual(unchanged, 1)
+        self.assertEqual([(r["repo"], r["success"]) for r in results], [("api", False)])
+        self.users_api.remove_user_from_repo.assert_called_once_with(self.workspace, "api", "bob")
+
+    def test_bulk_update_reads_permissions_section(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".yaml", delete=False) as file:
+            file.write("projects:\n  - key: PROJ1\n"
+                       "permissions:\n  - users: [alice]\n    repositories: [api]\n    permission: admin\n")
+        self.addCleanup(os.remove, file.name)
+        results, unchanged = bulk_update_permissions(self.users_api, self.repos_api, file.name, self.workspace)
+        self.assertEqual([(r["repo"], r["name"], r["permission"]) for r in results], [("api", "alice", "admin")])
+        self.assertEqual(unchanged, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
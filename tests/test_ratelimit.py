@@ -0,0 +1,82 @@
+import unittest
+from unittest.mock import MagicMock
+
+import requests
+
+from bitbucket_cli.ratelimit import RequestScheduler, TokenBucket, parse_retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _response(status_code, headers=None):
+    return MagicMock(status_code=status_code, headers=headers or {})
+
+
+class TestRateLimit(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def scheduler(self, **kwargs):
+        return RequestScheduler(clock=self.clock, sleep=self.clock.sleep, **kwargs)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("12"), 12.0)
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertIsNone(parse_retry_after(None))
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+
+    def test_token_bucket_limits_burst(self):
+        bucket = TokenBucket(3600, burst=2, clock=self.clock, sleep=self.clock.sleep)
+        self.assertEqual(bucket.acquire(), 0.0)
+        self.assertEqual(bucket.acquire(), 0.0)
+        self.assertAlmostEqual(bucket.acquire(), 1.0)
+
+    def test_429_honours_retry_after(self):
+        send = MagicMock(side_effect=[_response(429, {"Retry-After": "30"}), _response(201)])
+        response = self.scheduler().send("POST", send)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(send.call_count, 2)
+        self.assertEqual(self.clock.sleeps, [30.0])
+
+    def test_server_errors_retried_only_for_idempotent_methods(self):
+        send = MagicMock(side_effect=[_response(503), _response(200)])
+        self.assertEqual(self.scheduler().send("GET", send).status_code, 200)
+
+        send = MagicMock(side_effect=[_response(503), _response(201)])
+        self.assertEqual(self.scheduler().send("POST", send).status_code, 503)
+        self.assertEqual(send.call_count, 1)
+
+    def test_connection_errors_retried_for_idempotent_methods(self):
+        send = MagicMock(side_effect=[requests.exceptions.ConnectionError(), _response(204)])
+        self.assertEqual(self.scheduler().send("DELETE", send).status_code, 204)
+
+        send = MagicMock(side_effect=requests.exceptions.ConnectionError())
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.scheduler().send("POST", send)
+
+    def test_gives_up_after_max_retries(self):
+        send = MagicMock(return_value=_response(429))
+        response = self.scheduler(max_retries=2).send("GET", send)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(send.call_count, 3)
+
+    def test_rate_limit_headers_pause_and_lower_rate(self):
+        scheduler = self.scheduler(rate_per_hour=5000)
+        scheduler.observe(_response(200, {"X-RateLimit-Limit": "1000", "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "60"}))
+        self.assertEqual(scheduler.bucket.rate_per_hour, 1000)
+        self.assertGreaterEqual(scheduler.wait(), 60.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import MagicMock
+
+from bitbucket_cli.reconcile import apply_plan, plan_changes, snapshot_workspace
+
+MANIFEST = {
+    "projects": [
+        {
+            "key": "PROJ1",
+            "name": "Project 1",
+            "repositories": [
+                {"slug": "web", "branches": "main;dev;uat"},
+                {"slug": "mobile", "branches": "main;dev"},
+            ],
+        }
+    ]
+}
+
+
+class TestReconcile(unittest.TestCase):
+    def setUp(self):
+        self.workspace = "test_workspace"
+        self.projects_api = MagicMock()
+        self.projects_api.iter_projects.return_value = iter([{"key": "PROJ1"}])
+        self.repos_api = MagicMock()
+        self.repos_api.iter_workspace_repositories.return_value = iter([{"slug": "web", "project": "PROJ1"}])
+        self.repos_api.iter_branches.side_effect = lambda ws, slug: iter(["main", "dev", "uat"])
+        self.branch_api = MagicMock()
+        self.branch_api.iter_branch_restrictions.side_effect = lambda ws, slug: iter([{"kind": "push", "pattern": "main"}])
+
+    def snapshot(self):
+        return snapshot_workspace(self.projects_api, self.repos_api, self.branch_api, self.workspace, MANIFEST)
+
+    def test_snapshot_only_fetches_existing_repositories(self):
+        snapshot = self.snapshot()
+        self.assertEqual(snapshot["projects"], {"PROJ1"})
+        self.assertEqual(set(snapshot["branches"]), {"web"})
+        self.repos_api.iter_branches.assert_called_once_with(self.workspace, "web")
+
+    def test_unchanged_manifest_has_empty_plan(self):
+        snapshot = self.snapshot()
+        snapshot["repositories"]["mobile"] = {"slug": "mobile"}
+        snapshot["branches"]["mobile"] = {"main", "dev"}
+        snapshot["restrictions"]["mobile"] = [{"kind": "push", "pattern": "main"}]
+        self.assertEqual(plan_changes(MANIFEST, snapshot), [])
+
+    def test_plan_contains_only_missing_steps(self):
+        snapshot = self.snapshot()
+        snapshot["branches"]["web"] = {"main"}
+        snapshot["restrictions"]["web"] = []
+        actions = [(a["action"], a["repo"]) for a in plan_changes(MANIFEST, snapshot)]
+        self.assertEqual(actions, [
+            ("create_branches", "web"),
+            ("protect_branch", "web"),
+            ("create_repository", "mobile"),
+            ("initial_commit", "mobile"),
+            ("create_branches", "mobile"),
+            ("protect_branch", "mobile"),
+        ])
+
+    def test_apply_runs_planned_steps_only(self):
+        self.repos_api.create_repository.return_value = {"success": True, "message": "created"}
+        self.repos_api.create_initial_commit.return_value = {"success": True, "commit": "abc123"}
+        self.repos_api.create_branches.return_value = {"success": True, "branches": {"dev": {"success": True}}}
+        self.branch_api.protect_branch.return_value = {"success": True}
+        snapshot = self.snapshot()
+        actions = plan_changes(MANIFEST, snapshot)
+        status = apply_plan(self.projects_api, self.repos_api, self.branch_api, self.workspace, actions, workers=2)
+        self.assertEqual(set(status.values()), {"done"})
+        self.projects_api.create_project.assert_not_called()
+        self.repos_api.create_repository.assert_called_once_with(self.workspace, "PROJ1", "mobile", True)
+        self.repos_api.create_branches.assert_called_once_with(self.workspace, "mobile", ["dev"], target_hash="abc123",
+                                                              workers=2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from fake_bitbucket import FakeBitbucket  # noqa: E402
+
+from bitbucket_cli.manifest import ManifestError  # noqa: E402
+from bitbucket_cli.repository_settings import (  # noqa: E402
+    normalize_settings_rules, plan_repository_updates, update_repositories
+)
+
+REPOSITORIES = [
+    {"slug": "web", "project": "PROJ1", "is_private": True, "mainbranch": "main", "description": None,
+     "fork_policy": "no_public_forks"},
+    {"slug": "web-admin", "project": "PROJ1", "is_private": False, "mainbranch": "main", "description": "",
+     "fork_policy": "allow_forks"},
+    {"slug": "api", "project": "PROJ2", "is_private": True, "mainbranch": "develop", "description": "API",
+     "fork_policy": "no_forks"},
+]
+
+
+class TestRepositorySettingsPlan(unittest.TestCase):
+    def test_only_differing_settings_are_planned(self):
+        rules = normalize_settings_rules([
+            {"repositories": ["web*"], "private": True, "fork_policy": "no_public_forks", "description": ""},
+            {"projects": ["PROJ2"], "main_branch": "main", "description": "API"},
+        ])
+        changes, unchanged = plan_repository_updates(rules, REPOSITORIES)
+        self.assertEqual(changes, [
+            {"repo": "web-admin", "settings": {"is_private": True, "fork_policy": "no_public_forks"},
+             "current": {"is_private": False, "fork_policy": "allow_forks"}},
+            {"repo": "api", "settings": {"mainbranch": "main"}, "current": {"mainbranch": "develop"}},
+        ])
+        # 'web' already matches: a missing description counts as empty
+        self.assertEqual(unchanged, 1)
+
+    def test_later_rules_win(self):
+        rules = normalize_settings_rules([
+            {"projects": ["PROJ1"], "move_to": "PROJ3"},
+            {"repositories": ["web-admin"], "move_to": "PROJ1"},
+        ])
+        changes, unchanged = plan_repository_updates(rules, REPOSITORIES)
+        self.assertEqual([(c["repo"], c["settings"]) for c in changes], [("web", {"project": "PROJ3"})])
+        self.assertEqual(unchanged, 1)
+
+    def test_invalid_rules(self):
+        for rule in [{"private": True}, {"projects": ["PROJ1"]}, {"projects": ["PROJ1"], "private": "yes"},
+                     {"projects": ["PROJ1"], "fork_policy": "sometimes"}, {"projects": ["PROJ1"], "privat": True}]:
+            with self.assertRaises(ManifestError):
+                normalize_settings_rules([rule])
+
+    def test_dry_run_sends_nothing_and_apply_puts_only_changes(self):
+        repos_api = MagicMock()
+        repos_api.iter_workspace_repositories.return_value = REPOSITORIES
+        rule = {"projects": ["PROJ1"], "private": True}
+        changes, _ = update_repositories(repos_api, "ws", [rule], dry_run=True)
+        self.assertEqual([c["repo"] for c in changes], ["web-admin"])
+        repos_api.update_repository.assert_not_called()
+        repos_api.iter_workspace_repositories.assert_called_once_with("ws", ["PROJ1"], prefetch=True)
+
+        repos_api.update_repository.return_value = {"success": False, "message": "Failed to update repository.",
+                                                    "error_details": {"error": {"message": "nope"}}}
+        results, unchanged = update_repositories(repos_api, "ws", [rule])
+        repos_api.update_repository.assert_called_once_with("ws", "web-admin", {"is_private": True})
+        self.assertFalse(results[0]["success"])
+        self.assertIn("nope", results[0]["message"])
+        self.assertEqual(unchanged, 1)
+
+
+class TestRepositorySettingsAgainstFakeServer(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeBitbucket(max_pagelen=1).start()
+        self.addCleanup(self.server.stop)
+        environment = patch.dict(os.environ, {
+            "BITBUCKET_API_URL": self.server.base_url,
+            "BITBUCKET_USERNAME": "bench",
+            "BITBUCKET_APP_PASSWORD": "bench",
+        })
+        environment.start()
+        self.addCleanup(environment.stop)
+        for key in ("PROJ1", "PROJ2"):
+            self.server.add_project("ws", key)
+        self.server.add_repository("ws", "PROJ1", "web", branches=["main", "develop"])
+        self.server.add_repository("ws", "PROJ1", "api", branches=["main"])
+
+        from bitbucket_cli.auth import BitbucketAuth
+        from bitbucket_cli.repositories import BitbucketRepositories
+
+        self.repos_api = BitbucketRepositories(BitbucketAuth())
+
+    def test_update_then_nothing_left_to_do(self):
+        rules = [{"projects": ["PROJ1"], "main_branch": "develop", "move_to": "PROJ2", "description": "moved"}]
+        results, unchanged = update_repositories(self.repos_api, "ws", rules)
+        self.assertEqual({r["repo"]: r["success"] for r in results}, {"web": True, "api": False})
+        self.assertIn("develop", next(r["message"] for r in results if r["repo"] == "api"))
+        web = self.server.workspace("ws")["repositories"]["web"]
+        self.assertEqual((web["project"]["key"], web["mainbranch"]["name"], web["description"]),
+                         ("PROJ2", "develop", "moved"))
+
+        rules = [{"repositories": ["web"], "main_branch": "develop", "move_to": "PROJ2", "description": "moved"}]
+        requests = self.server.requests
+        results, unchanged = update_repositories(self.repos_api, "ws", rules)
+        self.assertEqual((results, unchanged), ([], 1))
+        # Listing only (two one-repository pages), no PUT
+        self.assertEqual(self.server.requests - requests, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import io
+import unittest
+from unittest.mock import MagicMock, patch
+
+from bitbucket_cli.cli import menu, parse_args
+from bitbucket_cli.shell import BitbucketShell, SessionListings
+
+
+class TestSessionListings(unittest.TestCase):
+    def test_listings_are_fetched_once_until_invalidated(self):
+        projects, repos = MagicMock(), MagicMock()
+        projects.iter_projects.return_value = [{"key": "PROJ2"}, {"key": "PROJ1"}]
+        repos.iter_repository_slugs.side_effect = lambda *args, **kwargs: iter(["web", "api"])
+        listings = SessionListings(projects, repos, "ws")
+        self.assertEqual(listings.get("projects"), ["PROJ1", "PROJ2"])
+        self.assertEqual(listings.get("repositories"), ["api", "web"])
+        listings.get("repositories")
+        self.assertEqual(repos.iter_repository_slugs.call_count, 1)
+        listings.invalidate()
+        listings.get("repositories")
+        self.assertEqual(repos.iter_repository_slugs.call_count, 2)
+
+    def test_listing_is_fetched_without_the_lock_and_dropped_if_invalidated(self):
+        projects = MagicMock()
+        listings = SessionListings(projects, MagicMock(), "ws")
+
+        def iter_projects(*args, **kwargs):
+            self.assertFalse(listings.lock.locked())
+            # A write during the fetch: this listing may already be stale
+            listings.invalidate()
+            return [{"key": "PROJ1"}]
+
+        projects.iter_projects.side_effect = iter_projects
+        self.assertEqual(listings.get("projects"), ["PROJ1"])
+        self.assertEqual(listings.values, {})
+
+    def test_failed_listing_gives_no_candidates(self):
+        projects = MagicMock()
+        projects.iter_projects.side_effect = RuntimeError("offline")
+        self.assertEqual(SessionListings(projects, MagicMock(), "ws").get("projects"), [])
+
+
+class TestBitbucketShell(unittest.TestCase):
+    def setUp(self):
+        self.listings = MagicMock()
+        self.listings.get.side_effect = lambda kind: {"projects": ["PROJ1", "PROJ2"],
+                                                      "repositories": ["api", "web", "web-admin"]}[kind]
+        self.args = parse_args(["--workspace", "ws", "shell"])
+
+    def shell(self, lines=""):
+        stdout = io.StringIO()
+        return BitbucketShell(self.args, MagicMock(), self.listings, stdin=io.StringIO(lines), stdout=stdout), stdout
+
+    def test_completion_of_commands_options_and_names(self):
+        shell, _ = self.shell()
+        self.assertEqual(shell.completenames("re"), ["repo ", "refresh "])
+        self.assertEqual(shell.complete_words(["repo"], "d"), ["delete "])
+        self.assertEqual(shell.complete_words(["repo", "delete", "api"], "web"), ["web ", "web-admin "])
+        self.assertEqual(shell.complete_words(["repo", "list", "--project"], "P"), ["PROJ1 ", "PROJ2 "])
+        self.assertEqual(shell.complete_words(["repo", "list"], "--p"), ["--project "])
+        self.assertEqual(shell.complete_words(["perm", "apply", "--projects", "PROJ1"], "P"), ["PROJ1 ", "PROJ2 "])
+        self.assertEqual(shell.complete_words(["perm", "apply", "--permission"], "a"), ["admin "])
+        # New names are not completed, nor the values of other options
+        self.assertEqual(shell.complete_words(["repo", "create"], ""), [])
+        self.assertEqual(shell.complete_words(["perm", "set", "--user"], ""), [])
+
+    @patch("bitbucket_cli.shell.run_command")
+    def test_commands_share_the_session(self, run_command):
+        shell, stdout = self.shell("repo list --project PROJ1\nrepo delete web\nrepo list\nexit\n")
+        shell.cmdloop()
+        self.assertEqual([c.args[0].action for c in run_command.call_args_list], ["list", "delete"])
+        self.assertTrue(all(c.args[1] is shell.auth for c in run_command.call_args_list))
+        self.assertEqual(run_command.call_args_list[1].args[0].slugs, ["web"])
+        self.assertEqual(run_command.call_args_list[1].args[0].workspace, "ws")
+        # Only the delete changed the listings
+        self.assertEqual(self.listings.invalidate.call_count, 1)
+
+    @patch("bitbucket_cli.shell.run_command", side_effect=ConnectionError("connection reset"))
+    def test_failed_command_keeps_the_shell_open(self, run_command):
+        shell, stdout = self.shell("project list\nproject list\n")
+        shell.cmdloop()
+        self.assertEqual(run_command.call_count, 2)
+        self.assertIn("connection reset", stdout.getvalue())
+
+    @patch("bitbucket_cli.projects.BitbucketProjects.iter_projects")
+    def test_results_are_written_to_the_shell_output(self, iter_projects):
+        iter_projects.return_value = iter([{"key": "PROJ1"}])
+        shell, stdout = self.shell("project list\n")
+        with patch("sys.stdout", io.StringIO()) as process_stdout:
+            shell.cmdloop()
+        self.assertIn('"key": "PROJ1"', stdout.getvalue())
+        self.assertEqual(process_stdout.getvalue(), "")
+
+
+class TestMenuLoop(unittest.TestCase):
+    @patch("builtins.input", side_effect=["99", "1", "PROJ1", "Project 1", "", "0"])
+    @patch("bitbucket_cli.projects.BitbucketProjects")
+    def test_menu_runs_choices_until_exit(self, projects, input_):
+        projects.return_value.create_project.return_value = {"success": True, "message": "created"}
+        with patch("sys.stdout", io.StringIO()) as stdout:
+            menu(parse_args([]), "ws", MagicMock())
+        projects.return_value.create_project.assert_called_once_with("ws", "PROJ1", "Project 1", "")
+        self.assertEqual(projects.call_count, 1)
+        self.assertIn("Invalid choice", stdout.getvalue())
+        self.assertIn("Exiting CLI.", stdout.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import subprocess
+import sys
+import unittest
+from unittest.mock import patch
+
+from bitbucket_cli import env
+
+HEAVY_MODULES = ["requests", "yaml", "tabulate", "aiohttp", "asyncio", "bitbucket_cli.auth"]
+
+
+class TestStartup(unittest.TestCase):
+    def imported_modules(self, code):
+        # A fresh interpreter, since this test process has imported everything already
+        result = subprocess.run(
+            [sys.executable, "-c", code + "; import sys; print('\\n'.join(sys.modules))"],
+            capture_output=True, text=True, check=True
+        )
+        return set(result.stdout.split())
+
+    def test_cli_import_is_light(self):
+        modules = self.imported_modules("import bitbucket_cli.cli")
+        self.assertEqual([m for m in HEAVY_MODULES if m in modules], [])
+
+    def test_command_only_imports_what_it_uses(self):
+        modules = self.imported_modules(
+            "from bitbucket_cli.cli import parse_args; parse_args(['repo', 'delete', 'web']); "
+            "import bitbucket_cli.auth, bitbucket_cli.repositories"
+        )
+        self.assertIn("requests", modules)
+        self.assertEqual([m for m in ["yaml", "tabulate", "aiohttp", "asyncio"] if m in modules], [])
+
+    def test_single_call_commands_do_not_read_yaml(self):
+        # 'group add-user' and rules given as options (perm apply, branch apply, repo update) need no manifest reader
+        modules = self.imported_modules(
+            "import bitbucket_cli.groups, bitbucket_cli.permissions, bitbucket_cli.branch_policies, "
+            "bitbucket_cli.repository_settings"
+        )
+        self.assertEqual([m for m in ["yaml", "bitbucket_cli.manifest"] if m in modules], [])
+
+    def test_env_file_is_parsed_once(self):
+        with patch.object(env, "_loaded", False), patch("dotenv.load_dotenv") as load_dotenv:
+            env.load_env()
+            env.load_env()
+        load_dotenv.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()